@@ -1,9 +1,19 @@
-import scipp as sc
-from scipy.constants import neutron_mass, h
-
-HDM = (h / neutron_mass) * (sc.units.m * sc.units.m / sc.units.s)
-
 MAJOR = 0
 MINOR = 0
 MICRO = 1
 __version__ = f'{MAJOR}.{MINOR}.{MICRO}'
+
+
+def __getattr__(name):
+    """
+    Create `HDM`, the ratio of Planck's constant to the neutron mass, on
+    first use, so that importing the package, or the metadata modules, does
+    not import scipp and scipy.
+    """
+    if name == 'HDM':
+        import scipp as sc
+        from scipy.constants import neutron_mass, h
+        global HDM
+        HDM = (h / neutron_mass) * (sc.units.m * sc.units.m / sc.units.s)
+        return HDM
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
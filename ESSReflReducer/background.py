@@ -0,0 +1,97 @@
+"""
+Estimation of the background from off-specular regions of the detector.
+
+The events in the background regions are histogrammed in wavelength in the
+same pass as the reflected intensity. The background rate per pixel is then
+projected onto the pixels of the specular region, for each wavelength bin,
+and binned in qz. This is done with the histograms alone, so the cost does
+not depend on the number of events.
+"""
+
+import numpy as np
+from ESSReflReducer import engine
+
+
+def in_regions(y, z, regions):
+    """
+    Find the events, or pixels, within any of the detector regions.
+
+    Args:
+        y (array_like): The y-position of each event, in metres.
+        z (array_like): The z-position of each event, in metres.
+        regions (list of tuple): The (y_min, y_max, z_min, z_max) of each region, in metres.
+
+    Returns:
+        (array_like): `True` for events within a region.
+    """
+    inside = np.zeros(np.shape(y), dtype=bool)
+    for y_min, y_max, z_min, z_max in regions:
+        inside |= (y >= y_min) & (y <= y_max) & (z >= z_min) & (z <= z_max)
+    return inside
+
+
+def default_lambda_bins(reader, n_bins=50):
+    """
+    Wavelength bins covering the chopper frame.
+
+    Args:
+        reader (ESSReflReducer.read_amor.AmorDataReader): The data.
+        n_bins (int, optional): The number of bins. Defaults to 50.
+
+    Returns:
+        (array_like): The bin edges, in metres.
+    """
+    from ESSReflReducer import HDM
+    lambda_max = reader.lambda_cut + reader.tau * HDM / reader.chopper_detector_distance
+    return np.linspace(reader.lambda_cut.value, lambda_max.value, n_bins + 1)
+
+
+def estimate(reader, counts, lambda_bins, regions, q_bins, n_blades=None, n_sub=64):
+    """
+    Estimate the background in each qz bin. The background per pixel is the
+    intensity in the regions divided by the number of pixels in the regions,
+    in each wavelength bin. All pixels have the same area, so this is scaled
+    to the specular region by the number of unmasked pixels outside of the
+    background regions, for each detector row. Each (wavelength, row) bin is
+    spread over qz, assuming the background is even in wavelength within the
+    bin, by evaluating the angle, qz, masks and illumination correction on a
+    regular grid of points in the bin, as in
+    `ESSReflReducer.normalisation.cell_fractions`.
+
+    Args:
+        reader (ESSReflReducer.read_amor.AmorDataReader): The processed data, see `AmorDataReader.template`.
+        counts (tuple of array_like): The sum of the weights, and squared weights, of the events in the regions, in each wavelength bin.
+        lambda_bins (array_like): The wavelength bin edges, in metres.
+        regions (list of tuple): The (y_min, y_max, z_min, z_max) of each region, in metres.
+        q_bins (array_like): The qz bin edges, in reciprocal angstrom.
+        n_blades (int, optional): The number of detector blades. Defaults to the number of blades of the instrument.
+        n_sub (int, optional): The number of points in each wavelength bin. Defaults to 64.
+
+    Returns:
+        (tuple of array_like): The background, and its variance, in each qz bin.
+    """
+    y, z = reader.pixel_positions(n_blades)
+    background_pixels = in_regions(y, z, regions)
+    n_background = np.count_nonzero(background_pixels)
+    if n_background == 0:
+        raise ValueError("The background regions contain no detector pixels.")
+    limits = getattr(reader, 'mask_limits', {})
+    y_min, y_max = limits.get('y', (-np.inf, np.inf))
+    signal_pixels = ~background_pixels & (y >= y_min) & (y <= y_max)
+    rows_z, rows_n = np.unique(z[signal_pixels], return_counts=True)
+
+    rate = counts[0] / n_background
+    rate_variance = counts[1] / (n_background * n_background)
+    offsets = (np.arange(n_sub) + 0.5) / n_sub
+    wavelength = (lambda_bins[:-1, np.newaxis] + np.diff(lambda_bins)[:, np.newaxis] * offsets).reshape(-1, 1)
+    theta = reader.theta_of(rows_z[np.newaxis, :], wavelength)
+    qz = engine.qz(theta, wavelength)
+    masked = np.zeros(theta.shape, dtype=bool)
+    for name, values in (('lambda', np.broadcast_to(wavelength, theta.shape)), ('theta', theta)):
+        if name in limits:
+            masked |= engine.outside(values, *limits[name])
+    with np.errstate(divide='ignore'):
+        weights = rows_n / (n_sub * engine.illumination(reader.beam_size.value, reader.sample_size.value, theta))
+    bin_index = np.broadcast_to((np.arange(wavelength.size) // n_sub)[:, np.newaxis], theta.shape)
+    projection, _ = engine.histogram_nd([bin_index.ravel(), qz.ravel()], [np.arange(len(lambda_bins)), q_bins], weights=weights.ravel(), mask=masked.ravel())
+    return rate @ projection, rate_variance @ (projection * projection)
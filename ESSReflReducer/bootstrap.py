@@ -0,0 +1,110 @@
+"""
+Bootstrap estimates of the uncertainty of the reflectivity.
+
+The histograms before normalisation are resampled, rather than the events.
+Each weighted histogram is described by its effective number of counts in
+each bin, `values ** 2 / variances`, which are drawn from Poisson
+distributions and scaled back by the mean weight, `variances / values`. This
+keeps the mean and variance of every bin, and all of the replicates are
+drawn, and normalised, as arrays with a leading replicate dimension.
+"""
+
+import warnings
+import numpy as np
+
+
+def poisson_resample(values, variances, n_replicates, rng):
+    """
+    Draw replicates of a weighted histogram.
+
+    Args:
+        values (array_like): The sum of the weights in each bin.
+        variances (array_like): The sum of the squared weights in each bin.
+        n_replicates (int): The number of replicates.
+        rng (`np.random.Generator`): The random number generator.
+
+    Returns:
+        (array_like): The replicates, of shape `(n_replicates,) + values.shape`. Bins without events are zero in every replicate.
+    """
+    values = np.asarray(values, dtype=float)
+    variances = np.asarray(variances, dtype=float)
+    filled = (values > 0) & (variances > 0)
+    counts = np.zeros(values.shape)
+    scale = np.zeros(values.shape)
+    counts[filled] = values[filled] * values[filled] / variances[filled]
+    scale[filled] = variances[filled] / values[filled]
+    return scale * rng.poisson(counts, size=(n_replicates,) + values.shape)
+
+
+def qz_replicates(reference, data, supermirror, n_replicates, rng, reference_background=None, data_background=None):
+    """
+    Draw replicates of the reflectivity normalised in qz, the ratio of the
+    sample to the reference histograms, after subtracting any background.
+
+    Args:
+        reference (tuple of array_like): The values and variances of the reference qz histogram.
+        data (tuple of array_like): The values and variances of the sample qz histogram.
+        supermirror (array_like): The reflectivity of the supermirror in each qz bin.
+        n_replicates (int): The number of replicates.
+        rng (`np.random.Generator`): The random number generator.
+        reference_background (tuple of array_like, optional): The values and variances of the reference background. Defaults to no background.
+        data_background (tuple of array_like, optional): The values and variances of the sample background. Defaults to no background.
+
+    Returns:
+        (array_like): The reflectivity of each replicate, of shape `(n_replicates, n_qz)`, `nan` where the reference of a replicate is zero.
+    """
+    reference = poisson_resample(*reference, n_replicates, rng)
+    data = poisson_resample(*data, n_replicates, rng)
+    if reference_background is not None:
+        reference = reference - poisson_resample(*reference_background, n_replicates, rng)
+        data = data - poisson_resample(*data_background, n_replicates, rng)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(reference != 0, data * supermirror / reference, np.nan)
+
+
+def cell_replicates(reflectivity, cells, table, fractions, n_replicates, rng):
+    """
+    Draw replicates of the reflectivity normalised in (lambda, theta) cells.
+    The normalised sample and the reference of each cell are resampled, and
+    the change of each cell is carried to the qz bins through the fraction
+    of the cell in each bin.
+
+    Args:
+        reflectivity (array_like): The reflectivity in each qz bin.
+        cells (tuple of array_like): The values and variances of the normalised sample in each cell.
+        table (tuple of array_like): The values and variances of the reference in each cell.
+        fractions (array_like): The fraction of each cell in each qz bin, see `ESSReflReducer.normalisation.cell_fractions`.
+        n_replicates (int): The number of replicates.
+        rng (`np.random.Generator`): The random number generator.
+
+    Returns:
+        (array_like): The reflectivity of each replicate, of shape `(n_replicates, n_qz)`, `nan` where no cell of a replicate covers the bin.
+    """
+    n_cells = table[0].size
+    fractions = fractions.reshape(n_cells, -1)
+    sample = poisson_resample(*cells, n_replicates, rng).reshape(n_replicates, n_cells)
+    reference = poisson_resample(*table, n_replicates, rng).reshape(n_replicates, n_cells)
+    valid = reference > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(valid, np.ravel(table[0]) / reference, 0.)
+        resampled = (sample * ratio) @ fractions
+        original = (valid * np.ravel(cells[0])) @ fractions
+        return np.where(original > 0, reflectivity * resampled / original, np.nan)
+
+
+def interval(replicates, level=0.68):
+    """
+    The central interval of the replicates in each bin.
+
+    Args:
+        replicates (array_like): The replicates, with the replicate as the first dimension.
+        level (float, optional): The fraction of the replicates within the interval. Defaults to 0.68.
+
+    Returns:
+        (tuple of array_like): The lower and upper bound in each bin.
+    """
+    tail = 50. * (1. - level)
+    with warnings.catch_warnings():
+        # Bins that are `nan` in every replicate give `nan` bounds.
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return tuple(np.nanpercentile(replicates, [tail, 100. - tail], axis=0))
@@ -0,0 +1,116 @@
+"""
+A cache of the qz and weight of each event, for re-binning a reduction
+without reading or processing the events again.
+
+The unmasked events are sorted by qz and stored, with the running sums of
+their weights and squared weights, in a single `.npy` file. The file is
+memory-mapped when loaded, and the sum of the weights in any qz bin is the
+difference of the running sums at the two edges, found by a binary search.
+"""
+
+import numpy as np
+from ESSReflReducer.read_amor import HistogramSpec
+
+
+def event_weights(reader, dtype=None):
+    """
+    Find the qz and weight, the monitor normalisation, illumination
+    correction and any dead-time correction, of each unmasked event, as used for the qz histogram of
+    `ESSReflReducer.read_amor.AmorReducer`.
+
+    Args:
+        reader (ESSReflReducer.read_amor.AmorDataReader): The processed data.
+        dtype (`np.dtype`, optional): Precision of the per-event weights. Defaults to the precision of the reader.
+
+    Returns:
+        (tuple of array_like): The qz, in reciprocal angstrom, and the weight of each unmasked event.
+    """
+    if dtype is None:
+        dtype = reader.dtype
+    illumination = reader.template().illumination_table()
+    chunks = []
+
+    def chunk_weights(chunk):
+        keep = chunk.mask()
+        keep = slice(None) if keep is None else ~keep
+        theta = chunk.data.coords['theta'].values[keep].astype(dtype, copy=False)
+        weights = np.full(len(theta), 1. / reader.monitor, dtype=dtype) / illumination(theta).astype(dtype, copy=False)
+        dead_time = chunk.dead_time_weights()
+        if dead_time is not None:
+            weights *= dead_time[keep]
+        # The chunks are collected as a side effect, as they cannot be summed.
+        chunks.append((chunk.data.coords['qz'].values[keep], weights))
+        return np.zeros(1)
+
+    reader.map_chunks(chunk_weights)
+    if not chunks:
+        return np.zeros(0), np.zeros(0)
+    qz, weights = zip(*chunks)
+    return np.concatenate(qz), np.concatenate(weights)
+
+
+def write_cache(reader, filename, dtype=None):
+    """
+    Write the qz and weight of each unmasked event to a cache file.
+
+    Args:
+        reader (ESSReflReducer.read_amor.AmorDataReader): The processed data.
+        filename (str): The `.npy` file to write.
+        dtype (`np.dtype`, optional): Precision of the per-event weights. Defaults to the precision of the reader.
+    """
+    qz, weights = event_weights(reader, dtype)
+    np.save(filename, sorted_sums(qz, weights))
+
+
+def sorted_sums(qz, weights):
+    """
+    Sort events by qz and find the running sums of their weights and squared
+    weights.
+
+    Args:
+        qz (array_like): The qz of each event.
+        weights (array_like): The weight of each event.
+
+    Returns:
+        (array_like): An array of shape `(3, n_events + 1)`, with the sorted qz, padded with `inf`, and the running sums of the weights and squared weights before each event.
+    """
+    order = np.argsort(qz, kind='stable')
+    weights = np.asarray(weights, dtype=float)[order]
+    table = np.zeros((3, len(qz) + 1))
+    table[0, :-1] = np.asarray(qz)[order]
+    table[0, -1] = np.inf
+    np.cumsum(weights, out=table[1, 1:])
+    np.cumsum(weights * weights, out=table[2, 1:])
+    return table
+
+
+class QzCache:
+    """
+    The sorted qz and running sums of the weights of the events, from a
+    cache file.
+    """
+    def __init__(self, filename, mmap_mode='r'):
+        """
+        Args:
+            filename (str): The `.npy` file written by `write_cache`.
+            mmap_mode (str): Memory-map mode passed to `np.load`, `None` loads the file into memory. Optional, default `'r'`.
+        """
+        self.table = np.load(filename, mmap_mode=mmap_mode)
+        self.n_events = self.table.shape[1] - 1
+
+    def histogram(self, q_bins):
+        """
+        Histogram the events in qz, where each bin includes its lower edge
+        but not its upper edge.
+
+        Args:
+            q_bins (array_like): The qz bin edges, in reciprocal angstrom.
+
+        Returns:
+            (`sc.DataArray`): The sum of the weights in each bin, with the sum of the squared weights as variances.
+        """
+        q_bins = np.asarray(q_bins, dtype=float)
+        index = np.searchsorted(self.table[0, :-1], q_bins, side='left')
+        weights = self.table[1, index]
+        squared = self.table[2, index]
+        return HistogramSpec({'qz': q_bins}).to_data_array(np.diff(weights), np.diff(squared))
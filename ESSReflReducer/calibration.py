@@ -0,0 +1,171 @@
+"""
+Calibration of the chopper phase and the frame cut from the time of the
+events since the pulse.
+
+The times are histogrammed once, folded over the chopper frame, and every
+bin of the histogram is scored as a candidate at once: the frame is cut in
+the darkest part of the frame, and the phase is chosen such that a rising
+edge of the spectrum, i.e. the short-wavelength edge of the supermirror
+reference, is at its known wavelength. Recalibration therefore needs one
+pass over the events, rather than rebuilding the reader for each candidate.
+"""
+
+import numpy as np
+
+
+def tof_histogram(event_time_offset, tau, n_bins=2000):
+    """
+    Histogram the time of the events since the pulse, folded over the chopper
+    frame.
+
+    Args:
+        event_time_offset (array_like): Time of each event since the pulse, in seconds.
+        tau (float): Length of the chopper frame, in seconds.
+        n_bins (int, optional): The number of bins over the frame. Defaults to 2000.
+
+    Returns:
+        (array_like): The number of events in each bin.
+    """
+    index = (np.remainder(event_time_offset, tau) * (n_bins / tau)).astype(np.int64)
+    return np.bincount(np.minimum(index, n_bins - 1), minlength=n_bins).astype(float)
+
+
+def _window_sums(counts, width):
+    """
+    The circular sum of the `width` bins starting at each bin.
+    """
+    padded = np.concatenate([counts, counts[:width]])
+    cumulative = np.concatenate([[0.], np.cumsum(padded)])
+    return cumulative[width:width + len(counts)] - cumulative[:len(counts)]
+
+
+def _peak(score, index):
+    """
+    Refine the position of an extreme of a circular score by fitting a
+    parabola to it and its neighbours.
+    """
+    left, centre, right = score[index - 1], score[index], score[(index + 1) % len(score)]
+    curvature = left - 2 * centre + right
+    if curvature == 0 or not np.isfinite(curvature):
+        return float(index)
+    return index + 0.5 * (left - right) / curvature
+
+
+def frame_cut(counts, tau, width=None, start=0., stop=None):
+    """
+    Find the time at which to cut the frame, the centre of the window with
+    the fewest events.
+
+    Args:
+        counts (array_like): The folded histogram, see `tof_histogram`.
+        tau (float): Length of the chopper frame, in seconds.
+        width (int, optional): The number of bins in the window. Defaults to 2 % of the bins.
+        start (float, optional): The earliest time of the window, in seconds. Defaults to the start of the frame.
+        stop (float, optional): The latest time of the window, in seconds. Defaults to the end of the frame.
+
+    Returns:
+        (float): The time of the cut since the pulse, in seconds, within the frame.
+    """
+    n_bins = len(counts)
+    first = int(np.ceil(start * n_bins / tau))
+    last = n_bins if stop is None else int(np.floor(stop * n_bins / tau))
+    width = max(1, n_bins // 50) if width is None else width
+    width = max(1, min(width, last - first))
+    sums = _window_sums(counts, width)
+    # Over the whole frame the windows wrap around, otherwise they are within the limits.
+    allowed = np.full(n_bins, first == 0 and stop is None)
+    allowed[first:max(first + 1, last - width + 1)] = True
+    sums[~allowed] = np.inf
+    darkest = sums == sums.min()
+    if np.count_nonzero(darkest) == 1:
+        start = _peak(sums, int(np.argmin(sums)))
+    elif darkest.all():
+        start = 0.
+    else:
+        # A gap wider than the window gives a run of empty windows, so the
+        # centre of the longest run is used.
+        shift = int(np.argmin(darkest))
+        rolled = np.concatenate([[0], np.roll(darkest, -shift).astype(np.int8), [0]])
+        starts = np.flatnonzero(np.diff(rolled) == 1)
+        lengths = np.flatnonzero(np.diff(rolled) == -1) - starts
+        longest = int(np.argmax(lengths))
+        start = shift + starts[longest] + 0.5 * (lengths[longest] - 1)
+    return np.remainder((start + 0.5 * width) * tau / n_bins, tau)
+
+
+def rising_edge(counts, tau, width=None):
+    """
+    Find the time of the steepest rise of the folded histogram, comparing
+    the events in the windows after and before each bin edge.
+
+    Args:
+        counts (array_like): The folded histogram, see `tof_histogram`.
+        tau (float): Length of the chopper frame, in seconds.
+        width (int, optional): The number of bins in each window. Defaults to 1 % of the bins.
+
+    Returns:
+        (float): The time of the edge since the pulse, in seconds, within the frame.
+    """
+    n_bins = len(counts)
+    width = max(1, n_bins // 100) if width is None else width
+    sums = _window_sums(counts, width)
+    rise = sums - np.roll(sums, width)
+    index = int(np.argmax(rise))
+    return np.remainder(_peak(rise, index) * tau / n_bins, tau)
+
+
+def chopper_settings(counts, tau, lambda_edge, flight_path_length, hdm, cut_distance=None):
+    """
+    Find the chopper phase and cut wavelength from the folded histogram,
+    such that the rising edge of the spectrum is at `lambda_edge` and the
+    frame is cut where there are fewest events before the edge. The cut
+    wavelength is converted back to a time with `cut_distance`, which may
+    differ from the flight path of the events.
+
+    Args:
+        counts (array_like): The folded histogram, see `tof_histogram`.
+        tau (float): Length of the chopper frame, in seconds.
+        lambda_edge (float): The wavelength of the rising edge, in metres.
+        flight_path_length (float): The distance from the chopper to the detector, in metres.
+        hdm (float): The ratio of Planck's constant to the neutron mass, in square metres per second.
+        cut_distance (float, optional): The distance converting the cut wavelength to a time, in metres. Defaults to `flight_path_length`.
+
+    Returns:
+        (tuple of float): The chopper phase, in the units of `ESSReflReducer.read_amor.AmorDataReader`, and the cut wavelength, in metres.
+    """
+    edge = rising_edge(counts, tau)
+    # The offset is only known up to whole frames, the one nearest zero is used.
+    tof_offset = np.remainder(lambda_edge * flight_path_length / hdm - edge + 0.5 * tau, tau) - 0.5 * tau
+    # The cut is before the edge, where the time-of-flight is not negative.
+    tof_cut = frame_cut(counts, tau, start=max(0., -tof_offset), stop=edge)
+    cut_distance = flight_path_length if cut_distance is None else cut_distance
+    return 180. * tof_offset / tau, tof_cut * hdm / cut_distance
+
+
+def calibrate(reader, lambda_edge, n_bins=2000):
+    """
+    Calibrate the chopper phase and cut wavelength of a reader, from a
+    single pass over its events. The new settings can be given to a new
+    reader, or set on the reader before calling `find_tof` and `process`
+    again.
+
+    Args:
+        reader (ESSReflReducer.read_amor.AmorDataReader): The data, usually of the supermirror reference.
+        lambda_edge (`sc.Variable`): The wavelength of the rising edge of the spectrum.
+        n_bins (int, optional): The number of bins over the frame. Defaults to 2000.
+
+    Returns:
+        (dict of `sc.Variable`): The `chopper_phase` and `lambda_cut`.
+    """
+    import scipp as sc
+    from ESSReflReducer import HDM
+    from ESSReflReducer.read_amor import _magnitude
+    tau = reader.tau.value
+    counts = reader.map_chunks(lambda chunk: tof_histogram(chunk.event_time_offset.values, tau, n_bins))
+    # The flight path to the first wire of the blades, as in `AmorDataReader.tof_to_lambda`.
+    path_offset = reader.sample_detector_distance * (1. / sc.cos(reader.detector_angle_horizon) - 1.)
+    flight_path_length = reader.chopper_detector_distance.value + path_offset.value
+    # `AmorDataReader.find_tof` converts the cut with the chopper to detector distance alone.
+    phase, lambda_cut = chopper_settings(counts, tau, _magnitude(lambda_edge, sc.units.m), flight_path_length, HDM.value,
+                                         cut_distance=reader.chopper_detector_distance.value)
+    return {'chopper_phase': phase * sc.units.dimensionless, 'lambda_cut': lambda_cut * sc.units.m}
@@ -0,0 +1,73 @@
+"""
+Reading of chunked, gzip-compressed event datasets, with the chunks
+decompressed in parallel.
+
+h5py decompresses the chunks of a dataset one after the other, on the
+calling thread. Instead, the location of each chunk in the file is found
+from the chunk index, and the raw chunks are read and inflated on a thread
+pool, straight into the output array. Both the reads and `zlib` release the
+GIL, so this scales with the number of threads.
+"""
+
+import math
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+
+def can_read_parallel(dataset):
+    """
+    Check if a dataset can be read by decompressing its chunks directly,
+    i.e. it is one-dimensional and chunked, with the deflate filter only, in
+    a plain file.
+
+    Args:
+        dataset (`h5py.Dataset`): The dataset.
+
+    Returns:
+        (bool): `True` if `read` can decompress the chunks in parallel.
+    """
+    return (hasattr(os, 'pread') and dataset.ndim == 1 and dataset.chunks is not None
+            and dataset.compression == 'gzip' and dataset.id.get_create_plist().get_nfilters() == 1
+            and dataset.file.driver == 'sec2' and dataset.file.userblock_size == 0)
+
+
+def read(dataset, n_threads=1):
+    """
+    Read the whole of a dataset. Compressed, chunked datasets are
+    decompressed on `n_threads` threads, while other datasets are read by
+    h5py.
+
+    Args:
+        dataset (`h5py.Dataset`): The dataset.
+        n_threads (int, optional): The number of threads to use. Defaults to 1.
+
+    Returns:
+        (array_like): The values of the dataset.
+    """
+    if n_threads <= 1 or not can_read_parallel(dataset):
+        return dataset[:]
+    n_values = dataset.shape[0]
+    chunk_size = dataset.chunks[0]
+    chunks = [dataset.id.get_chunk_info(i) for i in range(dataset.id.get_num_chunks())]
+    output = np.empty(n_values, dtype=dataset.dtype)
+    if len(chunks) < math.ceil(n_values / chunk_size):
+        output[:] = dataset.fillvalue
+    fd = os.open(dataset.file.filename, os.O_RDONLY)
+
+    def read_chunk(chunk):
+        raw = os.pread(fd, chunk.size, chunk.byte_offset)
+        # Bit 0 of the filter mask is set when deflate was skipped for the chunk.
+        if not chunk.filter_mask & 1:
+            raw = zlib.decompress(raw)
+        start = chunk.chunk_offset[0]
+        stop = min(start + chunk_size, n_values)
+        output[start:stop] = np.frombuffer(raw, dtype=dataset.dtype, count=stop - start)
+
+    try:
+        with ThreadPoolExecutor(max_workers=n_threads) as pool:
+            list(pool.map(read_chunk, chunks))
+    finally:
+        os.close(fd)
+    return output
@@ -0,0 +1,104 @@
+"""
+Correction for the dead time of the detector at high count rates.
+
+The observed rate of events is found for each pulse, detector region and
+time window within the pulse, with a single bincount of the flattened index
+of these cells. The true rate in each cell follows from a paralysable or
+non-paralysable model of the dead time, and each event is weighted by the
+ratio of the true to the observed rate of its cell. Only the table of cells
+is kept, so the cost is one pass over the events to count, and one gather
+when the events are histogrammed.
+"""
+
+import numpy as np
+
+#: The models of the dead time.
+MODELS = ['non-paralysable', 'paralysable']
+
+
+def event_pulses(event_index, first_event, n_events):
+    """
+    Find the pulse of each event in a contiguous block of events.
+
+    Args:
+        event_index (array_like): The index of the first event of each pulse.
+        first_event (int): The index of the first event of the block.
+        n_events (int): The number of events in the block.
+
+    Returns:
+        (array_like): The index of the pulse of each event. Events before the first pulse belong to the first pulse.
+    """
+    ends = np.clip(np.asarray(event_index[1:], dtype=np.int64) - first_event, 0, n_events)
+    events_per_pulse = np.diff(np.concatenate([[0], ends, [n_events]]))
+    return np.repeat(np.arange(len(event_index), dtype=np.int32), events_per_pulse)
+
+
+def cell_index(pulse, pixel, time, region_pixels, n_regions, window_width, n_windows):
+    """
+    Find the flattened (pulse, region, window) cell of each event.
+
+    Args:
+        pulse (array_like): The pulse of each event.
+        pixel (array_like): The detector pixel id of each event.
+        time (array_like): The time of each event since the pulse, in seconds.
+        region_pixels (int): The number of consecutive pixels in each region.
+        n_regions (int): The number of regions, later regions are merged into the last.
+        window_width (float): The width of each time window, in seconds.
+        n_windows (int): The number of time windows, later times are merged into the last.
+
+    Returns:
+        (array_like): The index of the cell of each event.
+    """
+    region = np.minimum(np.asarray(pixel, dtype=np.int64) // region_pixels, n_regions - 1)
+    window = np.clip((time / window_width).astype(np.int64), 0, n_windows - 1)
+    return (np.asarray(pulse, dtype=np.int64) * n_regions + region) * n_windows + window
+
+
+def cell_counts(index, n_cells):
+    """
+    Count the events in each cell.
+
+    Args:
+        index (array_like): The cell of each event, see `cell_index`.
+        n_cells (int): The number of cells.
+
+    Returns:
+        (array_like): The number of events in each cell.
+    """
+    return np.bincount(index, minlength=n_cells).astype(float)
+
+
+def correction_factors(rate, dead_time, model='non-paralysable'):
+    """
+    The ratio of the true to the observed rate in each cell.
+
+    For a non-paralysable detector the observed rate `m` of a true rate `n`
+    is `n / (1 + n dead_time)`, and for a paralysable detector it is
+    `n exp(-n dead_time)`, which is inverted with the principal branch of the
+    Lambert W function.
+
+    Args:
+        rate (array_like): The observed rate in each cell, in events per second.
+        dead_time (float): The dead time, in seconds.
+        model (str, optional): One of `MODELS`. Defaults to 'non-paralysable'.
+
+    Returns:
+        (array_like): The correction factor of each cell.
+    """
+    x = np.asarray(rate, dtype=float) * dead_time
+    if model == 'non-paralysable':
+        limit = 1.
+    elif model == 'paralysable':
+        limit = 1. / np.e
+    else:
+        raise ValueError(f"Unknown dead-time model {model!r}, expected one of {MODELS}.")
+    if np.any(x >= limit):
+        raise ValueError(f"The observed rate of {np.count_nonzero(x >= limit)} cells is beyond the largest rate of the {model} model, "
+                         "use more detector regions or time windows.")
+    if model == 'non-paralysable':
+        return 1. / (1. - x)
+    from scipy.special import lambertw
+    factors = np.ones_like(x)
+    busy = x > 0
+    factors[busy] = -lambertw(-x[busy]).real / x[busy]
+    return factors
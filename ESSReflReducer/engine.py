@@ -0,0 +1,299 @@
+"""
+Vectorised kernels for the per-event reduction physics.
+
+The functions here operate on plain numpy arrays (and floats), so that they
+can be applied to contiguous blocks of events in parallel. Lengths are in
+metres, times in seconds, angles in degrees of arc, wavelengths in metres and
+qz in reciprocal angstrom, matching the units used by the
+:py:class:`ESSReflReducer.read_amor.AmorDataReader` coordinates.
+"""
+
+import numpy as np
+
+
+def reshuffle_tof(event_time_offset, tau, tof_cut, tof_offset):
+    """
+    Shuffle the time-of-flight such that it is continuous over the chopper
+    frame, starting from the time-of-flight associated with the cut
+    wavelength.
+
+    Args:
+        event_time_offset (array_like): Time of each event since the pulse, in seconds.
+        tau (float): Length of the chopper frame, in seconds.
+        tof_cut (float): Time-of-flight at which the frame is cut, in seconds.
+        tof_offset (float): Phase offset between the chopper pulse and the time-of-flight zero, in seconds.
+
+    Returns:
+        (array_like): Time-of-flight of each event, in seconds.
+    """
+    return np.remainder(event_time_offset - tof_cut + tau, tau) + tof_cut + tof_offset
+
+
+def detector_yz(pixel_id, detector_zero, detector_blade_z, detector_dz,
+                n_wires=32, n_strips=32, strip_width=1e-3):
+    """
+    Reconstruct the detector position of each event from the pixel id, where
+    the pixels are numbered by blade, then wire, then strip. The positions
+    are found in double precision and returned at the floating point
+    precision of the pixel ids, so that the same pixel has the nearest
+    position in single precision.
+
+    Args:
+        pixel_id (array_like): The detector pixel id of each event.
+        detector_zero (float): Position of the top of the detector, in metres.
+        detector_blade_z (float): Distance between detector blades, in metres.
+        detector_dz (float): Vertical distance between wires on a blade, in metres.
+        n_wires (int, optional): The number of wires on each blade. Defaults to 32.
+        n_strips (int, optional): The number of strips on each blade. Defaults to 32.
+        strip_width (float, optional): The width of a strip, in metres. Defaults to 1e-3.
+
+    Returns:
+        (tuple of array_like): The blade number, the wire number on the blade, the y-position and the z-position of each event.
+    """
+    blade_nr, remainder = np.divmod(pixel_id, n_wires * n_strips)
+    z_on_blade, y_pixel = np.divmod(remainder, n_strips)
+    dtype = np.result_type(y_pixel.dtype, np.float32)
+    y = (y_pixel.astype(np.float64) * strip_width).astype(dtype, copy=False)
+    z = (detector_zero - blade_nr.astype(np.float64) * detector_blade_z - z_on_blade * detector_dz).astype(dtype, copy=False)
+    return blade_nr, z_on_blade, y, z
+
+
+def counting_sort(key, n_keys):
+    """
+    Find the order that sorts non-negative integer keys, keeping the order
+    of equal keys. The keys are sorted by 16-bit digits, for which numpy uses
+    a radix sort, so the cost is linear in the number of events.
+
+    Args:
+        key (array_like): The key of each event.
+        n_keys (int): One more than the largest key, at most `2 ** 32`.
+
+    Returns:
+        (array_like): The indices of the events in sorted order.
+    """
+    key = np.asarray(key)
+    if n_keys <= 1 << 16:
+        return np.argsort(key.astype(np.uint16), kind='stable')
+    order = np.argsort((key & 0xFFFF).astype(np.uint16), kind='stable')
+    return order[np.argsort((key[order] >> 16).astype(np.uint16), kind='stable')]
+
+
+def run_lengths(values):
+    """
+    Compress sorted values into runs of equal values.
+
+    Args:
+        values (array_like): The values, with equal values next to each other.
+
+    Returns:
+        (tuple of array_like): The value and the length of each run.
+    """
+    values = np.asarray(values)
+    if values.size == 0:
+        return values, np.zeros(0, dtype=np.int64)
+    starts = np.concatenate([[0], np.flatnonzero(values[1:] != values[:-1]) + 1])
+    return values[starts], np.diff(np.append(starts, values.size))
+
+
+def wavelength(tof, z_on_blade, chopper_detector_distance, detector_dx,
+               path_offset, hdm):
+    """
+    Convert time-of-flight to wavelength.
+
+    Args:
+        tof (array_like): Time-of-flight of each event, in seconds.
+        z_on_blade (array_like): The wire number on the blade of each event.
+        chopper_detector_distance (float): Distance from chopper to detector, in metres.
+        detector_dx (float): Horizontal distance between wires on a blade, in metres.
+        path_offset (float): Additional flight path from the detector inclination, in metres.
+        hdm (float): Ratio of Planck's constant to the neutron mass, in m^2/s.
+
+    Returns:
+        (tuple of array_like): The flight path length, in metres, and wavelength, in metres, of each event.
+    """
+    flight_path_length = chopper_detector_distance + z_on_blade * detector_dx + path_offset
+    return flight_path_length, tof * hdm / flight_path_length
+
+
+def theta_gravity(z, wavelength, sample_detector_distance,
+                  sample_angle_horizon):
+    """
+    Find the reflected angle of each event, accounting for the gravitational
+    drop of the neutron.
+
+    Args:
+        z (array_like): Detector z-position of each event, in metres.
+        wavelength (array_like): Wavelength of each event, in metres.
+        sample_detector_distance (float): Distance from sample to detector, in metres.
+        sample_angle_horizon (float): Sample angle to the horizon, in degrees of arc.
+
+    Returns:
+        (tuple of array_like): The gravitational drop, in metres, and the angle, in degrees of arc, of each event.
+    """
+    gravity_drop = -3.07 * sample_detector_distance * sample_detector_distance * wavelength * wavelength
+    delta = np.degrees(np.arctan2(z, sample_detector_distance)) - np.degrees(np.arctan2(gravity_drop, sample_detector_distance))
+    if sample_angle_horizon > 0:
+        theta = sample_angle_horizon + delta
+    else:
+        theta = -1 * sample_angle_horizon - delta
+    return gravity_drop, theta
+
+
+def theta(z, sample_detector_distance, detector_angle_horizon,
+          sample_angle_horizon):
+    """
+    Find the reflected angle of each event, ignoring gravity.
+
+    Args:
+        z (array_like): Detector z-position of each event, in metres.
+        sample_detector_distance (float): Distance from sample to detector, in metres.
+        detector_angle_horizon (float): Detector angle to the horizon, in degrees of arc.
+        sample_angle_horizon (float): Sample angle to the horizon, in degrees of arc.
+
+    Returns:
+        (array_like): The angle of each event, in degrees of arc.
+    """
+    return detector_angle_horizon - sample_angle_horizon + z / sample_detector_distance * 180. / np.pi
+
+
+def qz(theta, wavelength):
+    """
+    Find the scattering vector of each event.
+
+    Args:
+        theta (array_like): Angle of each event, in degrees of arc.
+        wavelength (array_like): Wavelength of each event, in metres.
+
+    Returns:
+        (array_like): The scattering vector of each event, in reciprocal angstrom.
+    """
+    return 4. * np.pi * np.sin(np.radians(theta)) / wavelength * 1e-10
+
+
+def outside(x, low, high):
+    """
+    Find the events with values outside of a range. The limits are compared
+    at the precision of the values, so that discrete values, such as pixel
+    positions, on a limit are treated the same in single and double
+    precision.
+
+    Args:
+        x (array_like): Value for each event.
+        low (float): Minimum accepted value.
+        high (float): Maximum accepted value.
+
+    Returns:
+        (array_like): `True` where the event should be masked.
+    """
+    low = x.dtype.type(low)
+    high = x.dtype.type(high)
+    return (x < low) | (x > high)
+
+
+def illumination(beam_size, sample_size, theta):
+    """
+    The factor by which the intensity should be multiplied to account for the
+    scattering geometry, where the beam is Gaussian in shape.
+
+    Args:
+        beam_size (float): Width of incident beam, in metres.
+        sample_size (float): Width of sample in the dimension of the beam, in metres.
+        theta (array_like): Incident angle, in degrees of arc.
+
+    Returns:
+        (array_like): Correction factor.
+    """
+    from scipy.special import erf
+    sample_size_perp = sample_size * (theta * np.pi / 180.)
+    return erf(sample_size_perp / beam_size * 2.35482)
+
+
+def ravel_index(values, edges):
+    """
+    Find the flat bin index of each event in a multidimensional histogram,
+    where each bin includes its lower edges but not its upper edges.
+
+    Args:
+        values (list of array_like): The value of each event in each dimension.
+        edges (list of array_like): The bin edges in each dimension.
+
+    Returns:
+        (array_like): The index of the bin in the flattened histogram, `-1` for events outside of the histogram.
+    """
+    index = np.zeros(len(values[0]), dtype=np.intp)
+    valid = np.ones(len(values[0]), dtype=bool)
+    for x, e in zip(values, edges):
+        n_bins = len(e) - 1
+        i = np.searchsorted(e, x, side='right') - 1
+        valid &= (i >= 0) & (i < n_bins)
+        index *= n_bins
+        index += i
+    index[~valid] = -1
+    return index
+
+
+def lookup(values, edges, table):
+    """
+    Look up the value of a multidimensional table in the bin of each event.
+
+    Args:
+        values (list of array_like): The value of each event in each dimension.
+        edges (list of array_like): The bin edges of the table in each dimension.
+        table (array_like): The table, with one value for each bin.
+
+    Returns:
+        (array_like): The table value for each event, `nan` for events outside of the table.
+    """
+    index = ravel_index(values, edges)
+    result = np.ravel(table)[index].astype(float)
+    result[index < 0] = np.nan
+    return result
+
+
+def histogram_nd(values, edges, weights=None, mask=None, index=None):
+    """
+    Histogram events in one or more dimensions, using a single bincount of
+    the flattened bin index.
+
+    Args:
+        values (list of array_like): The value of each event in each dimension.
+        edges (list of array_like): The bin edges in each dimension.
+        weights (array_like, optional): Weight of each event. Defaults to unit weights.
+        mask (array_like, optional): `True` for events that should be ignored. Defaults to no masking.
+        index (array_like, optional): The flat bin index of each event, see `ravel_index`. Defaults to the index of the values.
+
+    Returns:
+        (tuple of array_like): The sum of the weights and the sum of the squared weights in each bin.
+    """
+    shape = tuple(len(e) - 1 for e in edges)
+    if index is None:
+        index = ravel_index(values, edges)
+    keep = index >= 0
+    if mask is not None:
+        keep &= ~mask
+    index = index[keep]
+    size = int(np.prod(shape))
+    if weights is None:
+        counts = np.bincount(index, minlength=size).astype(float).reshape(shape)
+        return counts, counts.copy()
+    weights = weights[keep]
+    # bincount gives integers for no events, even with weights.
+    return (np.bincount(index, weights=weights, minlength=size).astype(float, copy=False).reshape(shape),
+            np.bincount(index, weights=weights * weights, minlength=size).astype(float, copy=False).reshape(shape))
+
+
+def histogram(x, edges, weights=None, mask=None):
+    """
+    Histogram events, where each bin includes its lower edge but not its
+    upper edge.
+
+    Args:
+        x (array_like): Value to bin for each event.
+        edges (array_like): Bin edges.
+        weights (array_like, optional): Weight of each event. Defaults to unit weights.
+        mask (array_like, optional): `True` for events that should be ignored. Defaults to no masking.
+
+    Returns:
+        (tuple of array_like): The sum of the weights and the sum of the squared weights in each bin.
+    """
+    return histogram_nd([x], [edges], weights=weights, mask=mask)
@@ -160,7 +160,7 @@ class Probe(Header):
         """
         Args:
             radiation (str): The probing radiation, i.e. 'neutron'.
-            polarisation (float, optional): The polarisation degree. Defaults to None.
+            polarisation (float or str, optional): The polarisation degree, or the spin channel, i.e. 'pm'. Defaults to None.
         """
         self.radiation = radiation
         if polarisation is not None:
@@ -0,0 +1,151 @@
+"""
+Descriptions of the time-of-flight reflectometers, and a registry of the
+reader for each.
+
+The event physics, in :py:mod:`ESSReflReducer.engine`, is shared by all
+instruments. An instrument only describes its detector layout, distances and
+chopper, which set the parameters of the kernels, so that a new instrument
+gets the same vectorised event processing by registering its description
+with a reader for its files.
+"""
+
+import numpy as np
+import scipp as sc
+
+_READERS = {}
+
+
+class Instrument:
+    """
+    The description of a reflectometer with a multi-blade detector, where
+    each blade has a number of wires, stacked vertically, and strips, across
+    the beam.
+    """
+    def __init__(self, name, n_blades, n_wires=32, n_strips=32,
+                 strip_width=1e-3 * sc.units.m,
+                 wire_spacing=4.0e-3 * sc.units.m,
+                 blade_spacing=10.11e-3 * sc.units.m,
+                 detector_zero_blades=2.5,
+                 detector_angle=5.0 * sc.units.deg,
+                 sample_detector_distance=4.0 * sc.units.m,
+                 chopper_detector_distance=1.9e1 * sc.units.m,
+                 chopper_speed=20/3/sc.units.s,
+                 chopper_phase=-8. * sc.units.dimensionless,
+                 lambda_cut=2.4e-10 * sc.units.m):
+        """
+        Args:
+            name (str): The name of the instrument, i.e. 'AMOR'.
+            n_blades (int): The number of detector blades.
+            n_wires (int): The number of wires on each blade. Optional, default `32`.
+            n_strips (int): The number of strips on each blade. Optional, default `32`.
+            strip_width (`sc.Variable`): The width of a strip. Optional, default `1e-3 m`.
+            wire_spacing (`sc.Variable`): The distance between wires along a blade. Optional, default `4e-3 m`.
+            blade_spacing (`sc.Variable`): The vertical distance between blades. Optional, default `10.11e-3 m`.
+            detector_zero_blades (float): The position of the top of the detector, in blade spacings. Optional, default `2.5`.
+            detector_angle (`sc.Variable`): Inclination of the blades. Optional, default `5 degrees of arc`.
+            sample_detector_distance (`sc.Variable`): Distance from sample to detector. Optional, default `4.0 m`.
+            chopper_detector_distance (`sc.Variable`): Distance from chopper to detector. Optional, default `19 m`.
+            chopper_speed (`sc.Variable`): Rotational velocity of the chopper. Optional, default `6.6666... s^{-1}`.
+            chopper_phase (`sc.Variable`): Phase offset between chopper pulse and ToF zero. Optional, default `-8`.
+            lambda_cut (`sc.Variable`): Reshuffle value for the ToF. Optional, default `2.4e-10 m`.
+        """
+        self.name = name
+        self.n_blades = n_blades
+        self.n_wires = n_wires
+        self.n_strips = n_strips
+        self.strip_width = strip_width
+        self.wire_spacing = wire_spacing
+        self.blade_spacing = blade_spacing
+        self.detector_zero_blades = detector_zero_blades
+        self.detector_angle = detector_angle
+        self.sample_detector_distance = sample_detector_distance
+        self.chopper_detector_distance = chopper_detector_distance
+        self.chopper_speed = chopper_speed
+        self.chopper_phase = chopper_phase
+        self.lambda_cut = lambda_cut
+
+    @property
+    def n_pixels(self):
+        """
+        The number of detector pixels.
+
+        Returns:
+            (int): The number of pixels.
+        """
+        return self.n_blades * self.n_wires * self.n_strips
+
+    def detector_geometry(self, detector_angle=None, blade_spacing=None):
+        """
+        The parameters of `ESSReflReducer.engine.detector_yz` for this
+        detector.
+
+        Args:
+            detector_angle (`sc.Variable`): Inclination of the blades. Optional, default the value of the instrument.
+            blade_spacing (`sc.Variable`): The vertical distance between blades. Optional, default the value of the instrument.
+
+        Returns:
+            (dict): The keyword arguments, in metres.
+        """
+        detector_angle = self.detector_angle if detector_angle is None else detector_angle
+        blade_spacing = self.blade_spacing if blade_spacing is None else blade_spacing
+        return {'detector_zero': self.detector_zero_blades * blade_spacing.value,
+                'detector_blade_z': blade_spacing.value,
+                'detector_dz': self.wire_spacing.value * np.sin(np.radians(detector_angle.value)),
+                'n_wires': self.n_wires, 'n_strips': self.n_strips,
+                'strip_width': self.strip_width.value}
+
+    def detector_dx(self, detector_angle=None):
+        """
+        The horizontal distance between wires on a blade, which adds to the
+        flight path.
+
+        Args:
+            detector_angle (`sc.Variable`): Inclination of the blades. Optional, default the value of the instrument.
+
+        Returns:
+            (float): The distance, in metres.
+        """
+        detector_angle = self.detector_angle if detector_angle is None else detector_angle
+        return self.wire_spacing.value * np.cos(np.radians(detector_angle.value))
+
+    def reader_kwargs(self):
+        """
+        The distances and chopper settings of the instrument, as arguments
+        for a reader.
+
+        Returns:
+            (dict): The keyword arguments.
+        """
+        names = ['detector_angle', 'sample_detector_distance', 'chopper_detector_distance', 'chopper_speed', 'chopper_phase', 'lambda_cut']
+        return {name: getattr(self, name) for name in names}
+
+
+def register(instrument, reader):
+    """
+    Register the reader for the files of an instrument.
+
+    Args:
+        instrument (ESSReflReducer.instrument.Instrument): The instrument.
+        reader (type): The reader class, taking the filename, the `instrument` and the reader settings as arguments.
+    """
+    _READERS[instrument.name.upper()] = (instrument, reader)
+
+
+def get(name):
+    """
+    Get a registered instrument and its reader.
+
+    Args:
+        name (str): The name of the instrument, in any case.
+
+    Returns:
+        (tuple): The `Instrument` and the reader class.
+    """
+    try:
+        return _READERS[name.upper()]
+    except KeyError:
+        raise ValueError(f"No reader is registered for {name}, the registered instruments are {sorted(_READERS)}.")
+
+
+#: The AMOR reflectometer at SINQ, PSI.
+AMOR = Instrument('AMOR', n_blades=14)
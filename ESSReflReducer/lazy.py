@@ -0,0 +1,182 @@
+"""
+The processing of an AMOR measurement as a graph of stages, so that
+parameters can be tuned without reading the file again.
+
+Each stage of :py:class:`ESSReflReducer.read_amor.AmorDataReader` finds one
+or more event coordinates from the outputs of earlier stages and a few
+parameters. When a parameter is changed, only the stages that use it, and the
+stages downstream of those, are found again, the next time the processed
+events are needed. For example, changing the sample angle offset finds the
+angle, qz and masks again, but not the time-of-flight, detector positions or
+wavelength.
+"""
+
+import inspect
+from ESSReflReducer.read_amor import AmorDataReader
+
+#: The stages of the processing, in the order that they are found, with the
+#: stages whose outputs each one uses.
+STAGES = {
+    'tof': (),
+    'detector': (),
+    'lambda': ('tof', 'detector'),
+    'theta': ('detector', 'lambda'),
+    'qz': ('theta', 'lambda'),
+    'masks': ('detector', 'lambda', 'theta'),
+}
+
+#: The stages that use each parameter that can be changed.
+PARAMETERS = {
+    'chopper_speed': ('tof', 'masks'),
+    'chopper_phase': ('tof',),
+    'lambda_cut': ('tof',),
+    'chopper_detector_distance': ('tof', 'lambda', 'masks'),
+    'detector_angle': ('detector', 'lambda'),
+    'detector_blade_z': ('detector',),
+    'sample_detector_distance': ('lambda', 'theta'),
+    'sample_angle_horizon_offset': ('theta',),
+    'gravity': ('theta',),
+    'y_min': ('masks',),
+    'y_max': ('masks',),
+    'lambda_min': ('masks',),
+    'lambda_max': ('masks',),
+    'theta_min': ('masks',),
+    'theta_max': ('masks',),
+}
+
+_MASK_PARAMETERS = ['y_min', 'y_max', 'lambda_min', 'lambda_max', 'theta_min', 'theta_max']
+
+
+def invalidated(names):
+    """
+    Find the stages that must be found again after changing parameters.
+
+    Args:
+        names (list of str): The names of the changed parameters.
+
+    Returns:
+        (set of str): The stages that use the parameters, directly or through an earlier stage.
+    """
+    stages = set()
+    for name in names:
+        if name not in PARAMETERS:
+            raise ValueError(f"Unknown parameter {name}, expected one of {list(PARAMETERS)}.")
+        stages.update(PARAMETERS[name])
+    for stage, inputs in STAGES.items():
+        if stages.intersection(inputs):
+            stages.add(stage)
+    return stages
+
+
+def _defaults():
+    """
+    The default value of each parameter, from the `AmorDataReader` methods
+    that take it.
+    """
+    defaults = {}
+    for method in [AmorDataReader.__init__, AmorDataReader.detector_reconstruction, AmorDataReader.apply_masks]:
+        for name, parameter in inspect.signature(method).parameters.items():
+            if name in PARAMETERS:
+                defaults[name] = parameter.default
+    return defaults
+
+
+class AmorPipeline:
+    """
+    An AMOR measurement, read once, whose processing is found lazily and
+    found again only where it depends on a changed parameter.
+    """
+    def __init__(self, filename, **kwargs):
+        """
+        Args:
+            filename (str): The .hdf file to be read.
+            kwargs: The parameters of the processing, see `PARAMETERS`, and the other arguments of `AmorDataReader`.
+        """
+        self.parameters = _defaults()
+        self.parameters.update({k: v for k, v in kwargs.items() if k in PARAMETERS})
+        self.reader = AmorDataReader(filename, **kwargs)
+        self._sample_angle_horizon = self.reader.sample_angle_horizon - self.parameters['sample_angle_horizon_offset']
+        self._valid = {'tof'}
+        self.evaluated = []
+
+    def set(self, **parameters):
+        """
+        Change parameters of the processing. The affected stages are found
+        the next time that the processed events are needed.
+
+        Args:
+            parameters: The new value of each parameter, see `PARAMETERS`.
+        """
+        self._valid.difference_update(invalidated(parameters))
+        self.parameters.update(parameters)
+        reader = self.reader
+        for name, value in parameters.items():
+            if name == 'chopper_speed':
+                reader.tau = 1 / (2 * value)
+            elif name == 'sample_angle_horizon_offset':
+                reader.sample_angle_horizon = self._sample_angle_horizon + value
+            elif hasattr(reader, name):
+                setattr(reader, name, value)
+
+    def _find(self, stage):
+        """
+        Find a stage of the processing.
+
+        Args:
+            stage (str): The stage, see `STAGES`.
+        """
+        reader = self.reader
+        if stage == 'tof':
+            reader.find_tof()
+        elif stage == 'detector':
+            reader.detector_reconstruction(detector_blade_z=self.parameters['detector_blade_z'])
+        elif stage == 'lambda':
+            reader.tof_to_lambda()
+        elif stage == 'theta':
+            reader.find_theta(gravity=self.parameters['gravity'])
+        elif stage == 'qz':
+            reader.find_qz()
+        elif stage == 'masks':
+            reader.apply_masks(**{name: self.parameters[name] for name in _MASK_PARAMETERS})
+
+    def evaluate(self):
+        """
+        Find all of the stages that are out of date.
+
+        Returns:
+            (ESSReflReducer.read_amor.AmorDataReader): The processed reader, which is updated in place by later changes to the parameters.
+        """
+        self.evaluated = []
+        for stage in STAGES:
+            if stage not in self._valid:
+                self._find(stage)
+                self._valid.add(stage)
+                self.evaluated.append(stage)
+        return self.reader
+
+    def sweep(self, func, **values):
+        """
+        Evaluate a function of the processed events for a series of values of
+        one or more parameters. The events are read once, and only the stages
+        that depend on the swept parameters are found for each value. The
+        parameters are restored afterwards.
+
+        Args:
+            func (callable): Function taking the processed `AmorDataReader`, i.e. `lambda reader: AmorReducer(reference, reader, q_bins).reflectivity`.
+            values: A list of values for each swept parameter, all of the same length.
+
+        Returns:
+            (list): The output of `func` for each set of values.
+        """
+        lengths = {len(v) for v in values.values()}
+        if len(lengths) > 1:
+            raise ValueError("Each swept parameter must have the same number of values.")
+        original = {name: self.parameters[name] for name in values}
+        results = []
+        try:
+            for point in zip(*values.values()):
+                self.set(**dict(zip(values, point)))
+                results.append(func(self.evaluate()))
+        finally:
+            self.set(**original)
+        return results
@@ -0,0 +1,117 @@
+"""
+Normalisation by the reference in (wavelength, angle) space.
+
+Rather than dividing the qz histogram of the sample by that of the
+reference, each sample event is divided by the reference intensity in its
+(wavelength, angle) cell, so that the wavelength and angle dependence of the
+incident beam are removed separately. The normalised events are histogrammed
+in qz, giving the sum of the reflectivity of the cells in each qz bin, which
+is divided by the number of cells covering the bin, found from the geometry
+of the cells alone.
+"""
+
+import numpy as np
+from ESSReflReducer import engine
+
+
+def supermirror_reflectivity(qz):
+    """
+    The empirical reflectivity of the reference supermirror.
+
+    Args:
+        qz (array_like): The scattering vector, in reciprocal angstrom.
+
+    Returns:
+        (array_like): The reflectivity.
+    """
+    return -2.5510204081632653 * qz + 1.028061224489796
+
+
+def cell_centres(lambda_bins, theta_bins):
+    """
+    The wavelength and angle of the centre of each (wavelength, angle) cell.
+
+    Args:
+        lambda_bins (array_like): The wavelength bin edges, in metres.
+        theta_bins (array_like): The angle bin edges, in degrees of arc.
+
+    Returns:
+        (tuple of array_like): The wavelength and angle of each cell, broadcast to shape `(n_lambda, n_theta)`.
+    """
+    wavelength = lambda_bins[:-1] + 0.5 * np.diff(lambda_bins)
+    theta = theta_bins[:-1] + 0.5 * np.diff(theta_bins)
+    return np.meshgrid(wavelength, theta, indexing='ij')
+
+
+def reference_table(values, variances, lambda_bins, theta_bins):
+    """
+    The incident intensity in each cell, the reference intensity divided by
+    the supermirror reflectivity at the cell centre.
+
+    Args:
+        values (array_like): The reference intensity in each cell.
+        variances (array_like): The variance of the reference intensity.
+        lambda_bins (array_like): The wavelength bin edges, in metres.
+        theta_bins (array_like): The angle bin edges, in degrees of arc.
+
+    Returns:
+        (tuple of array_like): The incident intensity, and its variance, in each cell.
+    """
+    wavelength, theta = cell_centres(lambda_bins, theta_bins)
+    reflectivity = supermirror_reflectivity(engine.qz(theta, wavelength))
+    return values / reflectivity, variances / (reflectivity * reflectivity)
+
+
+def cell_fractions(lambda_bins, theta_bins, q_bins, n_sub=8):
+    """
+    The fraction of each (wavelength, angle) cell in each qz bin, found by
+    evaluating qz on a regular grid of points in each cell.
+
+    Args:
+        lambda_bins (array_like): The wavelength bin edges, in metres.
+        theta_bins (array_like): The angle bin edges, in degrees of arc.
+        q_bins (array_like): The qz bin edges, in reciprocal angstrom.
+        n_sub (int, optional): The number of points in each dimension of each cell. Defaults to 8.
+
+    Returns:
+        (array_like): The fractions, of shape `(n_lambda, n_theta, n_qz)`.
+    """
+    n_lambda = len(lambda_bins) - 1
+    n_theta = len(theta_bins) - 1
+    offsets = (np.arange(n_sub) + 0.5) / n_sub
+    wavelength = (lambda_bins[:-1, np.newaxis] + np.diff(lambda_bins)[:, np.newaxis] * offsets).ravel()
+    theta = (theta_bins[:-1, np.newaxis] + np.diff(theta_bins)[:, np.newaxis] * offsets).ravel()
+    cell = (np.arange(wavelength.size)[:, np.newaxis] // n_sub) * n_theta + np.arange(theta.size) // n_sub
+    qz = engine.qz(theta[np.newaxis, :], wavelength[:, np.newaxis])
+    counts, _ = engine.histogram_nd([cell.ravel(), qz.ravel()], [np.arange(n_lambda * n_theta + 1), q_bins])
+    return counts.reshape(n_lambda, n_theta, len(q_bins) - 1) / (n_sub * n_sub)
+
+
+def reflectivity(summed, summed_variances, cell_reflectivity, table, table_variances, fractions):
+    """
+    The reflectivity in each qz bin, the sum of the normalised events in the
+    bin divided by the number of cells covering the bin. The uncertainty of
+    the reference is propagated assuming the events are spread over each
+    cell as the grid of `cell_fractions` is.
+
+    Args:
+        summed (array_like): The sum of the normalised event weights in each qz bin.
+        summed_variances (array_like): The sum of the squared normalised event weights in each qz bin.
+        cell_reflectivity (array_like): The sum of the normalised event weights in each cell.
+        table (array_like): The incident intensity in each cell, see `reference_table`.
+        table_variances (array_like): The variance of the incident intensity in each cell.
+        fractions (array_like): The fraction of each cell in each qz bin, see `cell_fractions`.
+
+    Returns:
+        (tuple of array_like): The reflectivity, and its variance, in each qz bin, `nan` where no cell with a reference intensity covers the bin.
+    """
+    valid = table > 0
+    fractions = fractions * valid[..., np.newaxis]
+    coverage = fractions.sum(axis=(0, 1))
+    relative = np.zeros(table.shape)
+    relative[valid] = table_variances[valid] / (table[valid] * table[valid])
+    reference_variances = np.einsum('ijk,ij->k', fractions * fractions, cell_reflectivity * cell_reflectivity * relative)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = np.where(coverage > 0, summed / coverage, np.nan)
+        variances = np.where(coverage > 0, (summed_variances + reference_variances) / (coverage * coverage), np.nan)
+    return values, variances
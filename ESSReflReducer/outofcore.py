@@ -0,0 +1,169 @@
+"""
+Out-of-core reduction of runs with more events than fit in memory.
+
+The events are never read as a whole. Instead, the processing requested on
+the reader is recorded and replayed for each chunk of events, which is read
+lazily from the HDF5 file. The read, the transforms and the histogram of
+each chunk form one task, and the number of tasks in flight is bounded such
+that the chunks being processed fit in the memory budget.
+"""
+
+import math
+import numpy as np
+import h5py
+from ESSReflReducer import parallel
+from ESSReflReducer.read_amor import AmorDataReader
+
+#: The approximate memory needed for each event once all of the
+#: coordinates, attributes and masks of the reader have been computed in
+#: double precision. The counts of the events use no memory.
+BYTES_PER_EVENT = 128
+
+
+def lazy_dataset(dataset):
+    """
+    Get an array-like view of an HDF5 dataset that reads only the slices
+    that are requested. Contiguous, unfiltered datasets are memory-mapped,
+    while chunked or compressed datasets are read through h5py.
+
+    Args:
+        dataset (`h5py.Dataset`): The dataset.
+
+    Returns:
+        (`np.memmap` or `h5py.Dataset`): The lazy array.
+    """
+    offset = dataset.id.get_offset()
+    if dataset.chunks is None and dataset.compression is None and offset is not None:
+        return np.memmap(dataset.file.filename, mode='r', dtype=dataset.dtype, shape=dataset.shape, offset=offset)
+    return dataset
+
+
+class AmorOutOfCoreReader(AmorDataReader):
+    """
+    An AMOR data file read in chunks, which can be used in place of an
+    `AmorDataReader` by the `AmorReducer`.
+    """
+    def __init__(self, filename, memory_budget=2 ** 30, **kwargs):
+        """
+        Args:
+            filename (str): The .hdf file to be read.
+            memory_budget (int): Memory to use for the events being processed, in bytes. Optional, default `1 GiB`.
+            kwargs: The other arguments of `AmorDataReader`.
+        """
+        self.memory_budget = memory_budget
+        self._stages = []
+        super().__init__(filename, **kwargs)
+
+    def _read_events(self, f):
+        """
+        Find the number of events without reading them.
+
+        Args:
+            f (`h5py.File`): The open data file.
+        """
+        self.n_events = f['/experiment/data/event_id'].shape[0]
+
+    @property
+    def chunk_size(self):
+        """
+        The number of events in each chunk, such that `n_threads` chunks fit
+        in the memory budget.
+
+        Returns:
+            (int): Number of events per chunk.
+        """
+        bytes_per_event = BYTES_PER_EVENT * self.dtype.itemsize // 8
+        return max(1, self.memory_budget // (bytes_per_event * max(1, self.n_threads)))
+
+    def reorder(self, *args, **kwargs):
+        """
+        Record the reordering of the events of each chunk, see `AmorDataReader.reorder`.
+        """
+        self._stages.append(('reorder', args, kwargs))
+
+    def detector_reconstruction(self, *args, **kwargs):
+        """
+        Record the detector reconstruction, see `AmorDataReader.detector_reconstruction`.
+        """
+        self._stages.append(('detector_reconstruction', args, kwargs))
+
+    def tof_to_lambda(self, *args, **kwargs):
+        """
+        Record the wavelength conversion, see `AmorDataReader.tof_to_lambda`.
+        """
+        self._stages.append(('tof_to_lambda', args, kwargs))
+
+    def find_theta(self, *args, **kwargs):
+        """
+        Record the angle calculation, see `AmorDataReader.find_theta`.
+        """
+        self._stages.append(('find_theta', args, kwargs))
+
+    def find_qz(self, *args, **kwargs):
+        """
+        Record the qz calculation, see `AmorDataReader.find_qz`.
+        """
+        self._stages.append(('find_qz', args, kwargs))
+
+    def apply_masks(self, *args, **kwargs):
+        """
+        Record the masking, see `AmorDataReader.apply_masks`.
+        """
+        self._stages.append(('apply_masks', args, kwargs))
+
+    def _chunk(self, event_id, event_time_offset):
+        """
+        Create an in-memory reader for a chunk of events and apply the
+        recorded processing to it.
+
+        Args:
+            event_id (array_like): The detector pixel id of each event in the chunk.
+            event_time_offset (array_like): The time of each event since the pulse, in nanoseconds.
+
+        Returns:
+            (ESSReflReducer.read_amor.AmorDataReader): The processed chunk.
+        """
+        chunk = AmorDataReader.__new__(AmorDataReader)
+        chunk.__dict__.update({k: v for k, v in self.__dict__.items() if k != '_stages'})
+        chunk.n_threads = 1
+        chunk._set_events(np.asarray(event_id), np.asarray(event_time_offset))
+        for name, args, kwargs in self._stages:
+            getattr(chunk, name)(*args, **kwargs)
+        return chunk
+
+    def template(self):
+        """
+        Get a reader with all of the processing steps applied, whose
+        attributes describe the geometry and the masks. This is the recorded
+        processing replayed on no events.
+
+        Returns:
+            (ESSReflReducer.read_amor.AmorDataReader): The processed reader.
+        """
+        return self._chunk(np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint32))
+
+    def map_chunks(self, func):
+        """
+        Apply a function to each chunk of events and sum the results. The
+        chunks are processed on `n_threads` threads, with at most
+        `n_threads` chunks in memory at once.
+
+        Args:
+            func (callable): Function taking an `AmorDataReader` and returning an array, or a tuple of arrays, that can be summed over chunks.
+
+        Returns:
+            (array_like or tuple of array_like): The summed output of `func`.
+        """
+        n_chunks = math.ceil(self.n_events / self.chunk_size)
+        with h5py.File(self.filename, 'r') as f:
+            event_id = lazy_dataset(f['/experiment/data/event_id'])
+            event_time_offset = lazy_dataset(f['/experiment/data/event_time_offset'])
+
+            def task(block):
+                chunk = self._chunk(event_id[block], event_time_offset[block])
+                chunk.first_event = block.start
+                return func(chunk)
+
+            # An empty file is one empty chunk, so that func gives results of the right shape.
+            blocks = parallel.block_slices(self.n_events, n_chunks) or [slice(0, 0)]
+            return parallel.reduce_tasks(task, blocks, self.n_threads)
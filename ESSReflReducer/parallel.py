@@ -0,0 +1,163 @@
+"""
+Threaded execution of the event kernels over contiguous blocks of events.
+
+numpy releases the GIL for large elementwise operations, so running the
+kernels in :py:mod:`ESSReflReducer.engine` on separate blocks from a thread
+pool uses multiple cores without copying the event arrays.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+#: The smallest number of events worth giving to a thread.
+MIN_BLOCK_SIZE = 2 ** 16
+#: The number of blocks given to each thread, to even out the load.
+BLOCKS_PER_THREAD = 4
+
+
+def block_slices(n_events, n_blocks):
+    """
+    Split a number of events into contiguous blocks.
+
+    Args:
+        n_events (int): The number of events.
+        n_blocks (int): The number of blocks.
+
+    Returns:
+        (list of slice): The slice for each block, empty blocks are dropped.
+    """
+    bounds = np.linspace(0, n_events, n_blocks + 1).astype(int)
+    return [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+
+def _slices_for(n_events, n_threads):
+    """
+    Get the blocks for a given number of threads.
+
+    Args:
+        n_events (int): The number of events.
+        n_threads (int): The number of threads.
+
+    Returns:
+        (list of slice): The slice for each block.
+    """
+    n_blocks = min(n_threads * BLOCKS_PER_THREAD, max(1, n_events // MIN_BLOCK_SIZE))
+    return block_slices(n_events, n_blocks)
+
+
+def _take(arrays, block):
+    """
+    Get a block of each of the arrays, passing `None` through.
+    """
+    return [None if a is None else a[block] for a in arrays]
+
+
+def _as_tuple(result):
+    """
+    Wrap a single result in a tuple.
+    """
+    if isinstance(result, tuple):
+        return result
+    return (result,)
+
+
+def map_blocks(func, arrays, n_threads=1):
+    """
+    Apply an elementwise function to blocks of events, collecting the
+    per-event outputs into arrays of the full length.
+
+    Args:
+        func (callable): Function taking a block of each of the arrays and returning an array, or a tuple of arrays, with one value per event.
+        arrays (list of array_like): The per-event inputs, these must have the same length.
+        n_threads (int, optional): The number of threads to use. Defaults to 1.
+
+    Returns:
+        (array_like or tuple of array_like): The output(s) of `func` for all events.
+    """
+    n_events = len(arrays[0])
+    slices = _slices_for(n_events, n_threads)
+    if n_threads <= 1 or len(slices) < 2:
+        return func(*arrays)
+    first = func(*_take(arrays, slices[0]))
+    outputs = [np.empty(n_events, dtype=np.asarray(f).dtype) for f in _as_tuple(first)]
+    for output, f in zip(outputs, _as_tuple(first)):
+        output[slices[0]] = f
+
+    def run(block):
+        for output, r in zip(outputs, _as_tuple(func(*_take(arrays, block)))):
+            output[block] = r
+
+    with ThreadPoolExecutor(max_workers=n_threads) as pool:
+        list(pool.map(run, slices[1:]))
+    if isinstance(first, tuple):
+        return tuple(outputs)
+    return outputs[0]
+
+
+def reduce_blocks(func, arrays, n_threads=1):
+    """
+    Apply a function that produces partial results, such as histograms, to
+    blocks of events and sum the partial results.
+
+    Args:
+        func (callable): Function taking a block of each of the arrays and returning an array, or a tuple of arrays, that can be summed over blocks.
+        arrays (list of array_like): The per-event inputs, these must have the same length. `None` entries are passed on as `None`.
+        n_threads (int, optional): The number of threads to use. Defaults to 1.
+
+    Returns:
+        (array_like or tuple of array_like): The summed output(s) of `func`.
+    """
+    n_events = len(next(a for a in arrays if a is not None))
+    slices = _slices_for(n_events, n_threads)
+    if n_threads <= 1 or len(slices) < 2:
+        return func(*arrays)
+    return reduce_tasks(lambda block: func(*_take(arrays, block)), slices, n_threads)
+
+
+def reduce_tasks(func, items, n_threads=1, max_in_flight=None):
+    """
+    Apply a function to each item on a thread pool and sum the results,
+    keeping a bounded number of tasks in flight so that the memory held by
+    pending tasks is limited.
+
+    Args:
+        func (callable): Function taking an item and returning an array, or a tuple of arrays, that can be summed over items.
+        items (iterable): The items, e.g. blocks or chunks of events. There must be at least one, for the shape of the sum to be known.
+        n_threads (int, optional): The number of threads to use. Defaults to 1.
+        max_in_flight (int, optional): The largest number of submitted but unfinished tasks. Defaults to `n_threads`.
+
+    Returns:
+        (array_like or tuple of array_like): The summed output(s) of `func`.
+    """
+    if max_in_flight is None:
+        max_in_flight = n_threads
+    total = None
+    is_tuple = False
+
+    def accumulate(result):
+        nonlocal total, is_tuple
+        if total is None:
+            is_tuple = isinstance(result, tuple)
+            total = [np.array(r, copy=True) for r in _as_tuple(result)]
+        else:
+            for t, r in zip(total, _as_tuple(result)):
+                t += r
+
+    if n_threads <= 1:
+        for item in items:
+            accumulate(func(item))
+    else:
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=n_threads) as pool:
+            for item in items:
+                if len(pending) >= max_in_flight:
+                    accumulate(pending.popleft().result())
+                pending.append(pool.submit(func, item))
+            while pending:
+                accumulate(pending.popleft().result())
+    if total is None:
+        raise ValueError("There are no items to reduce, the shape of the result is unknown.")
+    if is_tuple:
+        return tuple(total)
+    return total[0]
@@ -0,0 +1,147 @@
+"""
+Reduction of polarised measurements, where each event belongs to one of the
+four spin channels.
+
+The events of all channels are held by one reader, with a `spin` coordinate
+giving the channel of each event. The geometry and event transforms are
+therefore found once, and the histograms of all channels are filled in one
+pass, by including the channel as a dimension of the histogram.
+"""
+
+import numpy as np
+import h5py
+import scipp as sc
+from ESSReflReducer import chunked
+from ESSReflReducer.header import Probe
+from ESSReflReducer.read_amor import AmorDataReader, HistogramSpec, _histograms, supermirror
+
+#: The spin channels, as (polariser, analyser) flipper states, where `+`
+#: is a flipper that is off and `-` a flipper that is on.
+CHANNELS = ['++', '+-', '-+', '--']
+#: The ORSO name of each spin channel.
+ORSO_POLARISATION = {'++': 'pp', '+-': 'pm', '-+': 'mp', '--': 'mm'}
+
+
+def pulse_channels(pulse_time, polariser_log=None, analyser_log=None):
+    """
+    Find the spin channel of each pulse from the flipper state logs. The
+    state of a flipper at a pulse is the last logged value at, or before,
+    the pulse.
+
+    Args:
+        pulse_time (array_like): The time of each pulse.
+        polariser_log (tuple of array_like, optional): The times and values of the polariser flipper log, in the same time base as `pulse_time`. Defaults to a flipper that is always off.
+        analyser_log (tuple of array_like, optional): The times and values of the analyser flipper log. Defaults to a flipper that is always off.
+
+    Returns:
+        (array_like): The index in `CHANNELS` of each pulse.
+    """
+    channel = np.zeros(len(pulse_time), dtype=np.int32)
+    for bit, log in ((2, polariser_log), (1, analyser_log)):
+        if log is None:
+            continue
+        time, value = log
+        i = np.clip(np.searchsorted(time, pulse_time, side='right') - 1, 0, None)
+        channel += np.int32(bit) * (np.asarray(value)[i] != 0).astype(np.int32)
+    return channel
+
+
+def event_channels(pulse_channel, event_index, n_events):
+    """
+    Give each event the spin channel of its pulse.
+
+    Args:
+        pulse_channel (array_like): The index in `CHANNELS` of each pulse.
+        event_index (array_like): The index of the first event of each pulse.
+        n_events (int): The number of events.
+
+    Returns:
+        (array_like): The index in `CHANNELS` of each event.
+    """
+    events_per_pulse = np.diff(np.append(event_index, n_events).astype(np.int64))
+    return np.repeat(pulse_channel, events_per_pulse)
+
+
+class AmorPolarisedReader(AmorDataReader):
+    """
+    A polarised AMOR measurement, from either a single file with flipper
+    state logs or one file for each spin channel.
+    """
+    def __init__(self, filename, polariser_log=None, analyser_log=None,
+                 **kwargs):
+        """
+        Args:
+            filename (str or dict): The .hdf file with the flipper logs, or a dictionary of the .hdf file for each spin channel, e.g. `{'++': 'a.hdf', '--': 'b.hdf'}`.
+            polariser_log (str): Path of the polariser flipper NXlog, with `time` and `value` datasets in the time base of `event_time_zero`. Optional, default a flipper that is always off.
+            analyser_log (str): Path of the analyser flipper NXlog. Optional, default a flipper that is always off.
+            kwargs: The other arguments of `AmorDataReader`.
+        """
+        self.channel_files = filename if isinstance(filename, dict) else None
+        self.polariser_log = polariser_log
+        self.analyser_log = analyser_log
+        if self.channel_files is not None:
+            filename = next(iter(self.channel_files.values()))
+        super().__init__(filename, **kwargs)
+
+    def _read_events(self, f):
+        """
+        Read all of the events and find the spin channel of each, along with
+        the monitor of each channel.
+
+        Args:
+            f (`h5py.File`): The open data file.
+        """
+        self.channel_monitor = np.zeros(len(CHANNELS))
+        if self.channel_files is None:
+            event_id = chunked.read(f['/experiment/data/event_id'], self.n_threads)
+            pulse_channel = pulse_channels(f['/experiment/data/event_time_zero'][:], *[
+                None if log is None else (f[log + '/time'][:], f[log + '/value'][:]) for log in (self.polariser_log, self.analyser_log)])
+            channel = event_channels(pulse_channel, f['/experiment/data/event_index'][:], len(event_id))
+            self.channel_monitor += self.monitor * np.bincount(pulse_channel, minlength=len(CHANNELS)) / len(pulse_channel)
+            self._set_events(event_id, chunked.read(f['/experiment/data/event_time_offset'], self.n_threads))
+        else:
+            event_id, event_time_offset, channel, n_pulses = [], [], [], []
+            for label, filename in self.channel_files.items():
+                with h5py.File(filename, 'r') as g:
+                    event_id.append(chunked.read(g['/experiment/data/event_id'], self.n_threads))
+                    event_time_offset.append(chunked.read(g['/experiment/data/event_time_offset'], self.n_threads))
+                    self.channel_monitor[CHANNELS.index(label)] += self._read_monitor(g)
+                    n_pulses.append(self._read_pulses(g)[1])
+                channel.append(np.full(len(event_id[-1]), CHANNELS.index(label), dtype=np.int32))
+            self.monitor = float(self.channel_monitor.sum())
+            # The pulses of the files are not merged, so a dead-time correction uses the mean rates.
+            self.event_index = None
+            self.n_pulses = sum(n_pulses)
+            self._set_events(np.concatenate(event_id), np.concatenate(event_time_offset))
+            channel = np.concatenate(channel)
+        self.data.coords['spin'] = sc.Variable(values=channel, dims=['event'])
+
+
+class AmorPolarisedReducer:
+    """
+    Reduction of polarised AMOR data, normalising every spin channel by the
+    same reference.
+    """
+    def __init__(self, reference, data, q_bins, n_threads=None, dtype=None):
+        """
+        Args:
+            reference (ESSReflReducer.read_amor.AmorDataReader): The reference data.
+            data (ESSReflReducer.polarisation.AmorPolarisedReader): The polarised measurement.
+            q_bins (array_like): The qz bin edges, in reciprocal angstrom.
+            n_threads (int): Number of threads used to histogram the events. Optional, defaults to the value of each reader.
+            dtype (`np.dtype`): Floating point precision of the per-event weights. Optional, defaults to the precision of each reader.
+        """
+        self.reference = reference
+        self.data = data
+        reference_intensity = _histograms(reference, {'qz': HistogramSpec({'qz': q_bins}, illumination=True)}, n_threads, dtype)['qz']
+        self.reference_intensity = reference_intensity / supermirror(q_bins)
+        spec = HistogramSpec({'spin': np.arange(len(CHANNELS) + 1), 'qz': q_bins}, illumination=True)
+        intensity = _histograms(data, {'qz': spec}, n_threads, dtype)['qz']
+        self.data_intensity = {}
+        self.reflectivity = {}
+        self.probes = {}
+        for i, label in enumerate(CHANNELS):
+            if data.channel_monitor[i] > 0:
+                self.data_intensity[label] = intensity['spin', i] * (float(data.monitor / data.channel_monitor[i]) * sc.units.dimensionless)
+                self.reflectivity[label] = self.data_intensity[label] / self.reference_intensity
+                self.probes[label] = Probe('neutron', polarisation=ORSO_POLARISATION[label])
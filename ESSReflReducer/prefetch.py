@@ -0,0 +1,130 @@
+"""
+Reading the next files of a series on a background thread, while the
+current file is processed.
+
+Reading the events, and decompressing them, releases the GIL for most of the
+time, so a single background thread can hide the time spent waiting on the
+storage behind the transforms and histograms of the previous file. The
+number of files read ahead is bounded, to bound the memory used.
+"""
+
+import queue
+import threading
+import time
+from ESSReflReducer.read_amor import AmorDataReader, AmorReducer
+
+
+class Prefetcher:
+    """
+    An iterator over the readers for a series of files, where the next
+    files are read on a background thread.
+    """
+    def __init__(self, filenames, load=AmorDataReader, depth=1, **kwargs):
+        """
+        Args:
+            filenames (list of str): The files, in the order they are needed.
+            load (callable): Function taking a filename, and `kwargs`, and returning the reader. Optional, default `AmorDataReader`.
+            depth (int): The largest number of files read ahead and waiting to be used. Optional, default `1`.
+            kwargs: Other arguments of `load`.
+        """
+        if depth < 1:
+            raise ValueError("The prefetch depth must be at least 1.")
+        self.filenames = list(filenames)
+        self.load = load
+        self.depth = depth
+        self.kwargs = kwargs
+        self.read_time = 0.
+        self.wait_time = 0.
+        self.total_time = 0.
+
+    def _read(self, queued, stop):
+        """
+        Read each file in turn, on the background thread, and queue the
+        readers, or the exception raised.
+        """
+        for filename in self.filenames:
+            start = time.perf_counter()
+            try:
+                item = (self.load(filename, **self.kwargs), None)
+            except Exception as error:
+                item = (None, error)
+            self.read_time += time.perf_counter() - start
+            while not stop.is_set():
+                try:
+                    queued.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            if stop.is_set() or item[1] is not None:
+                return
+
+    def __iter__(self):
+        queued = queue.Queue(maxsize=self.depth)
+        stop = threading.Event()
+        thread = threading.Thread(target=self._read, args=(queued, stop), daemon=True)
+        start = time.perf_counter()
+        thread.start()
+        try:
+            for _ in self.filenames:
+                wait = time.perf_counter()
+                reader, error = queued.get()
+                self.wait_time += time.perf_counter() - wait
+                if error is not None:
+                    raise error
+                yield reader
+        finally:
+            stop.set()
+            thread.join()
+            self.total_time += time.perf_counter() - start
+
+    @property
+    def efficiency(self):
+        """
+        The overlap efficiency, the fraction of the time spent reading that
+        was hidden behind the processing.
+
+        Returns:
+            (float): The efficiency, `1` when the processing never waited for a file.
+        """
+        if self.read_time == 0:
+            return 1.
+        return max(0., 1. - self.wait_time / self.read_time)
+
+    def report(self):
+        """
+        Summarise the time spent reading and waiting.
+
+        Returns:
+            (str): The summary.
+        """
+        return (f"{len(self.filenames)} files, read {self.read_time:.3f} s, waited {self.wait_time:.3f} s, "
+                f"total {self.total_time:.3f} s, overlap efficiency {self.efficiency:.1%}")
+
+
+def reduce_series(reference, filenames, q_bins, depth=1, gravity=True,
+                  reader_kwargs=None, mask_kwargs=None, **kwargs):
+    """
+    Reduce a series of measurements against the same reference, reading each
+    file while the previous one is reduced.
+
+    Args:
+        reference (ESSReflReducer.read_amor.AmorDataReader): The processed reference data.
+        filenames (list of str): The sample .hdf files.
+        q_bins (array_like or dict): The qz bin edges, in reciprocal angstrom, see `AmorReducer`.
+        depth (int, optional): The largest number of files read ahead. Defaults to 1.
+        gravity (bool, optional): Account for the gravitational drop of the neutrons. Defaults to `True`.
+        reader_kwargs (dict, optional): Other arguments for the `AmorDataReader` objects. Defaults to none.
+        mask_kwargs (dict, optional): Limits passed to `AmorDataReader.apply_masks`. Defaults to none.
+        kwargs: Other arguments of `AmorReducer`.
+
+    Returns:
+        (tuple): The `AmorReducer` for each file and the `Prefetcher`, which holds the timings.
+    """
+    reader_kwargs = {} if reader_kwargs is None else reader_kwargs
+    mask_kwargs = {} if mask_kwargs is None else mask_kwargs
+    prefetcher = Prefetcher(filenames, depth=depth, **reader_kwargs)
+    reductions = []
+    for reader in prefetcher:
+        reader.process(gravity=gravity, **mask_kwargs)
+        reductions.append(AmorReducer(reference, reader, q_bins, **kwargs))
+    return reductions, prefetcher
@@ -1,8 +1,10 @@
 import copy
+import os
+from collections import OrderedDict
+from functools import partial
 import numpy as np
-import h5py
-from ESSReflReducer import HDM
-from scipy.special import erf
+from ESSReflReducer import background, bootstrap, chunked, deadtime, engine, instrument, normalisation, parallel, resolution
+from ESSReflReducer.header import DataState
 from datetime import datetime
 import scipp as sc
 class Creator:
@@ -15,9 +17,15 @@ class Creator:
         Args:
             name (str): The name of the creator.
             affiliation (str or list of str): The affiliation(s) of the creator.
+            time (datetime.datetime): The date and time of the reduction. Optional, defaults to current date and time.
+            system (str): The machine name/IP address used for reduction. Optional, default `'Unknown'`.
         """
         self.name = name
         self.affiliation = affiliation
+        if time is None:
+            time = datetime.now()
+        self.time = time.strftime("%Y-%m-%d, %H:%M:%S")
+        self.system = system
 
 
 
@@ -25,12 +33,16 @@ class RawData:
     """
     This class will store the "raw" data from a reflectometry measurements.
     """
-    def __init__(self, filename, instru):
+    def __init__(self, filename, instru, **kwargs):
         """
         Args:
             filename (str): The raw data file name.
+            instru (str): The name of the instrument, i.e. 'AMOR', see `ESSReflReducer.instrument.register`.
+            kwargs: Settings of the reader, overriding the distances and chopper settings of the instrument.
         """
         self.filename = filename
+        self.instrument, reader = instrument.get(instru)
+        self.reader = reader(filename, instrument=self.instrument, **{**self.instrument.reader_kwargs(), **kwargs})
 
 
 
@@ -51,7 +63,8 @@ class AmorDataReader:
                  lambda_min=2.4e-10 * sc.units.m, lambda_max=None,
                  theta_min=0 * sc.units.deg, theta_max=180 * sc.units.deg,
                  sample_size=0.01 * sc.units.m, beam_size=0.001 * sc.units.m,
-                 gravity=True):
+                 gravity=True, n_threads=1, dtype=np.float64,
+                 instrument=instrument.AMOR):
         """
         Args:
             filename (str): The .hdf file to be read.
@@ -72,70 +85,285 @@ class AmorDataReader:
             theta_max (`sc.Variable`): Maximum cutoff for angle. Optional, default `180 degrees of arc`.
             sample_size (`sc.Variable`): Size of the sample in direction of the beam. Optional, default `0.01 m`.
             beam_size (`sc.Variable`): Size of the beam perpendicular to the scattering surface. Optional, default `0.001 m`.
+            n_threads (int): Number of threads used for the event transforms, masks and histograms. Optional, default `1`.
+            dtype (`np.dtype`): Floating point precision of the per-event values, `np.float32` halves the memory and bandwidth needed. Histograms are always accumulated in `np.float64`. Optional, default `np.float64`.
+            instrument (ESSReflReducer.instrument.Instrument): The detector layout. Optional, default `ESSReflReducer.instrument.AMOR`.
         """
+        import h5py
         f = h5py.File(filename, 'r')
+        self.filename = filename
+        # The file as it was read, so that the reader is still described if the file is later moved.
+        self.file_identity = (os.path.abspath(filename), os.path.getmtime(filename))
+        self.instrument = instrument
         self.detector_angle = detector_angle
         self.sample_detector_distance = sample_detector_distance
         self.chopper_detector_distance = chopper_detector_distance
+        self.chopper_phase = chopper_phase
+        self.lambda_cut = lambda_cut
         self.beam_size = beam_size
         self.sample_size = sample_size
+        self.n_threads = n_threads
+        self.dtype = np.dtype(dtype)
         self.title = (f['/experiment/title'][0]).decode("utf-8")
-        self.detector_pixel_id = f['/experiment/data/event_id'][:].astype(float)
-        self.event_time_offset = sc.Variable(values=f['/experiment/data/event_time_offset'][:].astype(float) / 1e9, unit=sc.units.s, dims=['event'])
         self.detector_angle_horizon = float(-1*f['/instrument/stages/com/value'][0]) * sc.units.deg
         self.sample_angle_horizon = float(f['/instrument/stages/som/value'][0]) * sc.units.deg + sample_angle_horizon_offset
         self.tau = 1 / (2 * chopper_speed)
+        self.monitor = self._read_monitor(f)
+        self.event_index, self.n_pulses = self._read_pulses(f)
+        self.dead_time = None
+        self.dead_time_factors = None
+        self._read_events(f)
+        f.close()
+
+    def _read_monitor(self, f):
+        """
+        Read the monitor, the integrated proton current or, if that is not
+        available, the measurement time.
+
+        Args:
+            f (`h5py.File`): The open data file.
+
+        Returns:
+            (float): The monitor.
+        """
         try:
-            self.monitor = float(sum(f['/experiment/proton_current/value'][:]) * self.tau)
+            return float(np.sum(f['/experiment/proton_current/value'][:])) * self.tau.value
         except KeyError:
-            self.monitor = (f['experiment/data/event_time_zero'][-1] - f['experiment/data/event_time_zero'][0]) / 1e9
-        f.close()
+            return (f['experiment/data/event_time_zero'][-1] - f['experiment/data/event_time_zero'][0]) / 1e9
+
+    def _read_pulses(self, f):
+        """
+        Read the index of the first event of each pulse, if the file has it,
+        and the number of pulses.
+
+        Args:
+            f (`h5py.File`): The open data file.
+
+        Returns:
+            (tuple): The index of the first event of each pulse, or `None`, and the number of pulses.
+        """
+        n_pulses = len(f['/experiment/data/event_time_zero'])
+        if '/experiment/data/event_index' not in f:
+            return None, n_pulses
+        return f['/experiment/data/event_index'][:], n_pulses
+
+    def _read_events(self, f):
+        """
+        Read all of the events from the file. Compressed events are
+        decompressed on `n_threads` threads.
+
+        Args:
+            f (`h5py.File`): The open data file.
+        """
+        self._set_events(chunked.read(f['/experiment/data/event_id'], self.n_threads), chunked.read(f['/experiment/data/event_time_offset'], self.n_threads))
+
+    def _set_events(self, event_id, event_time_offset):
+        """
+        Store the events and find the time-of-flight of each.
+
+        Args:
+            event_id (array_like): The detector pixel id of each event.
+            event_time_offset (array_like): The time of each event since the pulse, in nanoseconds.
+        """
+        self.detector_pixel_id = event_id.astype(self.dtype)
+        self.event_time_offset = sc.Variable(values=event_time_offset.astype(self.dtype) / self.dtype.type(1e9), unit=sc.units.s, dims=['event'])
         self.n_events = len(self.detector_pixel_id)
-        data = sc.broadcast(sc.Variable(value=1.0, variance=1.0, dtype=sc.dtype.float64), dims=['event'], shape=[self.n_events])
-        tof_offset = self.tau * chopper_phase / 180.
-        tof_e = self.event_time_offset
-        tof_cut = lambda_cut * chopper_detector_distance / HDM
-        tof_e = sc.Variable(values=np.remainder((tof_e - tof_cut + self.tau).values, self.tau.values), unit=sc.units.s, dims=['event']) + tof_cut + tof_offset
-        proto_events = {'data': data, 'coords': {'tof': tof_e}}
-        self.data = sc.DataArray(**proto_events)
+        self.first_event = 0
+        self.pixel_runs = None
+        self.event_order = None
+        self.data = sc.DataArray(data=_unit_counts(self.n_events))
+        self.find_tof()
+
+    def find_tof(self):
+        """
+        Find the time-of-flight of each event from the time since the pulse.
+        """
+        from ESSReflReducer import HDM
+        tof_offset = self.tau * self.chopper_phase / 180.
+        tof_cut = self.lambda_cut * self.chopper_detector_distance / HDM
+        reshuffle = partial(engine.reshuffle_tof, tau=self.tau.value, tof_cut=tof_cut.value, tof_offset=tof_offset.value)
+        self.data.coords['tof'] = sc.Variable(values=parallel.map_blocks(reshuffle, [self.event_time_offset.values], self.n_threads), unit=sc.units.s, dims=['event'])
 
     def detector_reconstruction(self,
-                                detector_blade_z=10.11e-3 * sc.units.m):
+                                detector_blade_z=None):
         """
         Generate the detector image for all data.
+
+        Args:
+            detector_blade_z (`sc.Variable`): Distance between detector blades. Optional, default the value of the instrument.
         """
-        detector_dz = (4.0e-3 * sc.units.m * sc.sin(self.detector_angle))
-        detector_zero = 2.5 * detector_blade_z
-        a, b = np.divmod(self.detector_pixel_id, 32*32)
-        c, d = np.divmod(b, 32)
-        self.data.attrs['blade-nr'] = sc.Variable(values=a, dims=['event'], dtype=float)
-        self.data.attrs['z-on-blade'] = sc.Variable(values=c, dims=['event'], dtype=float)
-        self.data.coords['y'] = sc.Variable(values=d * 1e-3, dims=['event'], dtype=float, unit=sc.units.m)
-        self.data.coords['z'] = detector_zero - self.data.attrs['blade-nr'] * detector_blade_z - self.data.attrs['z-on-blade'] * detector_dz
+        self.detector_geometry = self.instrument.detector_geometry(self.detector_angle, detector_blade_z)
+        reconstruct = partial(engine.detector_yz, **self.detector_geometry)
+        if self.pixel_runs is None:
+            a, c, y, z = parallel.map_blocks(reconstruct, [self.detector_pixel_id], self.n_threads)
+        else:
+            pixels, lengths = self.pixel_runs
+            a, c, y, z = [np.repeat(v, lengths) for v in reconstruct(pixels)]
+        self.data.coords['blade-nr'] = sc.Variable(values=a, dims=['event'])
+        self.data.coords['z-on-blade'] = sc.Variable(values=c, dims=['event'])
+        self.data.coords['y'] = sc.Variable(values=y, dims=['event'], unit=sc.units.m)
+        self.data.coords['z'] = sc.Variable(values=z, dims=['event'], unit=sc.units.m)
+
+    def reorder(self, by='pixel', n_tof_blocks=8):
+        """
+        Reorder the events by detector pixel, or by pixel and then by block of
+        the time since the pulse, with a counting sort, such that the later
+        per-pixel gathers and the histograms access memory mostly in
+        sequence. The pixel ids are then held as runs of equal ids, see
+        `pixel_ids`. The order of the events within a pulse is lost, so a
+        reordered reader with pulse indices cannot be corrected for dead time.
+
+        Args:
+            by (str): Either `'pixel'` or `'pixel_tof'`. Optional, default `'pixel'`.
+            n_tof_blocks (int): The number of blocks the chopper frame is split into for `'pixel_tof'`. Optional, default `8`.
+        """
+        if by not in ('pixel', 'pixel_tof'):
+            raise ValueError(f"Unknown event order {by!r}, expected 'pixel' or 'pixel_tof'.")
+        pixel_ids = self.pixel_ids()
+        key = pixel_ids.astype(np.int64)
+        n_keys = max(self.instrument.n_pixels, int(key.max(initial=0)) + 1)
+        if by == 'pixel_tof':
+            block = np.clip((self.event_time_offset.values * (n_tof_blocks / self.tau.value)).astype(np.int64), 0, n_tof_blocks - 1)
+            key = key * n_tof_blocks + block
+            n_keys *= n_tof_blocks
+        order = engine.counting_sort(key, n_keys)
+        self.pixel_runs = engine.run_lengths(pixel_ids[order])
+        self.detector_pixel_id = None
+        self.event_time_offset.values = self.event_time_offset.values[order]
+        for group in (self.data.coords, self.data.masks):
+            for name in list(group.keys()):
+                group[name].values = group[name].values[order]
+        if getattr(self, 'gravity_drop', None) is not None:
+            self.gravity_drop = self.gravity_drop[order]
+        self.event_order = by
+
+    def pixel_ids(self):
+        """
+        Get the detector pixel id of each event.
+
+        Returns:
+            (array_like): The pixel ids, expanded from the runs if the events were reordered.
+        """
+        if self.pixel_runs is None:
+            return self.detector_pixel_id
+        pixels, lengths = self.pixel_runs
+        return np.repeat(pixels, lengths)
+
+    def pixel_positions(self, n_blades=None):
+        """
+        Get the position of every pixel of the detector, as found by
+        `detector_reconstruction`.
+
+        Args:
+            n_blades (int): The number of detector blades. Optional, default the number of blades of the instrument.
+
+        Returns:
+            (tuple of array_like): The y- and z-position of each pixel, in metres.
+        """
+        if n_blades is None:
+            n_blades = self.instrument.n_blades
+        n_pixels = n_blades * self.instrument.n_wires * self.instrument.n_strips
+        _, _, y, z = engine.detector_yz(np.arange(n_pixels, dtype=float), **self.detector_geometry)
+        return y, z
 
     def tof_to_lambda(self):
         """
+        Convert the time-of-flight of each event to wavelength.
         """
-        detector_dx = (4.0e-3 * sc.units.m * sc.cos(self.detector_angle))
-        self.data.attrs['flight-path-length'] = self.chopper_detector_distance + self.data.attrs['z-on-blade'] * detector_dx + self.sample_detector_distance * (1./sc.cos(self.detector_angle_horizon)-1.)
-        self.data.coords['lambda'] = self.data.coords['tof'] * HDM / self.data.attrs['flight-path-length']
+        from ESSReflReducer import HDM
+        detector_dx = self.instrument.detector_dx(self.detector_angle)
+        path_offset = self.sample_detector_distance * (1./sc.cos(self.detector_angle_horizon)-1.)
+        convert = partial(engine.wavelength, chopper_detector_distance=self.chopper_detector_distance.value, detector_dx=detector_dx, path_offset=path_offset.value, hdm=HDM.value)
+        flight_path_length, wavelength = parallel.map_blocks(convert, [self.data.coords['tof'].values, self.data.coords['z-on-blade'].values], self.n_threads)
+        self.data.coords['flight-path-length'] = sc.Variable(values=flight_path_length, unit=sc.units.m, dims=['event'])
+        self.data.coords['lambda'] = sc.Variable(values=wavelength, unit=sc.units.m, dims=['event'])
 
     def find_theta(self, gravity=True):
         """
+        Find the reflected angle of each event.
+
+        Args:
+            gravity (bool): Account for the gravitational drop of the neutrons. Optional, default `True`.
         """
+        self.gravity = gravity
         if gravity:
-            self.gravity_drop = -3.07 * self.sample_detector_distance.values * self.sample_detector_distance.values * self.data.coords['lambda'].values * self.data.coords['lambda'].values
-            if self.sample_angle_horizon.values > 0:
-                theta = self.sample_angle_horizon.values + (np.degrees(np.arctan2(self.data.coords['z'].values, self.sample_detector_distance.values))) - (np.degrees(np.arctan2(self.gravity_drop, self.sample_detector_distance.values)))
-            else:
-                theta = -1 * self.sample_angle_horizon.values - (np.degrees(np.arctan2(self.data.coords['z'].values, self.sample_detector_distance.values))) + (np.degrees(np.arctan2(self.gravity_drop, self.sample_detector_distance.values)))
-            self.data.coords['theta'] = sc.Variable(values=theta, unit=sc.units.deg, dims=['event'])
+            find = partial(engine.theta_gravity, sample_detector_distance=self.sample_detector_distance.value, sample_angle_horizon=self.sample_angle_horizon.value)
+            self.gravity_drop, theta = parallel.map_blocks(find, [self.data.coords['z'].values, self.data.coords['lambda'].values], self.n_threads)
         else:
-            self.data.coords['theta'] = self.detector_angle_horizon - self.sample_angle_horizon + self.data.coords['z'] / self.sample_detector_distance * (180. * sc.units.deg) / np.pi
+            find = partial(engine.theta, sample_detector_distance=self.sample_detector_distance.value, detector_angle_horizon=self.detector_angle_horizon.value, sample_angle_horizon=self.sample_angle_horizon.value)
+            theta = parallel.map_blocks(find, [self.data.coords['z'].values], self.n_threads)
+        self.data.coords['theta'] = sc.Variable(values=theta, unit=sc.units.deg, dims=['event'])
+
+    def theta_of(self, z, wavelength):
+        """
+        Find the reflected angle for given detector z-positions and
+        wavelengths, in the same way as `find_theta`.
+
+        Args:
+            z (array_like): Detector z-positions, in metres.
+            wavelength (array_like): Wavelengths, in metres, broadcast against `z`.
+
+        Returns:
+            (array_like): The angles, in degrees of arc.
+        """
+        if self.gravity:
+            return engine.theta_gravity(z, wavelength, self.sample_detector_distance.value, self.sample_angle_horizon.value)[1]
+        theta = engine.theta(z, self.sample_detector_distance.value, self.detector_angle_horizon.value, self.sample_angle_horizon.value)
+        return np.broadcast_to(theta, np.broadcast(z, wavelength).shape)
+
+    def theta_range(self):
+        """
+        Find the range of angles of the events reaching the detector, from
+        the positions of the pixels and the limits of the wavelength mask.
+
+        Returns:
+            (tuple of float): The smallest and largest angle, in degrees of arc.
+        """
+        _, z = self.pixel_positions()
+        theta = self.theta_of(np.array([[z.min()], [z.max()]]), np.array(self.mask_limits['lambda']))
+        return float(theta.min()), float(theta.max())
+
+    def resolution_table(self, n_points=2049):
+        """
+        Tabulate the angular resolution, relative to the angle, over the
+        range of angles of the detector, from the beam and sample sizes, the
+        vertical size of a pixel and the sample-detector distance, see
+        `ESSReflReducer.resolution`.
+
+        Args:
+            n_points (int): The number of angles in the table. Optional, default `2049`.
+
+        Returns:
+            (ESSReflReducer.resolution.ThetaTable): The relative resolution, full width at half maximum.
+        """
+        theta_min, theta_max = self.theta_range()
+        relative = partial(resolution.relative_resolution, self.beam_size.value, self.sample_size.value,
+                           self.detector_geometry['detector_dz'], self.sample_detector_distance.value)
+        return resolution.ThetaTable.tabulate(relative, theta_min, theta_max, n_points)
+
+    def illumination_table(self, n_points=2049):
+        """
+        Tabulate the fraction of the beam illuminating the sample over the
+        range of angles of the detector, see
+        `ESSReflReducer.engine.illumination`, such that the illumination
+        correction of each event is gathered from the table.
+
+        Args:
+            n_points (int): The number of angles in the table. Optional, default `2049`.
+
+        Returns:
+            (ESSReflReducer.resolution.ThetaTable): The illuminated fraction.
+        """
+        theta_min, theta_max = self.theta_range()
+        fraction = partial(engine.illumination, self.beam_size.value, self.sample_size.value)
+        return resolution.ThetaTable.tabulate(fraction, theta_min, theta_max, n_points)
 
     def find_qz(self):
-        qz_m = 4. * np.pi * sc.sin(self.data.coords['theta']) / self.data.coords['lambda']
-        self.data.coords['qz'] = sc.Variable(values=qz_m.values * 1e-10, unit=(1 / sc.units.angstrom).unit, dims=['event'])
+        """
+        Find the scattering vector of each event.
+        """
+        qz = parallel.map_blocks(engine.qz, [self.data.coords['theta'].values, self.data.coords['lambda'].values], self.n_threads)
+        self.data.coords['qz'] = sc.Variable(values=qz, unit=(1 / sc.units.angstrom).unit, dims=['event'])
 
     def apply_masks(self, y_min=1e-3 * sc.units.m, y_max=29e-3 * sc.units.m,
                     lambda_min=2.4e-10 * sc.units.m, lambda_max=None,
@@ -143,46 +371,664 @@ class AmorDataReader:
         """
         Perform masking of data based on y-detector, wavelength and theta values.
         """
+        from ESSReflReducer import HDM
         if lambda_max is None:
             lambda_max = lambda_min + self.tau * HDM / self.chopper_detector_distance
         else:
             lambda_max = lambda_max
-        self.data.masks['y'] = (self.data.coords['y'] < y_min) | (self.data.coords['y'] > y_max)
-        self.data.masks['lambda'] = (self.data.coords['lambda'] < lambda_min) | (self.data.coords['lambda'] > lambda_max)
-        self.data.masks['theta'] = (self.data.coords['theta'] < theta_min) | (self.data.coords['theta'] > theta_max)
+        limits = {'y': (y_min, y_max), 'lambda': (lambda_min, lambda_max), 'theta': (theta_min, theta_max)}
+        self.mask_limits = {}
+        for name, (low, high) in limits.items():
+            coord = self.data.coords[name]
+            self.mask_limits[name] = (_magnitude(low, coord.unit), _magnitude(high, coord.unit))
+            mask = partial(engine.outside, low=self.mask_limits[name][0], high=self.mask_limits[name][1])
+            self.data.masks[name] = sc.Variable(values=parallel.map_blocks(mask, [coord.values], self.n_threads), dims=['event'])
+
+    def mask(self):
+        """
+        Get the combination of all of the masks.
+
+        Returns:
+            (array_like): `True` for events that are masked, or `None` if there are no masks.
+        """
+        combined = None
+        for mask in self.data.masks.values():
+            combined = mask.values if combined is None else combined | mask.values
+        return combined
+
+    def correct_dead_time(self, dead_time, model='non-paralysable', n_windows=1, region_pixels=None):
+        """
+        Find the dead-time correction of the events from the observed rate in
+        each pulse, detector region and time window. The correction is applied
+        as a weight of each event when the events are histogrammed. Without
+        the index of the first event of each pulse in the file, the rates are
+        averaged over the pulses.
+
+        Args:
+            dead_time (`sc.Variable`): The dead time of each detector region.
+            model (str): The dead-time model, one of `ESSReflReducer.deadtime.MODELS`. Optional, default `'non-paralysable'`.
+            n_windows (int): The number of time windows each pulse is split into. Optional, default `1`.
+            region_pixels (int): The number of consecutive pixels in each detector region. Optional, default one blade.
+        """
+        if region_pixels is None:
+            region_pixels = self.instrument.n_wires * self.instrument.n_strips
+        n_regions = -(-self.instrument.n_pixels // region_pixels)
+        n_pulses = 1 if self.event_index is None else len(self.event_index)
+        window_width = self.tau.value / n_windows
+        self.dead_time_factors = None
+        self.dead_time_binning = (region_pixels, n_regions, window_width, n_windows)
+        n_cells = n_pulses * n_regions * n_windows
+        counts = self.map_chunks(lambda chunk: parallel.reduce_blocks(
+            partial(deadtime.cell_counts, n_cells=n_cells), [chunk._dead_time_cells()], chunk.n_threads))
+        rate = counts.reshape(n_pulses, n_regions, n_windows) / (window_width * (self.n_pulses if self.event_index is None else 1))
+        self.dead_time_factors = deadtime.correction_factors(rate, _magnitude(dead_time, sc.units.s), model)
+        self.dead_time = f"corrected for a {model} dead time of {_magnitude(dead_time, sc.units.s)} s, from the rate in each pulse, {n_regions} detector regions and {n_windows} time windows"
+
+    def _dead_time_cells(self):
+        """
+        Find the (pulse, region, window) cell of each event for the
+        dead-time correction.
+
+        Returns:
+            (array_like): The flattened index of the cell of each event.
+        """
+        if self.event_index is None:
+            pulse = np.zeros(self.n_events, dtype=np.int32)
+        elif self.event_order is not None:
+            raise ValueError("The pulse of each event is not known once the events are reordered.")
+        else:
+            pulse = deadtime.event_pulses(self.event_index, self.first_event, self.n_events)
+        return deadtime.cell_index(pulse, self.pixel_ids(), self.event_time_offset.values, *self.dead_time_binning)
+
+    def dead_time_weights(self):
+        """
+        Get the dead-time correction of each event.
+
+        Returns:
+            (array_like): The correction factor of each event, or `None` if the events are not corrected.
+        """
+        if self.dead_time_factors is None:
+            return None
+        return self.dead_time_factors.ravel()[self._dead_time_cells()].astype(self.dtype)
+
+    def process(self, gravity=True, **mask_kwargs):
+        """
+        Run all of the processing steps, from the detector reconstruction to
+        the masking.
+
+        Args:
+            gravity (bool): Account for the gravitational drop of the neutrons. Optional, default `True`.
+            mask_kwargs: Limits passed to `apply_masks`.
+        """
+        self.detector_reconstruction()
+        self.tof_to_lambda()
+        self.find_theta(gravity=gravity)
+        self.find_qz()
+        self.apply_masks(**mask_kwargs)
+
+    def template(self):
+        """
+        Get a reader with all of the processing steps applied, whose
+        attributes describe the geometry and the masks. The events of this
+        reader are held in memory, so it is its own template.
+
+        Returns:
+            (ESSReflReducer.read_amor.AmorDataReader): The processed reader.
+        """
+        return self
+
+    def map_chunks(self, func):
+        """
+        Apply a function to the events. The events of this reader are held
+        in memory, so they form a single chunk.
+
+        Args:
+            func (callable): Function taking an `AmorDataReader` and returning an array, or a tuple of arrays, that can be summed over chunks.
+
+        Returns:
+            (array_like or tuple of array_like): The output of `func`.
+        """
+        return func(self)
+
+    def map_events(self, func, coords, n_threads=None):
+        """
+        Apply a function to blocks of events, given as arrays, and sum the
+        results over the blocks and chunks.
+
+        Args:
+            func (callable): Function taking the combined mask, the dead-time weights and the values of each of the coordinates of a block of events, and returning an array, or a tuple of arrays, that can be summed over blocks.
+            coords (list of str): The names of the coordinates.
+            n_threads (int): Number of threads. Optional, defaults to the value of each chunk.
+
+        Returns:
+            (array_like or tuple of array_like): The summed output of `func`.
+        """
+        def chunk_events(chunk):
+            threads = chunk.n_threads if n_threads is None else n_threads
+            return parallel.reduce_blocks(func, [chunk.mask(), chunk.dead_time_weights()] + [chunk.data.coords[c].values for c in coords], threads)
+
+        return self.map_chunks(chunk_events)
 
     def copy(self):
-        return copy.deepcopy(self)
+        """
+        Get a deep copy of the reader. The unit counts of the events are
+        broadcast again, rather than copied into an array.
+
+        Returns:
+            (ESSReflReducer.read_amor.AmorDataReader): The copy.
+        """
+        events = self.__dict__.pop('data', None)
+        try:
+            new = copy.deepcopy(self)
+        finally:
+            if events is not None:
+                self.data = events
+        if events is None:
+            return new
+        new.data = sc.DataArray(data=_unit_counts(self.n_events),
+                                coords={k: v.copy() for k, v in events.coords.items()},
+                                masks={k: v.copy() for k, v in events.masks.items()})
+        return new
 
 class AmorReducer:
     """
-    Reduction of AMOR data.
+    Reduction of AMOR data. The readers are histogrammed in place, rather
+    than copied, so they must not be changed during the reduction.
     """
-    def __init__(self, reference, data, q_bins):
+    def __init__(self, reference, data, q_bins, n_threads=None, dtype=None,
+                 lambda_theta_bins=None, detector_bins=None,
+                 background_regions=None, background_lambda_bins=None,
+                 reference_bins=None, qz_resolution=False):
         """
         Args:
             reference_list (list): List of `AmorDataReader` objects for the reference data.
             data_list (list): List of `AmorDataReader` objects for the measured data.
+            q_bins (array_like or dict): The qz bin edges, in reciprocal angstrom, or a dictionary of several binnings, i.e. `{'coarse': coarse_bins, 'fine': fine_bins}`, all found in the same pass over the events. For a dictionary, the intensities, reflectivities and backgrounds are dictionaries with the same keys.
+            n_threads (int): Number of threads used to histogram the events. Optional, defaults to the value of each reader.
+            dtype (`np.dtype`): Floating point precision of the per-event weights. Optional, defaults to the precision of each reader.
+            lambda_theta_bins (tuple of array_like): Wavelength bin edges, in metres, and angle bin edges, in degrees of arc, for a (lambda, theta) map, filled in the same pass as the qz histogram. Optional, default no map.
+            detector_bins (tuple of array_like): y and z bin edges, in metres, for a detector image, filled in the same pass as the qz histogram. Optional, default no image.
+            background_regions (list of tuple): The (y_min, y_max, z_min, z_max), in metres, of detector regions away from the specular ridge, used to estimate and subtract the background. The events in these regions are excluded from the qz histograms. Optional, default no background subtraction.
+            background_lambda_bins (array_like): Wavelength bin edges, in metres, for the background estimate. Optional, default 50 bins over the chopper frame.
+            reference_bins (tuple of array_like): Wavelength bin edges, in metres, and angle bin edges, in degrees of arc. If given, each sample event is normalised by the reference intensity in its (lambda, theta) cell, rather than normalising the qz histograms, and `reference_intensity` is the incident intensity in each cell. Optional, default normalisation in qz.
+            qz_resolution (bool): Find `qz_resolution`, the standard deviation of qz in each bin from the angular resolution of the sample events, averaged over the events in the bin, see `ESSReflReducer.read_amor.AmorDataReader.resolution_table`. Optional, default `False`.
         """
         self.reference_counts = 0
         self.reference_monitor = 0
         self.data_counts = 0
         self.data_monitor = 0
-        self.reference = reference.copy()
-        self.data = data.copy()
+        self.reference = reference
+        self.data = data
+        self.data_state = DataState()
+        binnings = q_bins if isinstance(q_bins, dict) else {None: q_bins}
+        # The background is projected onto the pixels outside of its regions, so their events are left out of the signal.
+        histograms = {('qz', name): HistogramSpec({'qz': bins}, illumination=True, excluded_regions=background_regions) for name, bins in binnings.items()}
+        if lambda_theta_bins is not None:
+            histograms['lambda_theta'] = HistogramSpec({'lambda': lambda_theta_bins[0], 'theta': lambda_theta_bins[1]})
+        if detector_bins is not None:
+            histograms['detector_image'] = HistogramSpec({'y': detector_bins[0], 'z': detector_bins[1]})
+        if background_regions is not None:
+            if background_lambda_bins is None:
+                background_lambda_bins = background.default_lambda_bins(self.data)
+            histograms['background'] = HistogramSpec({'lambda': background_lambda_bins}, regions=background_regions, masked=False)
+        reference_histograms = dict(histograms)
+        data_histograms = dict(histograms)
+        if reference_bins is not None:
+            if background_regions is not None:
+                raise ValueError("Background subtraction is not available with the (lambda, theta) normalisation.")
+            reference_bins = tuple(np.asarray(b, dtype=float) for b in reference_bins)
+            table, table_variances = _reference_table(self.reference, reference_bins, n_threads, dtype)
+            lookup = ({'lambda': reference_bins[0], 'theta': reference_bins[1]}, table)
+            for name, bins in binnings.items():
+                del reference_histograms['qz', name]
+                data_histograms['qz', name] = HistogramSpec({'qz': bins}, illumination=True, normalisation=lookup)
+            data_histograms['normalised'] = HistogramSpec(lookup[0], illumination=True, normalisation=lookup)
+            self.data_state.intensity = "normalised by the supermirror reference in (lambda, theta) cells"
+        if qz_resolution:
+            relative_resolution = self.data.template().resolution_table()
+            for name in binnings:
+                qz = data_histograms['qz', name]
+                data_histograms['resolution', name] = HistogramSpec(qz.edges, illumination=True, normalisation=qz.normalisation, factor=relative_resolution)
+            self.data_state.resolution = ("angular contribution only, from the height of the Gaussian beam on the sample and the pixel size, "
+                                          "averaged over the sample events in each qz bin")
+        self.data_state.footprint = (f"corrected for the fraction of a Gaussian beam of width {self.data.beam_size.value} m "
+                                     f"illuminating a sample of {self.data.sample_size.value} m, tabulated in angle")
+        dead_time = [f"{label} {reader.dead_time}" for label, reader in (('sample', self.data), ('reference', self.reference)) if reader.dead_time is not None]
+        if dead_time:
+            notes = [] if self.data_state.intensity is None else [self.data_state.intensity]
+            self.data_state.intensity = '; '.join(notes + dead_time)
         self.reference_counts += self.reference.n_events
         self.reference_monitor += self.reference.monitor
-        self.reference.data /= self.reference.monitor
-        self.reference.data /= sc.array(values=illumination_correction(self.reference.beam_size, self.reference.sample_size, self.reference.data.coords['theta']), dims=['event'])
-        reference_intensity = sc.histogram(self.reference.data, sc.Variable(values=q_bins, dims=['qz'], unit=(1 / sc.units.angstrom).unit))
-        supermirror = sc.Variable(values=(-2.5510204081632653 * (q_bins[:-1] + (0.5 * (np.diff(q_bins)))) + 1.028061224489796), dims=['qz'])
-        self.reference_intensity = reference_intensity / supermirror
+        reference_histograms = _histograms(self.reference, reference_histograms, n_threads, dtype)
         self.data_counts += self.data.n_events
         self.data_monitor += self.data.monitor
-        self.data.data /= self.data.monitor
-        self.data.data /= sc.array(values=illumination_correction(self.data.beam_size, self.data.sample_size, self.data.data.coords['theta']), dims=['event'])
-        self.data_intensity = sc.histogram(self.data.data, sc.Variable(values=q_bins, dims=['qz'], unit=(1 / sc.units.angstrom).unit))
-        self.reflectivity = self.data_intensity / self.reference_intensity
+        data_histograms = _histograms(self.data, data_histograms, n_threads, dtype)
+        self.reference_intensity = {}
+        self.data_intensity = {}
+        self.reflectivity = {}
+        self._resampling = {}
+        if qz_resolution:
+            self.qz_resolution = {}
+            for name, bins in binnings.items():
+                values = resolution.qz_resolution(bins, data_histograms['resolution', name].values, data_histograms['qz', name].values)
+                self.qz_resolution[name] = sc.Variable(values=values, dims=['qz'], unit=COORD_UNITS['qz'])
+        if background_regions is not None:
+            self.reference_background = {}
+            self.data_background = {}
+            self.data_state.background = f"subtracted, estimated from detector regions {list(background_regions)} scaled by pixel area"
+        for name, bins in binnings.items():
+            if reference_bins is not None:
+                self._normalise_cells(name, bins, data_histograms, reference_bins, table, table_variances)
+                continue
+            reference_qz = reference_histograms['qz', name]
+            data_qz = data_histograms['qz', name]
+            resampling = {'reference': (reference_qz.values, reference_qz.variances), 'data': (data_qz.values, data_qz.variances),
+                          'supermirror': supermirror(np.asarray(bins, dtype=float)).values}
+            if background_regions is not None:
+                self.reference_background[name] = _background(self.reference, reference_histograms, background_lambda_bins, background_regions, bins)
+                self.data_background[name] = _background(self.data, data_histograms, background_lambda_bins, background_regions, bins)
+                reference_qz = reference_qz - self.reference_background[name]
+                data_qz = data_qz - self.data_background[name]
+                resampling['reference_background'] = (self.reference_background[name].values, self.reference_background[name].variances)
+                resampling['data_background'] = (self.data_background[name].values, self.data_background[name].variances)
+            self._resampling[name] = partial(bootstrap.qz_replicates, **resampling)
+            self.reference_intensity[name] = reference_qz / supermirror(np.asarray(bins, dtype=float))
+            self.data_intensity[name] = data_qz
+            self.reflectivity[name] = self.data_intensity[name] / self.reference_intensity[name]
+        if not isinstance(q_bins, dict):
+            self._single_binning()
+        if lambda_theta_bins is not None:
+            self.reference_lambda_theta = reference_histograms['lambda_theta']
+            self.data_lambda_theta = data_histograms['lambda_theta']
+        if detector_bins is not None:
+            self.reference_detector_image = reference_histograms['detector_image']
+            self.data_detector_image = data_histograms['detector_image']
+
+    def _normalise_cells(self, name, q_bins, data_histograms, reference_bins, table, table_variances):
+        """
+        Find the reflectivity from the sample events normalised by the
+        reference intensity in their (lambda, theta) cell.
+
+        Args:
+            name (str): The name of the binning.
+            q_bins (array_like): The qz bin edges, in reciprocal angstrom.
+            data_histograms (dict of `sc.DataArray`): The histograms of the normalised sample events.
+            reference_bins (tuple of array_like): The wavelength and angle bin edges of the cells.
+            table (array_like): The incident intensity in each cell.
+            table_variances (array_like): The variance of the incident intensity in each cell.
+        """
+        q_bins = np.asarray(q_bins, dtype=float)
+        data_qz = data_histograms['qz', name]
+        fractions = normalisation.cell_fractions(reference_bins[0], reference_bins[1], q_bins)
+        values, variances = normalisation.reflectivity(data_qz.values, data_qz.variances, data_histograms['normalised'].values, table, table_variances, fractions)
+        self.reference_intensity[name] = HistogramSpec({'lambda': reference_bins[0], 'theta': reference_bins[1]}).to_data_array(table, table_variances)
+        self.data_intensity[name] = data_qz
+        self.reflectivity[name] = HistogramSpec({'qz': q_bins}).to_data_array(values, variances)
+        cells = data_histograms['normalised']
+        self._resampling[name] = partial(bootstrap.cell_replicates, values, (cells.values, cells.variances), (table, table_variances), fractions)
+
+    def bootstrap(self, n_replicates=200, seed=None):
+        """
+        Draw replicates of the reflectivity by resampling the histograms
+        before normalisation, including the reference and any background, see
+        `ESSReflReducer.bootstrap`. The spread of the replicates includes the
+        uncertainty of the whole normalisation chain, and
+        `ESSReflReducer.bootstrap.interval` gives credible intervals.
+
+        Args:
+            n_replicates (int): The number of replicates. Optional, default `200`.
+            seed (int): The seed of the random number generator. Optional, default a random seed.
+
+        Returns:
+            (array_like or dict of array_like): The reflectivity of each replicate, of shape `(n_replicates, n_qz)`, or a dictionary of these for several binnings.
+        """
+        rng = np.random.default_rng(seed)
+        replicates = {name: resample(n_replicates=n_replicates, rng=rng) for name, resample in self._resampling.items()}
+        if not isinstance(self.reflectivity, dict):
+            return replicates[None]
+        return replicates
+
+    def _single_binning(self):
+        """
+        Replace the dictionaries of results, keyed by binning, with the
+        result of the only binning.
+        """
+        for name in ['reference_intensity', 'data_intensity', 'reflectivity', 'qz_resolution', 'reference_background', 'data_background']:
+            if hasattr(self, name):
+                setattr(self, name, getattr(self, name)[None])
+
+    @classmethod
+    def from_cache(cls, reference, data, q_bins):
+        """
+        Reduce from the cached qz and weight of each event, without reading
+        or processing the events again.
+
+        Args:
+            reference (ESSReflReducer.cache.QzCache): The cached reference data.
+            data (ESSReflReducer.cache.QzCache): The cached measured data.
+            q_bins (array_like or dict): The qz bin edges, in reciprocal angstrom, or a dictionary of several binnings.
+
+        Returns:
+            (ESSReflReducer.read_amor.AmorReducer): The reduction, without the readers.
+        """
+        reducer = cls.__new__(cls)
+        reducer.reference = None
+        reducer.data = None
+        reducer.reference_counts = reference.n_events
+        reducer.data_counts = data.n_events
+        reducer.data_state = DataState()
+        reducer.reference_intensity = {}
+        reducer.data_intensity = {}
+        reducer.reflectivity = {}
+        reducer._resampling = {}
+        for name, bins in (q_bins if isinstance(q_bins, dict) else {None: q_bins}).items():
+            reference_qz = reference.histogram(bins)
+            reducer.reference_intensity[name] = reference_qz / supermirror(np.asarray(bins, dtype=float))
+            reducer.data_intensity[name] = data.histogram(bins)
+            reducer._resampling[name] = partial(bootstrap.qz_replicates, (reference_qz.values, reference_qz.variances),
+                                                (reducer.data_intensity[name].values, reducer.data_intensity[name].variances),
+                                                supermirror(np.asarray(bins, dtype=float)).values)
+            reducer.reflectivity[name] = reducer.data_intensity[name] / reducer.reference_intensity[name]
+        if not isinstance(q_bins, dict):
+            reducer._single_binning()
+        return reducer
+
+
+class HistogramSpec:
+    """
+    Description of a histogram filled in the pass over the events.
+    """
+    def __init__(self, edges, illumination=False, regions=None, masked=True,
+                 normalisation=None, factor=None, excluded_regions=None):
+        """
+        Args:
+            edges (dict): The bin edges for each coordinate.
+            illumination (bool): Correct each event for the illumination, as well as normalising by monitor. Optional, default `False`.
+            regions (list of tuple): Only include events within these (y_min, y_max, z_min, z_max) detector regions, in metres. Optional, default all events.
+            masked (bool): Exclude the masked events. Optional, default `True`.
+            normalisation (tuple): The bin edges for each coordinate, and a table with a value for each bin, dividing the weight of each event by the value in its bin. Events outside of the table, or in bins with no positive value, are excluded. Optional, default no normalisation.
+            factor (callable): Function of the angle of each event, such as an `ESSReflReducer.resolution.ThetaTable`, multiplying the weight of each event. Optional, default none.
+            excluded_regions (list of tuple): Exclude events within these (y_min, y_max, z_min, z_max) detector regions, in metres. Optional, default no events are excluded.
+        """
+        self.edges = {c: np.asarray(e, dtype=float) for c, e in edges.items()}
+        self.illumination = illumination
+        self.regions = regions
+        self.masked = masked
+        self.normalisation = normalisation
+        self.factor = factor
+        self.excluded_regions = excluded_regions
+
+    @property
+    def coords(self):
+        """
+        The event coordinates needed to fill the histogram.
+
+        Returns:
+            (set of str): The coordinate names.
+        """
+        coords = set(self.edges)
+        if self.illumination or self.factor is not None:
+            coords.add('theta')
+        if self.regions is not None or self.excluded_regions is not None:
+            coords.update(['y', 'z'])
+        if self.normalisation is not None:
+            coords.update(self.normalisation[0])
+        return coords
+
+    def fill(self, values, mask, monitor_weights, illumination_weights, found=None):
+        """
+        Histogram a block of events.
+
+        Args:
+            values (dict): The block of each event coordinate.
+            mask (array_like): The combined reader mask of the block, or `None`.
+            monitor_weights (array_like): The monitor normalisation of each event.
+            illumination_weights (array_like): The monitor normalisation and illumination correction of each event, or `None`.
+            found (dict): The bin indices and normalisations found so far for the block, reused by histograms sharing the same bin edges or normalisation, and added to. Optional, default nothing is reused.
+
+        Returns:
+            (tuple of array_like): The sum of the weights and squared weights in each bin.
+        """
+        exclude = mask if self.masked else None
+        if self.regions is not None:
+            outside = ~background.in_regions(values['y'], values['z'], self.regions)
+            exclude = outside if exclude is None else exclude | outside
+        if self.excluded_regions is not None:
+            inside = background.in_regions(values['y'], values['z'], self.excluded_regions)
+            exclude = inside if exclude is None else exclude | inside
+        weights = illumination_weights if self.illumination else monitor_weights
+        found = {} if found is None else found
+        if self.normalisation is not None:
+            edges, table = self.normalisation
+            if ('normalisation', id(self.normalisation)) not in found:
+                found['normalisation', id(self.normalisation)] = engine.lookup([values[c] for c in edges], list(edges.values()), table)
+            norm = found['normalisation', id(self.normalisation)]
+            invalid = ~(norm > 0)
+            exclude = invalid if exclude is None else exclude | invalid
+            with np.errstate(divide='ignore', invalid='ignore'):
+                weights = weights / norm
+        if self.factor is not None:
+            weights = weights * self.factor(values['theta'])
+        key = ('index',) + tuple((c, id(e)) for c, e in self.edges.items())
+        if key not in found:
+            found[key] = engine.ravel_index([values[c] for c in self.edges], list(self.edges.values()))
+        return engine.histogram_nd([values[c] for c in self.edges], list(self.edges.values()), weights=weights, mask=exclude, index=found[key])
+
+    def to_data_array(self, values, variances):
+        """
+        Create a `sc.DataArray` from the summed histogram.
+
+        Args:
+            values (array_like): The sum of the weights in each bin.
+            variances (array_like): The sum of the squared weights in each bin.
+
+        Returns:
+            (`sc.DataArray`): The histogram.
+        """
+        dims = list(self.edges)
+        return sc.DataArray(data=sc.Variable(values=values, variances=variances, dims=dims),
+                            coords={c: sc.Variable(values=e, dims=[c], unit=COORD_UNITS[c]) for c, e in self.edges.items()})
+
+
+def _unit_counts(n_events):
+    """
+    The count of each event, a single unit count broadcast to every event,
+    so that no memory is used for it. The events are never weighted in
+    place, the weights and the variances, from the sum of the squared
+    weights, are found when histogramming, see `HistogramSpec.fill`.
+
+    Args:
+        n_events (int): The number of events.
+
+    Returns:
+        (`sc.Variable`): The counts.
+    """
+    return sc.broadcast(sc.scalar(1.0, dtype='float64'), dims=['event'], shape=[n_events])
+
+
+def supermirror(q_bins):
+    """
+    The empirical reflectivity of the reference supermirror.
+
+    Args:
+        q_bins (array_like): The qz bin edges, in reciprocal angstrom.
+
+    Returns:
+        (`sc.Variable`): The supermirror reflectivity at the centre of each qz bin.
+    """
+    return sc.Variable(values=normalisation.supermirror_reflectivity(q_bins[:-1] + (0.5 * (np.diff(q_bins)))), dims=['qz'])
+
+
+def constant_resolution_bins(q_min, q_max, resolution):
+    """
+    qz bin edges with a constant relative width.
+
+    Args:
+        q_min (float): The lowest edge, in reciprocal angstrom.
+        q_max (float): The highest qz to cover, in reciprocal angstrom.
+        resolution (float): The width of each bin relative to its lower edge, dq/q.
+
+    Returns:
+        (array_like): The bin edges, the last edge is at or above `q_max`.
+    """
+    n_bins = int(np.ceil(np.log(q_max / q_min) / np.log1p(resolution)))
+    return q_min * (1 + resolution) ** np.arange(n_bins + 1)
+
+
+def _magnitude(variable, unit):
+    """
+    Get the value of a scalar, checking that it has the expected unit.
+
+    Args:
+        variable (`sc.Variable`): The scalar.
+        unit (`sc.Unit`): The expected unit.
+
+    Returns:
+        (float): The value of the scalar.
+    """
+    if variable.unit != unit:
+        raise ValueError(f"Expected a value in {unit}, got {variable.unit}.")
+    return variable.value
+
+
+#: The unit of each of the event coordinates that can be histogrammed.
+COORD_UNITS = {'qz': (1 / sc.units.angstrom).unit, 'lambda': sc.units.m,
+               'theta': sc.units.deg, 'y': sc.units.m, 'z': sc.units.m,
+               'tof': sc.units.s, 'spin': sc.units.dimensionless}
+
+
+def _histograms(reader, histograms, n_threads=None, dtype=None):
+    """
+    Fill all of the requested histograms in a single pass over the events.
+    Each chunk, and each block of events within a chunk, is histogrammed
+    separately and the partial histograms are summed, so the memory used
+    does not depend on the number of events.
+
+    Args:
+        reader (ESSReflReducer.read_amor.AmorDataReader): The data to histogram.
+        histograms (dict of ESSReflReducer.read_amor.HistogramSpec): The histograms to fill.
+        n_threads (int, optional): Number of threads. Defaults to the value of the reader.
+        dtype (`np.dtype`, optional): Precision of the per-event weights. Defaults to the precision of the reader.
+
+    Returns:
+        (dict of `sc.DataArray`): The histograms.
+    """
+    if not histograms:
+        return {}
+    if dtype is None:
+        dtype = reader.dtype
+    coords = sorted(set.union(*(h.coords for h in histograms.values())))
+    illumination = reader.template().illumination_table() if any(h.illumination for h in histograms.values()) else None
+    fill = partial(_block_histograms, coords=coords, histograms=list(histograms.values()), monitor=reader.monitor,
+                   illumination=illumination, dtype=dtype)
+    partials = reader.map_events(fill, coords, n_threads)
+    return {name: h.to_data_array(partials[2 * i], partials[2 * i + 1]) for i, (name, h) in enumerate(histograms.items())}
+
+
+def _block_histograms(mask, dead_time, *values, coords, histograms, monitor, illumination, dtype):
+    """
+    Fill the partial histograms of a block of events.
+
+    Args:
+        mask (array_like): `True` for events that are masked, or `None`.
+        dead_time (array_like): The dead-time correction of each event, or `None`.
+        values (array_like): The value of each of the coordinates for each event.
+        coords (list of str): The names of the coordinates.
+        histograms (list of ESSReflReducer.read_amor.HistogramSpec): The histograms to fill.
+        monitor (float): The monitor count of the events.
+        illumination (ESSReflReducer.resolution.ThetaTable): The illuminated fraction of the beam, see `AmorDataReader.illumination_table`, or `None` if no histogram is corrected for the illumination.
+        dtype (`np.dtype`): Precision of the per-event weights.
+
+    Returns:
+        (tuple of array_like): The values and variances of each histogram.
+    """
+    values = dict(zip(coords, values))
+    monitor_weights = np.full(len(next(iter(values.values()))), 1. / monitor, dtype=dtype)
+    if dead_time is not None:
+        monitor_weights *= dead_time
+    illumination_weights = None
+    if any(h.illumination for h in histograms):
+        illumination_weights = monitor_weights / illumination(values['theta']).astype(dtype, copy=False)
+    partials = []
+    found = {}
+    for h in histograms:
+        partials.extend(h.fill(values, mask, monitor_weights, illumination_weights, found))
+    return tuple(partials)
+
+
+#: The (lambda, theta) reference tables found so far, by the configuration
+#: of the reference and the cells.
+_REFERENCE_TABLES = OrderedDict()
+#: The largest number of reference tables kept.
+REFERENCE_CACHE_SIZE = 8
+
+
+def _configuration(reader):
+    """
+    Describe the events and the processing of a reader, such that readers
+    with the same description give the same histograms.
+
+    Args:
+        reader (ESSReflReducer.read_amor.AmorDataReader): The processed reader.
+
+    Returns:
+        (tuple): The description.
+    """
+    template = reader.template()
+    parameters = tuple(getattr(template, name).value for name in [
+        'tau', 'chopper_phase', 'lambda_cut', 'chopper_detector_distance', 'sample_detector_distance', 'detector_angle',
+        'detector_angle_horizon', 'sample_angle_horizon', 'beam_size', 'sample_size'])
+    return (reader.file_identity, reader.n_events, reader.monitor,
+            reader.dtype.str, template.gravity, tuple(sorted(template.mask_limits.items())), template.dead_time,
+            tuple(sorted(template.detector_geometry.items())), parameters)
+
+
+def _reference_table(reference, bins, n_threads=None, dtype=None):
+    """
+    Get the incident intensity in each (lambda, theta) cell from the
+    reference, reusing the table found for the same reference configuration.
+
+    Args:
+        reference (ESSReflReducer.read_amor.AmorDataReader): The processed reference data.
+        bins (tuple of array_like): The wavelength bin edges, in metres, and angle bin edges, in degrees of arc.
+        n_threads (int, optional): Number of threads. Defaults to the value of the reader.
+        dtype (`np.dtype`, optional): Precision of the per-event weights. Defaults to the precision of the reader.
+
+    Returns:
+        (tuple of array_like): The incident intensity, and its variance, in each cell.
+    """
+    key = (_configuration(reference), None if dtype is None else np.dtype(dtype).str, bins[0].tobytes(), bins[1].tobytes())
+    if key in _REFERENCE_TABLES:
+        _REFERENCE_TABLES.move_to_end(key)
+        return _REFERENCE_TABLES[key]
+    spec = HistogramSpec({'lambda': bins[0], 'theta': bins[1]}, illumination=True)
+    intensity = _histograms(reference, {'reference': spec}, n_threads, dtype)['reference']
+    table = normalisation.reference_table(intensity.values, intensity.variances, bins[0], bins[1])
+    _REFERENCE_TABLES[key] = table
+    if len(_REFERENCE_TABLES) > REFERENCE_CACHE_SIZE:
+        _REFERENCE_TABLES.popitem(last=False)
+    return table
+
+
+def _background(reader, histograms, lambda_bins, regions, q_bins):
+    """
+    Estimate the background in each qz bin from the wavelength histogram of
+    the background regions.
+
+    Args:
+        reader (ESSReflReducer.read_amor.AmorDataReader): The data.
+        histograms (dict of `sc.DataArray`): The histograms from the event pass, including `'background'`.
+        lambda_bins (array_like): The wavelength bin edges, in metres.
+        regions (list of tuple): The (y_min, y_max, z_min, z_max) of each region, in metres.
+        q_bins (array_like): The qz bin edges, in reciprocal angstrom.
+
+    Returns:
+        (`sc.DataArray`): The background in each qz bin.
+    """
+    counts = (histograms['background'].values, histograms['background'].variances)
+    values, variances = background.estimate(reader.template(), counts, np.asarray(lambda_bins, dtype=float), regions, np.asarray(q_bins, dtype=float))
+    return HistogramSpec({'qz': q_bins}).to_data_array(values, variances)
+
 
 def illumination_correction(beam_size, sample_size, theta):
     """
@@ -198,6 +1044,7 @@ def illumination_correction(beam_size, sample_size, theta):
     Returns:
         (:py:attr:`array_like`): Correction factor.
     """
-    sample_size_perp = sample_size * (theta * np.pi / (180 * sc.units.deg))
-    scale_factor = erf((sample_size_perp / beam_size * 2.35482).values)
-    return scale_factor
+    return engine.illumination(beam_size.value, sample_size.value, theta.values)
+
+
+instrument.register(instrument.AMOR, AmorDataReader)
@@ -0,0 +1,332 @@
+"""
+A regression gate for the reduction: every reduction path is compared
+against stored golden reflectivities, and the throughput of each stage
+against stored baselines.
+
+The golden reductions cover the paths with and without gravity, tighter
+masks, the (lambda, theta) normalisation and several qz binnings found in
+one pass. Each path, from in-memory, threaded, out-of-core, reordered,
+shared memory and cached events, must reproduce them to within a relative
+tolerance, so that an optimisation cannot change the physics unnoticed.
+"""
+
+import json
+import os
+import platform
+import tempfile
+import time
+import numpy as np
+import scipp as sc
+from ESSReflReducer import cache, synthetic
+from ESSReflReducer.outofcore import AmorOutOfCoreReader
+from ESSReflReducer.read_amor import AmorDataReader, AmorReducer
+from ESSReflReducer.sharedmem import AmorSharedReader
+from ESSReflReducer.validation import relative_deviation
+
+#: The qz binnings found in each reduction, in reciprocal angstrom.
+Q_BINS = {'coarse': np.linspace(0.005, 0.1, 51), 'fine': np.geomspace(0.005, 0.1, 201)}
+
+#: The reduction cases, with the arguments of `AmorDataReader.process` and of `AmorReducer`.
+CASES = {
+    'gravity': {'process': {'gravity': True}, 'reducer': {}},
+    'no-gravity': {'process': {'gravity': False}, 'reducer': {}},
+    'masked': {'process': {'gravity': True, 'y_min': 5e-3 * sc.units.m, 'y_max': 25e-3 * sc.units.m,
+                           'lambda_min': 4e-10 * sc.units.m, 'theta_max': 1.5 * sc.units.deg},
+               'reducer': {}},
+    'cells': {'process': {'gravity': True},
+              'reducer': {'reference_bins': (np.linspace(2.4e-10, 1.2e-9, 41), np.linspace(0., 3., 31))}},
+}
+
+#: The reduction paths, with the largest relative deviation from the golden reflectivity of each.
+PATHS = {'memory': 1e-9, 'threaded': 1e-9, 'out-of-core': 1e-9, 'reordered': 1e-9, 'shared': 1e-9, 'cache': 1e-7}
+
+#: The stages timed for the throughput baselines.
+STAGES = ['read', 'detector_reconstruction', 'tof_to_lambda', 'find_theta', 'find_qz', 'apply_masks', 'reduce']
+
+#: The largest fractional loss of throughput of any stage.
+THRESHOLD = 0.2
+
+
+def write_synthetic(directory, n_events=200000):
+    """
+    Write the synthetic reference and sample files of the golden reductions.
+
+    Args:
+        directory (str): The directory for the files.
+        n_events (int, optional): The number of events in the sample file. Defaults to 200000.
+
+    Returns:
+        (tuple of str): The reference and sample filenames.
+    """
+    reference = os.path.join(directory, 'reference.hdf')
+    sample = os.path.join(directory, 'sample.hdf')
+    synthetic.write_amor_file(reference, n_events=n_events // 2, seed=2)
+    synthetic.write_amor_file(sample, n_events=n_events, seed=1)
+    return reference, sample
+
+
+def _reader(path, filename, case):
+    """
+    Read and process a file for one reduction path.
+
+    Args:
+        path (str): One of `PATHS`.
+        filename (str): The .hdf file.
+        case (dict): One of `CASES`.
+
+    Returns:
+        (ESSReflReducer.read_amor.AmorDataReader): The processed reader.
+    """
+    if path == 'out-of-core':
+        # A small budget, so that the events are split into several chunks.
+        reader = AmorOutOfCoreReader(filename, memory_budget=2 ** 22, n_threads=2)
+    else:
+        reader = AmorDataReader(filename, n_threads=4 if path == 'threaded' else 1)
+    if path == 'reordered':
+        reader.reorder(by='pixel_tof')
+    reader.process(**case['process'])
+    if path == 'shared':
+        return AmorSharedReader(reader, n_processes=2)
+    return reader
+
+
+def reduce_path(path, reference_filename, data_filename, case):
+    """
+    Reduce a measurement along one path.
+
+    Args:
+        path (str): One of `PATHS`.
+        reference_filename (str): The reference .hdf file.
+        data_filename (str): The sample .hdf file.
+        case (dict): One of `CASES`.
+
+    Returns:
+        (dict of `sc.DataArray`): The reflectivity for each of the `Q_BINS`, or `None` if the path cannot reduce the case.
+    """
+    if path == 'cache' and case['reducer']:
+        return None
+    readers = [_reader(path, filename, case) for filename in [reference_filename, data_filename]]
+    try:
+        if path != 'cache':
+            return AmorReducer(readers[0], readers[1], Q_BINS, **case['reducer']).reflectivity
+        with tempfile.TemporaryDirectory() as directory:
+            caches = []
+            for i, reader in enumerate(readers):
+                filename = os.path.join(directory, f'{i}.npy')
+                cache.write_cache(reader, filename)
+                caches.append(cache.QzCache(filename, mmap_mode=None))
+            return AmorReducer.from_cache(caches[0], caches[1], Q_BINS).reflectivity
+    finally:
+        for reader in readers:
+            if isinstance(reader, AmorSharedReader):
+                reader.close()
+
+
+def flatten(reflectivity, case_name):
+    """
+    Get the arrays of the reflectivities of a case, as stored in a golden file.
+
+    Args:
+        reflectivity (dict of `sc.DataArray`): The reflectivity for each of the `Q_BINS`.
+        case_name (str): The name of the case.
+
+    Returns:
+        (dict of array_like): The values and variances, by `'<case>/<binning>/values'` and `'<case>/<binning>/variances'`.
+    """
+    arrays = {}
+    for binning, r in reflectivity.items():
+        arrays[f'{case_name}/{binning}/values'] = np.asarray(r.values, dtype=float)
+        arrays[f'{case_name}/{binning}/variances'] = np.asarray(r.variances, dtype=float)
+    return arrays
+
+
+def compare(arrays, golden, rtol):
+    """
+    Compare arrays with the golden arrays.
+
+    Args:
+        arrays (dict of array_like): The arrays under test, see `flatten`.
+        golden (dict of array_like): The golden arrays.
+        rtol (float): The largest relative deviation.
+
+    Returns:
+        (dict of float): The largest relative deviation of each array that fails, `inf` if it is missing from the golden arrays or has a different shape, or a value is finite in one and not the other.
+    """
+    failures = {}
+    for key, values in arrays.items():
+        if key not in golden or np.shape(golden[key]) != np.shape(values):
+            failures[key] = np.inf
+            continue
+        target = np.asarray(golden[key], dtype=float)
+        if np.any(np.isfinite(values) != np.isfinite(target)):
+            failures[key] = np.inf
+            continue
+        deviation = relative_deviation(values, target)
+        worst = np.nanmax(deviation) if np.isfinite(deviation).any() else 0.
+        if worst > rtol:
+            failures[key] = worst
+    return failures
+
+
+def golden_reductions(reference_filename, data_filename):
+    """
+    Reduce every case along the in-memory path, the reference for the
+    other paths.
+
+    Args:
+        reference_filename (str): The reference .hdf file.
+        data_filename (str): The sample .hdf file.
+
+    Returns:
+        (dict of array_like): The golden arrays, see `flatten`.
+    """
+    golden = {}
+    for name, case in CASES.items():
+        golden.update(flatten(reduce_path('memory', reference_filename, data_filename, case), name))
+    return golden
+
+
+def check_paths(reference_filename, data_filename, golden, paths=None):
+    """
+    Reduce every case along every path and compare with the golden arrays.
+
+    Args:
+        reference_filename (str): The reference .hdf file.
+        data_filename (str): The sample .hdf file.
+        golden (dict of array_like): The golden arrays, see `golden_reductions`.
+        paths (list of str, optional): The paths to check. Defaults to all of `PATHS`.
+
+    Returns:
+        (dict of float): The failures, by `'<path>:<case>/<binning>/<values or variances>'`, see `compare`.
+    """
+    failures = {}
+    for path in PATHS if paths is None else paths:
+        for name, case in CASES.items():
+            reflectivity = reduce_path(path, reference_filename, data_filename, case)
+            if reflectivity is None:
+                continue
+            for key, worst in compare(flatten(reflectivity, name), golden, PATHS[path]).items():
+                failures[f'{path}:{key}'] = worst
+    return failures
+
+
+def stage_timings(reference_filename, data_filename, repeats=3):
+    """
+    Time each stage of the in-memory reduction of the sample.
+
+    Args:
+        reference_filename (str): The reference .hdf file.
+        data_filename (str): The sample .hdf file.
+        repeats (int, optional): The number of reductions, the fastest time of each stage is kept. Defaults to 3.
+
+    Returns:
+        (tuple): The time of each stage, in seconds, and the number of sample events.
+    """
+    reference = AmorDataReader(reference_filename)
+    reference.process()
+    best = {}
+    for _ in range(repeats):
+        times = {}
+        start = time.perf_counter()
+        reader = AmorDataReader(data_filename)
+        times['read'] = time.perf_counter() - start
+        for stage in STAGES[1:-1]:
+            start = time.perf_counter()
+            getattr(reader, stage)()
+            times[stage] = time.perf_counter() - start
+        start = time.perf_counter()
+        AmorReducer(reference, reader, Q_BINS)
+        times['reduce'] = time.perf_counter() - start
+        best = {s: min(best.get(s, np.inf), t) for s, t in times.items()}
+    return best, reader.n_events
+
+
+def throughput(timings, n_events):
+    """
+    The number of events processed per second by each stage.
+
+    Args:
+        timings (dict of float): The time of each stage, in seconds.
+        n_events (int): The number of events.
+
+    Returns:
+        (dict of float): The events per second of each stage.
+    """
+    return {stage: n_events / max(t, 1e-9) for stage, t in timings.items()}
+
+
+def check_throughput(measured, baseline, threshold=THRESHOLD):
+    """
+    Compare the throughput of each stage with the baseline.
+
+    Args:
+        measured (dict of float): The events per second of each stage.
+        baseline (dict of float): The baseline events per second of each stage.
+        threshold (float, optional): The largest fractional loss of throughput. Defaults to `THRESHOLD`.
+
+    Returns:
+        (dict of float): The fractional loss of throughput of each stage slower than allowed.
+    """
+    failures = {}
+    for stage, rate in measured.items():
+        if stage in baseline:
+            loss = 1. - rate / baseline[stage]
+            if loss > threshold:
+                failures[stage] = loss
+    return failures
+
+
+def _cpu_model():
+    """
+    Find the model name of the processor.
+
+    Returns:
+        (str): The model name, from `/proc/cpuinfo` where there is one, or the processor architecture.
+    """
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    return line.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def machine():
+    """
+    Describe the machine, so that baselines from another machine are
+    recognised. Only the processor is described, so that the description
+    does not change with kernel or library updates.
+
+    Returns:
+        (dict): The processor model and count.
+    """
+    return {'cpu': _cpu_model(), 'cpu_count': os.cpu_count()}
+
+
+def save_baseline(filename, rates, n_events):
+    """
+    Write a throughput baseline.
+
+    Args:
+        filename (str): The `.json` file.
+        rates (dict of float): The events per second of each stage.
+        n_events (int): The number of events timed.
+    """
+    with open(filename, 'w') as f:
+        json.dump({'machine': machine(), 'n_events': n_events, 'events_per_second': rates}, f, indent=2, sort_keys=True)
+
+
+def load_baseline(filename):
+    """
+    Read a throughput baseline.
+
+    Args:
+        filename (str): The `.json` file.
+
+    Returns:
+        (dict): The `'machine'`, `'n_events'` and `'events_per_second'` of each stage.
+    """
+    with open(filename) as f:
+        return json.load(f)
@@ -0,0 +1,161 @@
+"""
+The illumination of the sample by the beam and the angular resolution of
+the reflected events.
+
+Both depend on the angle of an event only through the geometry: the beam
+and sample sizes, the vertical size of a detector pixel and the distance
+from the sample to the detector. They are therefore tabulated once, on a
+uniform grid of angles covering the detector, and gathered onto the events
+by linear interpolation, which costs a multiply-add for each event rather
+than the special functions and trigonometry of each event. The beam is the
+Gaussian of `ESSReflReducer.engine.illumination` throughout.
+"""
+
+import numpy as np
+
+#: The ratio of the full width at half maximum to the standard deviation of a Gaussian.
+FWHM = 2. * np.sqrt(2. * np.log(2.))
+
+
+class ThetaTable:
+    """
+    A function of the angle, tabulated on a uniform grid of angles.
+    """
+    def __init__(self, start, step, values):
+        """
+        Args:
+            start (float): The first angle of the grid, in degrees of arc.
+            step (float): The spacing of the grid, in degrees of arc.
+            values (array_like): The value of the function at each angle of the grid.
+        """
+        self.start = start
+        self.step = step
+        self.values = np.asarray(values, dtype=float)
+        self.slopes = np.diff(self.values)
+
+    @classmethod
+    def tabulate(cls, func, theta_min, theta_max, n_points=2049):
+        """
+        Tabulate a function between two angles.
+
+        Args:
+            func (callable): The function, taking an array of angles in degrees of arc.
+            theta_min (float): The smallest angle, in degrees of arc.
+            theta_max (float): The largest angle, in degrees of arc.
+            n_points (int, optional): The number of angles. Defaults to 2049.
+
+        Returns:
+            (ESSReflReducer.resolution.ThetaTable): The table.
+        """
+        theta = np.linspace(theta_min, theta_max, n_points)
+        return cls(theta_min, theta[1] - theta[0], func(theta))
+
+    def __call__(self, theta):
+        """
+        Gather the function onto the events, interpolating linearly between
+        the angles of the grid. Angles beyond the grid take the value at its
+        nearest end.
+
+        Args:
+            theta (array_like): The angle of each event, in degrees of arc.
+
+        Returns:
+            (array_like): The value of the function for each event.
+        """
+        position = np.subtract(theta, self.start, dtype=float)
+        position *= 1. / self.step
+        np.clip(position, 0, len(self.slopes), out=position)
+        index = position.astype(np.intp)
+        np.minimum(index, len(self.slopes) - 1, out=index)
+        position -= index
+        position *= self.slopes[index]
+        position += self.values[index]
+        return position
+
+
+def illuminated_height(beam_size, sample_size, theta):
+    """
+    The height of the reflected beam at the sample, as seen from the
+    detector. The Gaussian beam of `ESSReflReducer.engine.illumination` is
+    cut off by the height of the sample across the beam, and the height is
+    the full width at half maximum of a Gaussian with the standard deviation
+    of the cut off beam.
+
+    Args:
+        beam_size (float): Width of incident beam, in metres.
+        sample_size (float): Width of sample in the dimension of the beam, in metres.
+        theta (array_like): Incident angle, in degrees of arc.
+
+    Returns:
+        (array_like): The height, in metres, zero for angles that are not positive.
+    """
+    from scipy.special import erf
+    # The standard deviation for which the fraction of the beam within the height of the sample is `engine.illumination`.
+    sigma = beam_size / (2. * np.sqrt(2.) * FWHM)
+    half_height = 0.5 * np.maximum(sample_size * np.radians(theta), 0.) / sigma
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = erf(half_height / np.sqrt(2.))
+        truncated = 1. - 2. * half_height * np.exp(-0.5 * half_height * half_height) / (np.sqrt(2. * np.pi) * fraction)
+    # A short sample is illuminated evenly, avoiding the cancellation above.
+    variance = np.where(half_height > 1e-3, truncated, half_height * half_height / 3.)
+    return FWHM * sigma * np.sqrt(variance)
+
+
+def angular_resolution(beam_size, sample_size, pixel_size, distance, theta):
+    """
+    The angular resolution of a reflected event, from the height of the
+    reflected beam at the sample, see `illuminated_height`, and the height
+    of a detector pixel, added in quadrature.
+
+    Args:
+        beam_size (float): Width of incident beam, in metres.
+        sample_size (float): Width of sample in the dimension of the beam, in metres.
+        pixel_size (float): The vertical size of a detector pixel, in metres.
+        distance (float): The distance from the sample to the detector, in metres.
+        theta (array_like): Incident angle, in degrees of arc.
+
+    Returns:
+        (array_like): The full width at half maximum, in degrees of arc.
+    """
+    height = illuminated_height(beam_size, sample_size, theta)
+    return np.degrees(np.hypot(height, pixel_size) / distance)
+
+
+def relative_resolution(beam_size, sample_size, pixel_size, distance, theta):
+    """
+    The angular resolution relative to the angle, the contribution of the
+    angle to the relative qz resolution.
+
+    Args:
+        beam_size (float): Width of incident beam, in metres.
+        sample_size (float): Width of sample in the dimension of the beam, in metres.
+        pixel_size (float): The vertical size of a detector pixel, in metres.
+        distance (float): The distance from the sample to the detector, in metres.
+        theta (array_like): Incident angle, in degrees of arc.
+
+    Returns:
+        (array_like): The full width at half maximum of the angle divided by the angle, zero for angles that are not positive.
+    """
+    theta = np.asarray(theta, dtype=float)
+    resolution = angular_resolution(beam_size, sample_size, pixel_size, distance, theta)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(theta > 0, resolution / theta, 0.)
+
+
+def qz_resolution(q_bins, weighted, counts):
+    """
+    The standard deviation of qz in each bin from the mean relative angular
+    resolution of its events.
+
+    Args:
+        q_bins (array_like): The qz bin edges, in reciprocal angstrom.
+        weighted (array_like): The sum of the weights of the events in each bin, each multiplied by its relative resolution.
+        counts (array_like): The sum of the weights of the events in each bin.
+
+    Returns:
+        (array_like): The standard deviation, in reciprocal angstrom, `nan` for bins without events.
+    """
+    q_bins = np.asarray(q_bins, dtype=float)
+    centres = 0.5 * (q_bins[1:] + q_bins[:-1])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts > 0, centres * weighted / counts / FWHM, np.nan)
@@ -0,0 +1,370 @@
+"""
+A long-running local reduction service, which keeps the processed readers
+warm between requests.
+
+Starting a new process for each reduction pays for the imports, and for
+reading and processing the reference, every time. The service holds the
+processed readers in a least-recently-used cache, keyed by the file, its
+modification time and the processing, so a series of samples against the
+same reference only reads and processes each sample. The (lambda, theta)
+reference tables are cached by `ESSReflReducer.read_amor` itself. Requests
+are given as JSON over HTTP, and the reflectivity is returned as ORSO text.
+
+    python -m ESSReflReducer.service --port 8765
+
+    curl -d '{"reference": "ref.hdf", "sample": "sample.hdf", "q_bins": {"min": 0.005, "max": 0.1, "resolution": 0.05}}' localhost:8765/reduce
+"""
+
+import argparse
+import io
+import json
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from ESSReflReducer import header
+
+#: The unit of the limits of each masked coordinate, in the requests.
+MASK_UNITS = {'y': 'm', 'lambda': 'm', 'theta': 'deg'}
+#: The columns of the ORSO output.
+COLUMNS = {'col 1': 'qz/Aa-1', 'col 2': 'Rqz', 'col 3': 'sigma Rqz, standard deviation'}
+#: The column of the qz resolution, when it is found.
+RESOLUTION_COLUMN = {'col 4': 'sigma qz/Aa-1, standard deviation'}
+
+
+class ServiceBusy(Exception):
+    """
+    The service is already running the largest number of reductions.
+    """
+
+
+class LRUCache:
+    """
+    A thread-safe cache holding the most recently used values, with counts
+    of the hits and misses.
+    """
+    def __init__(self, max_size):
+        """
+        Args:
+            max_size (int): The largest number of values held.
+        """
+        if max_size < 1:
+            raise ValueError("The cache must hold at least one value.")
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, create):
+        """
+        Get the value for a key, creating it on a miss. Values are created
+        outside of the lock, so a slow creation does not block hits.
+
+        Args:
+            key (hashable): The key.
+            create (callable): Function taking no arguments and returning the value.
+
+        Returns:
+            (object): The value.
+        """
+        with self._lock:
+            if key in self._values:
+                self.hits += 1
+                self._values.move_to_end(key)
+                return self._values[key]
+            self.misses += 1
+        value = create()
+        with self._lock:
+            self._values[key] = value
+            self._values.move_to_end(key)
+            while len(self._values) > self.max_size:
+                self._values.popitem(last=False)
+        return value
+
+    def __len__(self):
+        return len(self._values)
+
+    def stats(self):
+        """
+        Summarise the use of the cache.
+
+        Returns:
+            (dict): The size, limit, hits, misses and hit rate.
+        """
+        requests = self.hits + self.misses
+        return {'size': len(self), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / requests if requests else None}
+
+
+def q_bins(spec):
+    """
+    Get the qz bin edges of a request.
+
+    Args:
+        spec (list or dict): The bin edges, or a dictionary with `min` and `max`, in reciprocal angstrom, and either the relative `resolution` or the number of bins `n`.
+
+    Returns:
+        (array_like): The bin edges.
+    """
+    if isinstance(spec, dict):
+        if 'resolution' in spec:
+            from ESSReflReducer.read_amor import constant_resolution_bins
+            return constant_resolution_bins(spec['min'], spec['max'], spec['resolution'])
+        return np.linspace(spec['min'], spec['max'], int(spec['n']) + 1)
+    return np.asarray(spec, dtype=float)
+
+
+def mask_kwargs(masks):
+    """
+    Get the arguments of `ESSReflReducer.read_amor.AmorDataReader.apply_masks`
+    from the limits of a request.
+
+    Args:
+        masks (dict): The limits, e.g. `{'theta_min': 0.1}`, in the units of `MASK_UNITS`.
+
+    Returns:
+        (dict): The limits as `sc.Variable` objects.
+    """
+    import scipp as sc
+    kwargs = {}
+    for name, value in masks.items():
+        coord = name.rsplit('_', 1)[0]
+        if coord not in MASK_UNITS or not name.endswith(('_min', '_max')):
+            raise ValueError(f"Unknown mask limit {name!r}.")
+        kwargs[name] = float(value) * getattr(sc.units, MASK_UNITS[coord])
+    return kwargs
+
+
+def orso_text(reducer, reference_file, sample_file, owner='Unknown', experiment_id=''):
+    """
+    Write the reflectivity of a reduction as ORSO text, the header as
+    comment lines followed by the columns. The qz resolution is the fourth
+    column, if the reduction found it.
+
+    Args:
+        reducer (ESSReflReducer.read_amor.AmorReducer): The reduction, with a single binning.
+        reference_file (str): The reference .hdf file.
+        sample_file (str): The sample .hdf file.
+        owner (str, optional): The owner of the data. Defaults to 'Unknown'.
+        experiment_id (str, optional): The experiment identification string. Defaults to none.
+
+    Returns:
+        (str): The ORSO text.
+    """
+    template = reducer.data.template()
+    wavelength = [limit * 1e10 for limit in template.mask_limits['lambda']]
+    measurement = header.Measurement('Angle and energy dispersive', wavelength, list(template.mask_limits['theta']))
+    experiment = header.Experiment(template.instrument.name, header.Probe('neutron'), measurement, header.Sample(template.title))
+    person = header.Person(owner)
+    origin = header.Origin(person, experiment_id, template.title)
+    input_files = {name: [header.File(filename, datetime.fromtimestamp(os.path.getmtime(filename)))]
+                   for name, filename in (('reference', reference_file), ('measurement', sample_file))}
+    reduction = header.Reduction(header.Software(header.File(__file__)), input_files, reducer.data_state)
+    resolution = hasattr(reducer, 'qz_resolution')
+    orso = header.ORSO(header.Creation(person, system=socket.gethostname()), header.DataSource(origin, experiment, {}),
+                       reduction, header.Data(dict(COLUMNS, **RESOLUTION_COLUMN) if resolution else COLUMNS))
+    reflectivity = reducer.reflectivity
+    edges = reflectivity.coords['qz'].values
+    columns = [0.5 * (edges[1:] + edges[:-1]), reflectivity.values, np.sqrt(reflectivity.variances)]
+    if resolution:
+        columns.append(reducer.qz_resolution.values)
+    columns = np.transpose(columns)
+    text = io.StringIO()
+    text.write('\n'.join('# ' + line for line in repr(orso).split('\n')) + '\n')
+    np.savetxt(text, columns)
+    return text.getvalue()
+
+
+class ReductionService:
+    """
+    Reduction of JSON requests, with the processed readers held between
+    requests and a limit on the number of reductions run at once.
+    """
+    def __init__(self, max_readers=8, max_concurrent=2, queue_timeout=30., n_threads=1):
+        """
+        Args:
+            max_readers (int): The largest number of processed readers held. Optional, default `8`.
+            max_concurrent (int): The largest number of reductions run at once. Optional, default `2`.
+            queue_timeout (float): The longest time a request waits for a reduction to finish, in seconds, before it is refused. Optional, default `30`.
+            n_threads (int): Number of threads used by each reader. Optional, default `1`.
+        """
+        self.readers = LRUCache(max_readers)
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self.n_threads = n_threads
+        self.requests = 0
+        self.errors = 0
+        self.refused = 0
+        self.active = 0
+        self.latencies = deque(maxlen=1000)
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+
+    def reader(self, filename, instrument='AMOR', gravity=True, masks=None):
+        """
+        Get a processed reader, from the cache if the same file was processed
+        in the same way.
+
+        Args:
+            filename (str): The .hdf file.
+            instrument (str, optional): The name of the instrument. Defaults to 'AMOR'.
+            gravity (bool, optional): Account for the gravitational drop of the neutrons. Defaults to `True`.
+            masks (dict, optional): The mask limits, see `mask_kwargs`. Defaults to the limits of the reader.
+
+        Returns:
+            (ESSReflReducer.read_amor.AmorDataReader): The processed reader.
+        """
+        masks = {} if masks is None else masks
+        filename = os.path.abspath(filename)
+        key = (filename, os.path.getmtime(filename), instrument, bool(gravity), tuple(sorted(masks.items())))
+
+        def create():
+            from ESSReflReducer.read_amor import RawData
+            reader = RawData(filename, instrument, n_threads=self.n_threads).reader
+            reader.process(gravity=gravity, **mask_kwargs(masks))
+            return reader
+
+        return self.readers.get(key, create)
+
+    def reduce(self, request):
+        """
+        Reduce a sample against a reference.
+
+        Args:
+            request (dict): The request, with the `reference` and `sample` files and the `q_bins`, see `q_bins`. Optionally the `instrument`, `gravity`, `masks`, `qz_resolution`, `owner` and `experiment_id`.
+
+        Returns:
+            (dict): The ORSO text, as `orso`, and the `latency` of the request, in seconds.
+        """
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.refused += 1
+            raise ServiceBusy(f"{self.max_concurrent} reductions are already running.")
+        with self._lock:
+            self.requests += 1
+            self.active += 1
+        try:
+            from ESSReflReducer.read_amor import AmorReducer
+            options = {name: request[name] for name in ('instrument', 'gravity', 'masks') if name in request}
+            reference = self.reader(request['reference'], **options)
+            sample = self.reader(request['sample'], **options)
+            reducer = AmorReducer(reference, sample, q_bins(request['q_bins']), qz_resolution=request.get('qz_resolution', False))
+            text = orso_text(reducer, request['reference'], request['sample'],
+                             request.get('owner', 'Unknown'), request.get('experiment_id', ''))
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self.active -= 1
+            self._slots.release()
+        latency = time.perf_counter() - start
+        with self._lock:
+            self.latencies.append(latency)
+        return {'orso': text, 'latency': latency}
+
+    def stats(self):
+        """
+        Summarise the requests, the latency of the recent requests, the use
+        of the cache and the concurrency.
+
+        Returns:
+            (dict): The statistics.
+        """
+        with self._lock:
+            latencies = np.array(self.latencies)
+            return {'requests': self.requests, 'errors': self.errors, 'refused': self.refused,
+                    'active': self.active, 'max_concurrent': self.max_concurrent,
+                    'latency': {'mean': float(latencies.mean()), 'median': float(np.median(latencies)),
+                                'max': float(latencies.max())} if latencies.size else None,
+                    'readers': self.readers.stats()}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    The HTTP interface of a `ReductionService`, `POST /reduce` with a JSON
+    request and `GET /stats`.
+    """
+    service = None
+
+    def _send(self, status, body):
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self._send(200, self.service.stats())
+        else:
+            self._send(404, {'error': f"Unknown path {self.path}."})
+
+    def do_POST(self):
+        if self.path != '/reduce':
+            self._send(404, {'error': f"Unknown path {self.path}."})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        except ValueError as error:
+            self._send(400, {'error': f"Invalid JSON: {error}"})
+            return
+        try:
+            self._send(200, self.service.reduce(request))
+        except ServiceBusy as error:
+            self._send(503, {'error': str(error)})
+        except (KeyError, ValueError, OSError) as error:
+            self._send(400, {'error': f"{type(error).__name__}: {error}"})
+        except Exception as error:
+            self._send(500, {'error': f"{type(error).__name__}: {error}"})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(service, host='127.0.0.1', port=8765):
+    """
+    Create an HTTP server for a reduction service, handling each request on
+    its own thread.
+
+    Args:
+        service (ESSReflReducer.service.ReductionService): The service.
+        host (str, optional): The address to listen on. Defaults to the local machine only.
+        port (int, optional): The port, `0` for any free port. Defaults to 8765.
+
+    Returns:
+        (`http.server.ThreadingHTTPServer`): The server, started with `serve_forever`.
+    """
+    handler = type('Handler', (_Handler,), {'service': service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=8765, help='port to listen on')
+    parser.add_argument('--max-readers', type=int, default=8, help='largest number of processed readers held')
+    parser.add_argument('--max-concurrent', type=int, default=2, help='largest number of reductions run at once')
+    parser.add_argument('--threads', type=int, default=1, help='number of threads used by each reader')
+    args = parser.parse_args()
+    service = ReductionService(args.max_readers, args.max_concurrent, n_threads=args.threads)
+    server = make_server(service, args.host, args.port)
+    print(f"Serving reductions on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
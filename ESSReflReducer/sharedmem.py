@@ -0,0 +1,285 @@
+"""
+Events of a reader in named shared memory, histogrammed by several
+processes.
+
+The per-event arrays of a processed reader, the time since the pulse, the
+pixel ids, every coordinate, attribute and mask, and any dead-time weights,
+are copied once into a single named shared memory segment. Only a small,
+picklable description of the segment is sent to the worker processes, which
+attach to the segment, fill the partial histograms of a disjoint slice of
+the events from views of the arrays, and detach. The segment is released
+when the reader is closed, rather than whenever it is garbage collected.
+"""
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import scipp as sc
+from ESSReflReducer import parallel
+from ESSReflReducer.read_amor import AmorDataReader, _unit_counts
+
+#: The alignment of each array in the segment, in bytes.
+ALIGNMENT = 64
+#: The largest number of events copied into each chunk by `AmorSharedReader.map_chunks`.
+CHUNK_SIZE = 2 ** 22
+#: The attributes of a reader that hold the events, which are not copied to the shared reader.
+EVENT_ATTRIBUTES = ['data', 'detector_pixel_id', 'event_time_offset', 'pixel_runs']
+
+
+class SharedEvents:
+    """
+    Description of the event arrays in a named shared memory segment. This
+    is all that a worker process needs to attach to the events.
+    """
+    def __init__(self, name, n_events, layout):
+        """
+        Args:
+            name (str): The name of the segment.
+            n_events (int): The number of events.
+            layout (dict of tuple): The offset, in bytes, and the `np.dtype` string of each array.
+        """
+        self.name = name
+        self.n_events = n_events
+        self.layout = layout
+
+    def views(self, buffer):
+        """
+        Get the arrays as views of the memory of the segment, without copying.
+
+        Args:
+            buffer (memoryview): The memory of the attached segment.
+
+        Returns:
+            (dict of array_like): The arrays.
+        """
+        return {key: np.ndarray(self.n_events, dtype=dtype, buffer=buffer, offset=offset) for key, (offset, dtype) in self.layout.items()}
+
+
+def layout(dtypes, n_events):
+    """
+    Place the arrays one after the other in a segment, each aligned to
+    `ALIGNMENT` bytes.
+
+    Args:
+        dtypes (dict of `np.dtype`): The type of each array.
+        n_events (int): The number of events.
+
+    Returns:
+        (tuple): The offset and `np.dtype` string of each array, and the size of the segment, in bytes.
+    """
+    offsets = {}
+    size = 0
+    for key, dtype in dtypes.items():
+        offsets[key] = (size, np.dtype(dtype).str)
+        size += -(-n_events * np.dtype(dtype).itemsize // ALIGNMENT) * ALIGNMENT
+    return offsets, max(size, ALIGNMENT)
+
+
+def event_arrays(reader):
+    """
+    Get the per-event arrays of a processed reader, with their units.
+
+    Args:
+        reader (ESSReflReducer.read_amor.AmorDataReader): The processed reader.
+
+    Returns:
+        (dict of tuple): The values and unit of each array, the unit is `None` for the pixel ids and dead-time weights.
+    """
+    arrays = {'event_time_offset': (reader.event_time_offset.values, reader.event_time_offset.unit),
+              'pixel_id': (reader.pixel_ids(), None)}
+    for group in ['coords', 'masks']:
+        for name, variable in getattr(reader.data, group).items():
+            arrays[f'{group}/{name}'] = (variable.values, variable.unit)
+    dead_time = reader.dead_time_weights()
+    if dead_time is not None:
+        arrays['dead_time'] = (dead_time, None)
+    return arrays
+
+
+def block_arrays(arrays, coords, block):
+    """
+    Get the inputs of `ESSReflReducer.read_amor.AmorDataReader.map_events`
+    for a block of events.
+
+    Args:
+        arrays (dict of array_like): The arrays, see `event_arrays`.
+        coords (list of str): The names of the coordinates.
+        block (slice): The events.
+
+    Returns:
+        (list of array_like): The combined mask, the dead-time weights and the values of each coordinate. The mask and weights are `None` if there are none.
+    """
+    mask = None
+    for key, values in arrays.items():
+        if key.startswith('masks/'):
+            mask = values[block] if mask is None else mask | values[block]
+    dead_time = arrays['dead_time'][block] if 'dead_time' in arrays else None
+    return [mask, dead_time] + [arrays[f'coords/{c}'][block] for c in coords]
+
+
+def map_block(events, func, coords, block):
+    """
+    Attach to the events, apply a function to a block of them, and detach.
+    This is the task run by each worker process.
+
+    Args:
+        events (ESSReflReducer.sharedmem.SharedEvents): The events.
+        func (callable): The function, see `ESSReflReducer.read_amor.AmorDataReader.map_events`.
+        coords (list of str): The names of the coordinates.
+        block (slice): The events.
+
+    Returns:
+        (array_like or tuple of array_like): The output of `func`.
+    """
+    segment = shared_memory.SharedMemory(name=events.name)
+    arrays = None
+    try:
+        arrays = events.views(segment.buf)
+        return func(*block_arrays(arrays, coords, block))
+    finally:
+        # The views must be dropped before the segment can be closed.
+        arrays = None
+        segment.close()
+
+
+class AmorSharedReader(AmorDataReader):
+    """
+    A processed reader with its events in named shared memory, which can be
+    used in place of an `AmorDataReader` by the `AmorReducer`. The events
+    are histogrammed on `n_processes` processes, each attaching to the
+    shared events rather than receiving a copy. The reader should be closed
+    once it is no longer needed, or used as a context manager, to release
+    the memory.
+    """
+    def __init__(self, reader, n_processes=1, pool=None):
+        """
+        Args:
+            reader (ESSReflReducer.read_amor.AmorDataReader): The processed reader, in memory or out-of-core, whose events are copied to shared memory.
+            n_processes (int): Number of processes histogramming the events. Optional, default `1`, in this process.
+            pool (`concurrent.futures.Executor`): The worker processes, which may be shared by several readers. Optional, default a pool of `n_processes` processes owned by the reader.
+        """
+        template = reader.template()
+        self.__dict__.update({k: v for k, v in template.__dict__.items() if k not in EVENT_ATTRIBUTES})
+        self.n_events = reader.n_events
+        self.n_threads = reader.n_threads
+        self.n_processes = n_processes
+        self._pool = pool
+        self._own_pool = pool is None
+        self._segment = None
+        arrays = event_arrays(template)
+        self._units = {key: unit for key, (_, unit) in arrays.items()}
+        offsets, size = layout({key: values.dtype for key, (values, _) in arrays.items()}, self.n_events)
+        self._segment = shared_memory.SharedMemory(create=True, size=size)
+        self.events = SharedEvents(self._segment.name, self.n_events, offsets)
+
+        def fill(chunk):
+            views = self.events.views(self._segment.buf)
+            block = slice(chunk.first_event, chunk.first_event + chunk.n_events)
+            for key, (values, _) in event_arrays(chunk).items():
+                views[key][block] = values
+            return np.zeros(1)
+
+        try:
+            reader.map_chunks(fill)
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        Stop the worker processes owned by the reader, and release the shared
+        memory. The events cannot be used afterwards.
+        """
+        if self._own_pool and self._pool is not None:
+            self._pool.shutdown()
+        self._pool = None
+        if self._segment is not None:
+            self._segment.close()
+            self._segment.unlink()
+            self._segment = None
+
+    def _chunk(self, block):
+        """
+        Create an in-memory reader for a block of the shared events.
+
+        Args:
+            block (slice): The events.
+
+        Returns:
+            (ESSReflReducer.read_amor.AmorDataReader): The reader, with a copy of the events.
+        """
+        if self._segment is None:
+            raise ValueError("The shared events have been released.")
+        chunk = AmorDataReader.__new__(AmorDataReader)
+        chunk.__dict__.update({k: v for k, v in self.__dict__.items() if k not in ['events', 'n_processes', '_pool', '_own_pool', '_segment', '_units']})
+        views = self.events.views(self._segment.buf)
+
+        def variable(key):
+            return sc.Variable(dims=['event'], values=views[key][block], unit=self._units[key])
+
+        chunk.detector_pixel_id = views['pixel_id'][block].copy()
+        chunk.event_time_offset = variable('event_time_offset')
+        chunk.n_events = len(chunk.detector_pixel_id)
+        chunk.first_event = block.start
+        chunk.pixel_runs = None
+        groups = {group: {key.split('/', 1)[1]: variable(key) for key in views if key.startswith(f'{group}/')} for group in ['coords', 'masks']}
+        chunk.data = sc.DataArray(data=_unit_counts(chunk.n_events), **groups)
+        return chunk
+
+    def template(self):
+        """
+        Get a reader with all of the processing steps applied, whose
+        attributes describe the geometry and the masks. This is a reader with
+        none of the events.
+
+        Returns:
+            (ESSReflReducer.read_amor.AmorDataReader): The processed reader.
+        """
+        return self._chunk(slice(0, 0))
+
+    def map_chunks(self, func):
+        """
+        Apply a function to each chunk of events and sum the results. Each
+        chunk is a copy of at most `CHUNK_SIZE` of the shared events, made in
+        this process, and the chunks are processed on `n_threads` threads.
+
+        Args:
+            func (callable): Function taking an `AmorDataReader` and returning an array, or a tuple of arrays, that can be summed over chunks.
+
+        Returns:
+            (array_like or tuple of array_like): The summed output of `func`.
+        """
+        n_chunks = max(1, -(-self.n_events // CHUNK_SIZE))
+        # No events are one empty chunk, so that func gives results of the right shape.
+        blocks = parallel.block_slices(self.n_events, n_chunks) or [slice(0, 0)]
+        return parallel.reduce_tasks(lambda block: func(self._chunk(block)), blocks, self.n_threads)
+
+    def map_events(self, func, coords, n_threads=None):
+        """
+        Apply a function to disjoint blocks of the shared events, one for each
+        process, and sum the results. The function and its results are sent
+        between the processes, the events are not.
+
+        Args:
+            func (callable): Picklable function taking the combined mask, the dead-time weights and the values of each of the coordinates of a block of events, and returning an array, or a tuple of arrays, that can be summed over blocks.
+            coords (list of str): The names of the coordinates.
+            n_threads (int): Unused, each process histograms its block on a single thread.
+
+        Returns:
+            (array_like or tuple of array_like): The summed output of `func`.
+        """
+        if self._segment is None:
+            raise ValueError("The shared events have been released.")
+        blocks = parallel.block_slices(self.n_events, self.n_processes)
+        if self.n_processes <= 1 or len(blocks) < 2:
+            return map_block(self.events, func, coords, slice(0, self.n_events))
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.n_processes)
+        futures = [self._pool.submit(map_block, self.events, func, coords, block) for block in blocks]
+        return parallel.reduce_tasks(Future.result, futures)
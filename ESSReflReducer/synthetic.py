@@ -0,0 +1,41 @@
+"""
+Synthetic AMOR event files, for testing and benchmarking the reduction
+without access to measured data.
+"""
+
+import numpy as np
+import h5py
+
+
+def write_amor_file(filename, n_events=100000, seed=0, sample_angle=1.0,
+                    detector_angle=-2.0, n_blades=14, n_pulses=100,
+                    tau=0.075, compression=None):
+    """
+    Write a file with the structure of an AMOR NeXus event file. The events
+    are spread evenly over the detector pixels and the chopper frame.
+
+    Args:
+        filename (str): The file to write.
+        n_events (int, optional): The number of events. Defaults to 100000.
+        seed (int, optional): The seed for the random events. Defaults to 0.
+        sample_angle (float, optional): The sample angle to the horizon (`som`), in degrees of arc. Defaults to 1.0.
+        detector_angle (float, optional): The detector stage angle (`com`), in degrees of arc. Defaults to -2.0.
+        n_blades (int, optional): The number of detector blades. Defaults to 14.
+        n_pulses (int, optional): The number of pulses. Defaults to 100.
+        tau (float, optional): The length of the chopper frame, in seconds. Defaults to 0.075.
+        compression (str, optional): Compression of the event datasets, i.e. 'gzip'. Defaults to no compression.
+    """
+    rng = np.random.default_rng(seed)
+    event_id = rng.integers(0, n_blades * 32 * 32, n_events).astype(np.uint32)
+    event_time_offset = (rng.random(n_events) * tau * 1e9).astype(np.uint32)
+    pulse_time = np.arange(n_pulses, dtype=np.uint64) * int(tau * 1e9)
+    chunks = None if compression is None else (min(n_events, 2 ** 16),)
+    with h5py.File(filename, 'w') as f:
+        f['/experiment/title'] = np.array([b'synthetic'])
+        f.create_dataset('/experiment/data/event_id', data=event_id, chunks=chunks, compression=compression)
+        f.create_dataset('/experiment/data/event_time_offset', data=event_time_offset, chunks=chunks, compression=compression)
+        f['/experiment/data/event_time_zero'] = pulse_time
+        f['/experiment/data/event_index'] = np.searchsorted(np.sort(rng.integers(0, n_pulses, n_events)), np.arange(n_pulses)).astype(np.uint64)
+        f['/experiment/proton_current/value'] = np.ones(n_pulses)
+        f['/instrument/stages/com/value'] = np.array([detector_angle])
+        f['/instrument/stages/som/value'] = np.array([sample_angle])
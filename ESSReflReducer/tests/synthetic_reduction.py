@@ -0,0 +1,79 @@
+"""
+Shared fixture for the tests that reduce synthetic measurements along
+different paths and compare with the reduction of readers in memory.
+"""
+
+# Copyright (c) Andrew R. McCluskey
+# Distributed under the terms of the MIT License
+# author: Andrew R. McCluskey
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from numpy.testing import assert_allclose
+from ESSReflReducer import synthetic
+from ESSReflReducer.read_amor import AmorDataReader, AmorReducer
+
+#: The qz bin edges of the reductions, in reciprocal angstrom.
+Q_BINS = np.linspace(0.005, 0.1, 21)
+
+
+class SyntheticReductionTest(unittest.TestCase):
+    """
+    A synthetic reference and sample file for each test, with the
+    reductions of readers holding their events in memory to compare with.
+    """
+    #: Keyword arguments of `synthetic.write_amor_file` for the sample.
+    sample_kwargs = {}
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.reference = os.path.join(self.directory.name, 'reference.hdf')
+        self.sample = os.path.join(self.directory.name, 'sample.hdf')
+        synthetic.write_amor_file(self.reference, n_events=20000, seed=2)
+        synthetic.write_amor_file(self.sample, n_events=40000, seed=1, **self.sample_kwargs)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def readers(self, **process):
+        """
+        Read and process the reference and the sample in memory.
+
+        Args:
+            process: The arguments of `AmorDataReader.process`.
+
+        Returns:
+            (list of ESSReflReducer.read_amor.AmorDataReader): The reference and sample readers.
+        """
+        readers = [AmorDataReader(filename) for filename in [self.reference, self.sample]]
+        for reader in readers:
+            reader.process(**process)
+        return readers
+
+    def expected(self, q_bins=Q_BINS, **process):
+        """
+        Reduce the readers in memory.
+
+        Args:
+            q_bins (array_like or dict, optional): The qz bin edges, or several binnings. Defaults to `Q_BINS`.
+            process: The arguments of `AmorDataReader.process`.
+
+        Returns:
+            (`sc.DataArray` or dict of `sc.DataArray`): The reflectivity.
+        """
+        return AmorReducer(*self.readers(**process), q_bins).reflectivity
+
+    def assertReflectivity(self, reflectivity, expected, rtol=1e-9):
+        """
+        Check that the values and variances of reflectivities agree, for
+        each binning of a dictionary.
+        """
+        if isinstance(expected, dict):
+            self.assertEqual(sorted(reflectivity), sorted(expected))
+            for name in expected:
+                self.assertReflectivity(reflectivity[name], expected[name], rtol)
+            return
+        assert_allclose(reflectivity.values, expected.values, rtol=rtol)
+        assert_allclose(reflectivity.variances, expected.variances, rtol=rtol)
@@ -0,0 +1,102 @@
+"""
+Tests for background module
+"""
+
+# Copyright (c) Andrew R. McCluskey
+# Distributed under the terms of the MIT License
+# author: Andrew R. McCluskey
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from numpy.testing import assert_allclose, assert_almost_equal, assert_array_less, assert_equal
+from ESSReflReducer import background, synthetic
+from ESSReflReducer.read_amor import AmorDataReader, AmorReducer
+
+
+class _Scalar:
+    def __init__(self, value):
+        self.value = value
+
+
+class _Reader:
+    """
+    The parts of a processed reader used by the background estimate, for a
+    detector with one row of four pixels.
+    """
+    beam_size = _Scalar(1e-3)
+    sample_size = _Scalar(1e3)
+    mask_limits = {}
+
+    def pixel_positions(self, n_blades=14):
+        return np.array([0., 1e-3, 2e-3, 3e-3]), np.zeros(4)
+
+    def theta_of(self, z, wavelength):
+        return np.broadcast_to(1., np.broadcast(z, wavelength).shape)
+
+
+class TestBackground(unittest.TestCase):
+    def test_in_regions(self):
+        y = np.array([0., 1., 2., 3.])
+        z = np.array([0., 0., 1., 1.])
+        inside = background.in_regions(y, z, [(0., 1., 0., 0.), (3., 4., 0., 2.)])
+        assert_equal(inside, [True, True, False, True])
+
+    def test_estimate_scales_by_pixels(self):
+        counts = (np.array([4., 8.]), np.array([4., 8.]))
+        lambda_bins = np.array([4e-10, 5e-10, 6e-10])
+        q_bins = np.array([0., 0.1])
+        values, variances = background.estimate(_Reader(), counts, lambda_bins, [(0., 0.5e-3, -1., 1.)], q_bins)
+        assert_almost_equal(values, [3 * (4. + 8.)])
+        assert_almost_equal(variances, [9 * (4. + 8.)])
+
+    def test_estimate_spreads_over_qz(self):
+        # qz = 4 pi sin(1 deg) / wavelength, from 0.0548 to 0.0365 reciprocal angstrom over the wavelength bin.
+        lambda_bins = np.array([4e-10, 6e-10])
+        q_bins = np.array([0., 0.045, 0.1])
+        values, _ = background.estimate(_Reader(), (np.array([4.]), np.array([4.])), lambda_bins, [(0., 0.5e-3, -1., 1.)], q_bins)
+        above = (4 * np.pi * np.sin(np.radians(1.)) / 0.045 - 4.) / 2.
+        assert_allclose(values, [12. * (1. - above), 12. * above], rtol=0.01)
+
+    def test_estimate_empty_region(self):
+        with self.assertRaises(ValueError):
+            background.estimate(_Reader(), (np.ones(1), np.ones(1)), np.array([4e-10, 5e-10]), [(1., 2., 1., 2.)], np.array([0., 0.05]))
+
+
+class TestBackgroundReduction(unittest.TestCase):
+    # Events spread evenly over the detector are all background, so nothing is left after subtraction.
+    REGIONS = [(20e-3, 29e-3, -0.2, 0.1)]
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def readers(self, n_events):
+        readers = []
+        for seed, n in [(2, n_events // 2), (1, n_events)]:
+            filename = os.path.join(self.directory.name, f'{seed}.hdf')
+            synthetic.write_amor_file(filename, n_events=n, seed=seed)
+            readers.append(AmorDataReader(filename))
+            readers[-1].process()
+        return readers
+
+    def test_flat_detector(self):
+        readers = self.readers(200000)
+        q_bins = np.linspace(0.01, 0.1, 10)
+        signal = AmorReducer(readers[0], readers[1], q_bins).data_intensity
+        reducer = AmorReducer(readers[0], readers[1], q_bins, background_regions=self.REGIONS)
+        assert_array_less(np.abs(reducer.data_intensity.values), 4 * np.sqrt(reducer.data_intensity.variances))
+        self.assertLess(abs(np.sum(reducer.data_intensity.values)), 0.02 * np.sum(signal.values))
+
+    def test_fine_binning(self):
+        # The background of a wavelength bin is spread over the several qz bins it covers.
+        readers = self.readers(400000)
+        reducer = AmorReducer(readers[0], readers[1], np.geomspace(0.005, 0.1, 201), background_regions=self.REGIONS)
+        populated = reducer.data_background.values > 25
+        pulls = reducer.data_intensity.values[populated] / np.sqrt(reducer.data_intensity.variances[populated])
+        self.assertGreater(np.count_nonzero(populated), 150)
+        self.assertLess(np.sqrt(np.mean(pulls * pulls)), 1.3)
+        assert_array_less(np.abs(pulls), 4.5)
@@ -0,0 +1,76 @@
+"""
+Tests for bootstrap module
+"""
+
+# Copyright (c) Andrew R. McCluskey
+# Distributed under the terms of the MIT License
+# author: Andrew R. McCluskey
+
+import unittest
+import numpy as np
+from numpy.testing import assert_allclose, assert_equal
+from ESSReflReducer import bootstrap, normalisation
+
+
+class TestBootstrap(unittest.TestCase):
+    """
+    Tests for the resampling of histograms.
+    """
+    def test_poisson_resample(self):
+        """
+        Test that the mean and variance of each bin are kept.
+        """
+        rng = np.random.default_rng(1)
+        values = np.array([100., 50., 0.])
+        variances = np.array([25., 50., 0.])
+        replicates = bootstrap.poisson_resample(values, variances, 20000, rng)
+        assert_equal(replicates.shape, (20000, 3))
+        assert_allclose(replicates.mean(axis=0)[:2], values[:2], rtol=0.01)
+        assert_allclose(replicates.var(axis=0)[:2], variances[:2], rtol=0.05)
+        assert_equal(replicates[:, 2], 0.)
+
+    def test_qz_replicates(self):
+        """
+        Test that the spread of the ratio matches the propagated variance.
+        """
+        rng = np.random.default_rng(2)
+        reference = (np.array([1e4, 4e4]), np.array([1e4, 4e4]))
+        data = (np.array([5e3, 1e3]), np.array([5e3, 1e3]))
+        replicates = bootstrap.qz_replicates(reference, data, np.ones(2), 5000, rng)
+        ratio = data[0] / reference[0]
+        expected = ratio * np.sqrt(1 / data[0] + 1 / reference[0])
+        assert_allclose(replicates.mean(axis=0), ratio, rtol=0.01)
+        assert_allclose(replicates.std(axis=0), expected, rtol=0.05)
+
+    def test_qz_replicates_empty_reference(self):
+        rng = np.random.default_rng(3)
+        replicates = bootstrap.qz_replicates((np.zeros(1), np.zeros(1)), (np.ones(1), np.ones(1)), np.ones(1), 10, rng)
+        assert_equal(np.isnan(replicates), True)
+
+    def test_cell_replicates(self):
+        """
+        Test that the replicates are centred on the reflectivity.
+        """
+        rng = np.random.default_rng(4)
+        lambda_bins = np.linspace(4e-10, 8e-10, 5)
+        theta_bins = np.linspace(0.5, 1.5, 4)
+        q_bins = np.linspace(0.01, 0.09, 9)
+        fractions = normalisation.cell_fractions(lambda_bins, theta_bins, q_bins)
+        table = np.full((4, 3), 1e6)
+        cells = np.full((4, 3), 0.5)
+        reflectivity = np.full(8, 0.5)
+        replicates = bootstrap.cell_replicates(reflectivity, (cells, cells * 1e-6), (table, table), fractions, 2000, rng)
+        covered = fractions.sum(axis=(0, 1)) > 0
+        assert_allclose(np.mean(replicates[:, covered], axis=0), 0.5, rtol=1e-3)
+        assert_equal(np.isnan(replicates[:, ~covered]), True)
+
+    def test_interval(self):
+        replicates = np.arange(101.)[:, np.newaxis] * np.ones(2)
+        replicates[:, 1] = np.nan
+        low, high = bootstrap.interval(replicates, level=0.9)
+        assert_allclose([low[0], high[0]], [5., 95.])
+        assert_equal(np.isnan([low[1], high[1]]), True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+Tests for cache module
+"""
+
+# Copyright (c) Andrew R. McCluskey
+# Distributed under the terms of the MIT License
+# author: Andrew R. McCluskey
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from numpy.testing import assert_almost_equal, assert_equal
+from ESSReflReducer import cache, engine
+from ESSReflReducer.read_amor import AmorReducer
+from synthetic_reduction import Q_BINS, SyntheticReductionTest
+
+
+class TestCache(unittest.TestCase):
+    """
+    Tests for the per-event qz cache.
+    """
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.qz = rng.random(1000) * 0.1
+        self.weights = rng.random(1000)
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, 'cache.npy')
+        np.save(self.filename, cache.sorted_sums(self.qz, self.weights))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_sorted_sums(self):
+        """
+        Test the layout of the cache table.
+        """
+        table = cache.sorted_sums(np.array([0.3, 0.1, 0.2]), np.array([1., 2., 3.]))
+        assert_equal(table[0], [0.1, 0.2, 0.3, np.inf])
+        assert_equal(table[1], [0., 2., 5., 6.])
+        assert_equal(table[2], [0., 4., 13., 14.])
+
+    def test_histogram(self):
+        """
+        Test that re-binning the cache matches histogramming the events.
+        """
+        loaded = cache.QzCache(self.filename)
+        self.assertEqual(loaded.n_events, 1000)
+        for q_bins in [np.linspace(0, 0.1, 11), np.array([0.01, 0.012, 0.05, 0.2])]:
+            result = loaded.histogram(q_bins)
+            values, variances = engine.histogram(self.qz, q_bins, weights=self.weights)
+            assert_almost_equal(result.values, values)
+            assert_almost_equal(result.variances, variances)
+
+    def test_histogram_edges(self):
+        """
+        Test that an event on an edge is in the bin above it.
+        """
+        np.save(self.filename, cache.sorted_sums(np.array([0.1, 0.2]), np.array([1., 1.])))
+        result = cache.QzCache(self.filename).histogram(np.array([0., 0.1, 0.2]))
+        assert_equal(result.values, [0., 1.])
+
+
+class TestCacheReduction(SyntheticReductionTest):
+    """
+    Tests that a reduction from the cache matches the reduction of the
+    events.
+    """
+    def test_from_cache(self):
+        q_bins = {'coarse': Q_BINS, 'fine': np.geomspace(0.005, 0.1, 61)}
+        caches = []
+        for i, reader in enumerate(self.readers()):
+            filename = os.path.join(self.directory.name, f'{i}.npy')
+            cache.write_cache(reader, filename)
+            caches.append(cache.QzCache(filename))
+        self.assertReflectivity(AmorReducer.from_cache(*caches, q_bins).reflectivity, self.expected(q_bins), rtol=1e-7)
+
+
+if __name__ == '__main__':
+    unittest.main()
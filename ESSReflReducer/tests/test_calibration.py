@@ -0,0 +1,84 @@
+"""
+Tests for calibration module
+"""
+
+# Copyright (c) Andrew R. McCluskey
+# Distributed under the terms of the MIT License
+# author: Andrew R. McCluskey
+
+import unittest
+import numpy as np
+from numpy.testing import assert_allclose, assert_equal
+from ESSReflReducer import calibration, engine
+
+TAU = 0.075
+HDM = 3.956e-7
+DISTANCE = 19.
+
+
+def spectrum_times(phase, n_events=200000, seed=1):
+    """
+    The time since the pulse of events with wavelengths from 3 to 10
+    angstrom, for a chopper phase.
+    """
+    wavelength = np.random.default_rng(seed).uniform(3e-10, 10e-10, n_events)
+    return np.remainder(wavelength * DISTANCE / HDM - TAU * phase / 180., TAU)
+
+
+class TestCalibration(unittest.TestCase):
+    """
+    Tests for the chopper calibration.
+    """
+    def test_tof_histogram(self):
+        counts = calibration.tof_histogram(np.array([0., 0.01, 0.074, 0.0755]), TAU, n_bins=75)
+        assert_equal(counts.sum(), 4)
+        assert_equal(counts[[0, 10, 74]], [2., 1., 1.])
+
+    def test_frame_cut(self):
+        """
+        Test that the cut is in the gap of the spectrum.
+        """
+        counts = np.ones(100)
+        counts[40:60] = 0.
+        assert_allclose(calibration.frame_cut(counts, 1., width=10), 0.5, atol=0.01)
+        assert_allclose(calibration.frame_cut(np.roll(counts, 55), 1., width=10), 0.05, atol=0.01)
+        assert_allclose(calibration.frame_cut(counts, 1., width=10, start=0.5), 0.55, atol=0.01)
+
+    def test_rising_edge(self):
+        """
+        Test that a wrapped edge is found.
+        """
+        counts = np.zeros(100)
+        counts[90:] = 1.
+        counts[:30] = 1.
+        assert_allclose(calibration.rising_edge(counts, 1., width=5), 0.9, atol=0.01)
+
+    def test_chopper_settings(self):
+        """
+        Test that the phase and cut of a spectrum are recovered, such that
+        the reshuffled events have the known wavelengths.
+        """
+        times = spectrum_times(-5.)
+        counts = calibration.tof_histogram(times, TAU)
+        phase, lambda_cut = calibration.chopper_settings(counts, TAU, 3e-10, DISTANCE, HDM)
+        assert_allclose(phase, -5., atol=0.1)
+        self.assertGreater(lambda_cut, 0.)
+        self.assertLess(lambda_cut, 3e-10)
+        tof = engine.reshuffle_tof(times, TAU, lambda_cut * DISTANCE / HDM, TAU * phase / 180.)
+        wavelength = tof * HDM / DISTANCE
+        assert_allclose([wavelength.min(), wavelength.max()], [3e-10, 10e-10], rtol=0.01)
+
+    def test_chopper_settings_cut_distance(self):
+        """
+        Test that the cut converted with another distance gives the same
+        time, while the phase is unchanged.
+        """
+        counts = calibration.tof_histogram(spectrum_times(-5.), TAU)
+        phase, lambda_cut = calibration.chopper_settings(counts, TAU, 3e-10, DISTANCE, HDM)
+        cut_phase, cut = calibration.chopper_settings(counts, TAU, 3e-10, DISTANCE, HDM, cut_distance=0.9 * DISTANCE)
+        self.assertEqual(cut_phase, phase)
+        assert_allclose(cut * 0.9 * DISTANCE, lambda_cut * DISTANCE)
+
+
+if __name__ == '__main__':
+    unittest.main()
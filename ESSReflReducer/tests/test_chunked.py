@@ -0,0 +1,69 @@
+"""
+Tests for chunked module
+"""
+
+# Copyright (c) Andrew R. McCluskey
+# Distributed under the terms of the MIT License
+# author: Andrew R. McCluskey
+
+import os
+import tempfile
+import unittest
+import h5py
+import numpy as np
+from numpy.testing import assert_equal
+from ESSReflReducer import chunked
+
+
+class TestChunked(unittest.TestCase):
+    """
+    Tests for the parallel decompression of chunked datasets.
+    """
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, 'events.hdf')
+        self.values = np.random.default_rng(2).integers(0, 2 ** 20, 10000).astype(np.uint32)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_read(self):
+        """
+        Test that the chunks, including a partial last chunk, are read.
+        """
+        with h5py.File(self.filename, 'w') as f:
+            f.create_dataset('a', data=self.values, chunks=(3000,), compression='gzip')
+        with h5py.File(self.filename, 'r') as f:
+            self.assertTrue(chunked.can_read_parallel(f['a']))
+            result = chunked.read(f['a'], n_threads=3)
+        assert_equal(result, self.values)
+        assert_equal(result.dtype, self.values.dtype)
+
+    def test_read_unallocated(self):
+        """
+        Test that chunks that were never written take the fill value.
+        """
+        with h5py.File(self.filename, 'w') as f:
+            dataset = f.create_dataset('a', shape=(10000,), dtype=np.uint32, chunks=(3000,), compression='gzip', fillvalue=7)
+            dataset[:3000] = self.values[:3000]
+        with h5py.File(self.filename, 'r') as f:
+            result = chunked.read(f['a'], n_threads=2)
+        assert_equal(result[:3000], self.values[:3000])
+        assert_equal(result[3000:], 7)
+
+    def test_other_filters(self):
+        """
+        Test that datasets with other filters, or no compression, are read
+        by h5py.
+        """
+        with h5py.File(self.filename, 'w') as f:
+            f.create_dataset('shuffled', data=self.values, chunks=(3000,), compression='gzip', shuffle=True)
+            f.create_dataset('contiguous', data=self.values)
+        with h5py.File(self.filename, 'r') as f:
+            for name in ['shuffled', 'contiguous']:
+                self.assertFalse(chunked.can_read_parallel(f[name]))
+                assert_equal(chunked.read(f[name], n_threads=2), self.values)
+
+
+if __name__ == '__main__':
+    unittest.main()
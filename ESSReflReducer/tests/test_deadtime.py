@@ -0,0 +1,70 @@
+"""
+Tests for deadtime module
+"""
+
+# Copyright (c) Andrew R. McCluskey
+# Distributed under the terms of the MIT License
+# author: Andrew R. McCluskey
+
+import unittest
+import numpy as np
+from numpy.testing import assert_almost_equal, assert_equal
+from ESSReflReducer import deadtime
+
+
+class TestDeadTime(unittest.TestCase):
+    """
+    Tests for the dead-time correction.
+    """
+    def test_event_pulses(self):
+        """
+        Test that each event takes the pulse it follows.
+        """
+        assert_equal(deadtime.event_pulses(np.array([0, 2, 2, 5]), 0, 7), [0, 0, 2, 2, 2, 3, 3])
+
+    def test_event_pulses_block(self):
+        """
+        Test that a block of events takes the pulses of its position.
+        """
+        event_index = np.array([0, 2, 2, 5], dtype=np.uint64)
+        assert_equal(deadtime.event_pulses(event_index, 3, 3), [2, 2, 3])
+
+    def test_cell_index(self):
+        pulse = np.array([0, 0, 1, 1])
+        pixel = np.array([0., 5., 1., 200.])
+        time = np.array([0., 0.6, 0.9, 2.])
+        index = deadtime.cell_index(pulse, pixel, time, region_pixels=4, n_regions=2, window_width=0.5, n_windows=2)
+        assert_equal(index, [0, 3, 5, 7])
+
+    def test_cell_counts(self):
+        assert_equal(deadtime.cell_counts(np.array([0, 3, 3]), 5), [1., 0., 0., 2., 0.])
+
+    def test_non_paralysable(self):
+        """
+        Test that the observed rate of the true rate is recovered.
+        """
+        true_rate = np.array([0., 1e4, 2e5])
+        observed = true_rate / (1 + true_rate * 1e-6)
+        assert_almost_equal(observed * deadtime.correction_factors(observed, 1e-6), true_rate)
+
+    def test_paralysable(self):
+        true_rate = np.array([0., 1e4, 2e5])
+        observed = true_rate * np.exp(-true_rate * 1e-6)
+        assert_almost_equal(observed * deadtime.correction_factors(observed, 1e-6, 'paralysable'), true_rate)
+
+    def test_saturated(self):
+        """
+        Test that rates beyond the model are refused.
+        """
+        with self.assertRaises(ValueError):
+            deadtime.correction_factors(np.array([1e6]), 1e-6)
+        with self.assertRaises(ValueError):
+            deadtime.correction_factors(np.array([4e5]), 1e-6, 'paralysable')
+
+    def test_unknown_model(self):
+        with self.assertRaises(ValueError):
+            deadtime.correction_factors(np.array([1.]), 1e-6, 'extended')
+
+
+if __name__ == '__main__':
+    unittest.main()
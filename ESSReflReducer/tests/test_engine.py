@@ -0,0 +1,145 @@
+"""
+Tests for engine module
+"""
+
+# Copyright (c) Andrew R. McCluskey
+# Distributed under the terms of the MIT License
+# author: Andrew R. McCluskey
+
+import unittest
+import numpy as np
+from numpy.testing import assert_almost_equal, assert_equal
+from ESSReflReducer import engine
+
+
+class TestEngine(unittest.TestCase):
+    def test_reshuffle_tof(self):
+        eto = np.array([0.0, 0.01, 0.05, 0.07])
+        tof = engine.reshuffle_tof(eto, 0.075, 0.02, 0.0)
+        assert_almost_equal(tof, [0.075, 0.085, 0.05, 0.07])
+
+    def test_reshuffle_tof_offset(self):
+        eto = np.array([0.03])
+        assert_almost_equal(engine.reshuffle_tof(eto, 0.075, 0.02, 0.001), [0.031])
+
+    def test_detector_yz(self):
+        pixel_id = np.array([0, 33, 1024 + 31])
+        blade, z_on_blade, y, z = engine.detector_yz(pixel_id, 0.025, 0.01, 0.001)
+        assert_equal(blade, [0, 0, 1])
+        assert_equal(z_on_blade, [0, 1, 0])
+        assert_almost_equal(y, [0, 1e-3, 31e-3])
+        assert_almost_equal(z, [0.025, 0.024, 0.015])
+
+    def test_detector_yz_layout(self):
+        pixel_id = np.array([0, 17, 64 + 15])
+        blade, z_on_blade, y, z = engine.detector_yz(pixel_id, 0.025, 0.01, 0.001, n_wires=4, n_strips=16, strip_width=2e-3)
+        assert_equal(blade, [0, 0, 1])
+        assert_equal(z_on_blade, [0, 1, 0])
+        assert_almost_equal(y, [0, 2e-3, 30e-3])
+        assert_almost_equal(z, [0.025, 0.024, 0.015])
+
+    def test_wavelength(self):
+        flight_path_length, wavelength = engine.wavelength(np.array([0.05, 0.1]), np.array([0, 2]), 19., 0.001, 0., 3.956e-7)
+        assert_almost_equal(flight_path_length, [19., 19.002])
+        assert_almost_equal(wavelength, [0.05 * 3.956e-7 / 19., 0.1 * 3.956e-7 / 19.002])
+
+    def test_theta(self):
+        theta = engine.theta(np.array([0., 0.04]), 4., 2., 1.)
+        assert_almost_equal(theta, [1., 1. + np.degrees(0.01)])
+
+    def test_theta_gravity_sign(self):
+        z = np.array([0.01])
+        wavelength = np.array([5e-10])
+        _, positive = engine.theta_gravity(z, wavelength, 4., 1.)
+        _, negative = engine.theta_gravity(z, wavelength, 4., -1.)
+        assert_almost_equal(positive + negative, [2.])
+
+    def test_qz(self):
+        assert_almost_equal(engine.qz(np.array([30.]), np.array([2 * np.pi * 1e-10])), [1.])
+
+    def test_outside(self):
+        assert_equal(engine.outside(np.array([0., 1., 2., 3.]), 1., 2.), [True, False, False, True])
+
+    def test_illumination(self):
+        assert_almost_equal(engine.illumination(0.001, 0.01, np.array([0., 90.])), [0., 1.])
+
+    def test_histogram(self):
+        values, variances = engine.histogram(np.array([0., 0.5, 1., 1.5, 2., np.nan]), np.array([0., 1., 2.]))
+        assert_equal(values, [2., 2.])
+        assert_equal(variances, [2., 2.])
+
+    def test_histogram_weights_mask(self):
+        x = np.array([0.5, 0.5, 1.5])
+        values, variances = engine.histogram(x, np.array([0., 1., 2.]), weights=np.array([2., 3., 4.]), mask=np.array([False, True, False]))
+        assert_equal(values, [2., 4.])
+        assert_equal(variances, [4., 16.])
+
+    def test_histogram_empty(self):
+        values, variances = engine.histogram(np.zeros(0), np.array([0., 1., 2.]), weights=np.zeros(0))
+        self.assertEqual(values.dtype, np.float64)
+        assert_equal(values, [0., 0.])
+        assert_equal(variances, [0., 0.])
+
+    def test_outside_single_precision(self):
+        y = np.array([0.028, 0.029, 0.030], dtype=np.float32)
+        assert_equal(engine.outside(y, 1e-3, 29e-3), [False, False, True])
+
+    def test_detector_yz_single_precision(self):
+        _, _, y, z = engine.detector_yz(np.array([29., 1024.], dtype=np.float32), 0.025, 0.01, 0.001)
+        assert_equal(y.dtype, np.float32)
+        assert_equal(y[0], np.float32(0.029))
+        assert_equal(z[1], np.float32(0.015))
+
+    def test_ravel_index(self):
+        index = engine.ravel_index([np.array([0.5, 1.5, 1.5, 3.]), np.array([0.5, 0.5, 2.5, 0.5])], [np.array([0., 1., 2.]), np.array([0., 1., 2., 3.])])
+        assert_equal(index, [0, 3, 5, -1])
+
+    def test_lookup(self):
+        table = np.array([[1., 2., 3.], [4., 5., 6.]])
+        result = engine.lookup([np.array([0.5, 1.5, 1.5, 3.]), np.array([0.5, 0.5, 2.5, 0.5])], [np.array([0., 1., 2.]), np.array([0., 1., 2., 3.])], table)
+        assert_equal(result, [1., 4., 6., np.nan])
+
+    def test_counting_sort(self):
+        key = np.array([3, 1, 2, 1, 0, 3])
+        order = engine.counting_sort(key, 4)
+        assert_equal(key[order], [0, 1, 1, 2, 3, 3])
+        assert_equal(order, [4, 1, 3, 2, 0, 5])
+
+    def test_counting_sort_wide_keys(self):
+        """
+        Test that keys wider than 16 bits are sorted by both digits, keeping
+        the order of equal keys.
+        """
+        rng = np.random.default_rng(5)
+        key = rng.integers(0, 1 << 20, 10000)
+        order = engine.counting_sort(key, 1 << 20)
+        assert_equal(order, np.argsort(key, kind='stable'))
+
+    def test_run_lengths(self):
+        values, lengths = engine.run_lengths(np.array([2., 2., 5., 7., 7., 7.]))
+        assert_equal(values, [2., 5., 7.])
+        assert_equal(lengths, [2, 1, 3])
+        assert_equal(np.repeat(values, lengths), [2., 2., 5., 7., 7., 7.])
+        assert_equal(engine.run_lengths(np.zeros(0))[1].size, 0)
+
+    def test_histogram_nd(self):
+        rng = np.random.default_rng(4)
+        x = rng.random(1000)
+        y = rng.random(1000)
+        weights = rng.random(1000)
+        x_edges = np.linspace(0, 1, 6)
+        y_edges = np.linspace(0.2, 0.8, 4)
+        values, variances = engine.histogram_nd([x, y], [x_edges, y_edges], weights=weights)
+        expected, _, _ = np.histogram2d(x, y, bins=(x_edges, y_edges), weights=weights)
+        expected_variances, _, _ = np.histogram2d(x, y, bins=(x_edges, y_edges), weights=weights ** 2)
+        assert_almost_equal(values, expected)
+        assert_almost_equal(variances, expected_variances)
+
+    def test_histogram_nd_index(self):
+        rng = np.random.default_rng(5)
+        x = rng.random(1000)
+        weights = rng.random(1000)
+        edges = np.linspace(0.1, 0.9, 9)
+        index = engine.ravel_index([x], [edges])
+        expected = engine.histogram_nd([x], [edges], weights=weights)
+        assert_equal(engine.histogram_nd([x], [edges], weights=weights, index=index), expected)
@@ -6,6 +6,9 @@ Tests for header module
 # Distributed under the terms of the MIT License
 # author: Andrew R. McCluskey
 
+import os
+import subprocess
+import sys
 import unittest
 from numpy.testing import assert_almost_equal, assert_equal
 from datetime import datetime, date
@@ -17,6 +20,12 @@ TODAY_DATE = date.today()
 
 
 class TestHeader(unittest.TestCase):
+    def test_import_without_scipp(self):
+        code = "import sys, ESSReflReducer.header; print('scipp' in sys.modules, 'scipy' in sys.modules)"
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        result = subprocess.run([sys.executable, '-c', code], cwd=root, stdout=subprocess.PIPE, universal_newlines=True, check=True)
+        assert_equal(result.stdout.split(), ['False', 'False'])
+
     def test_person_init_a(self):
         p = header.Person("Brian")
         assert_equal(p.name, "Brian")
@@ -0,0 +1,63 @@
+"""
+Tests for instrument module
+"""
+
+# Copyright (c) Andrew R. McCluskey
+# Distributed under the terms of the MIT License
+# author: Andrew R. McCluskey
+
+import unittest
+import numpy as np
+import scipp as sc
+from numpy.testing import assert_almost_equal, assert_equal
+from ESSReflReducer import instrument
+
+
+class TestInstrument(unittest.TestCase):
+    """
+    Tests for the instrument descriptions and registry.
+    """
+    def test_n_pixels(self):
+        """
+        Test the number of pixels of AMOR.
+        """
+        assert_equal(instrument.AMOR.n_pixels, 14 * 32 * 32)
+
+    def test_detector_geometry(self):
+        """
+        Test the kernel parameters of the AMOR detector.
+        """
+        geometry = instrument.AMOR.detector_geometry()
+        assert_almost_equal(geometry['detector_zero'], 2.5 * 10.11e-3)
+        assert_almost_equal(geometry['detector_blade_z'], 10.11e-3)
+        assert_almost_equal(geometry['detector_dz'], 4e-3 * np.sin(np.radians(5.)))
+        assert_equal(geometry['n_wires'], 32)
+
+    def test_detector_geometry_override(self):
+        """
+        Test that the detector angle and blade spacing can be given.
+        """
+        geometry = instrument.AMOR.detector_geometry(90. * sc.units.deg, 0.02 * sc.units.m)
+        assert_almost_equal(geometry['detector_zero'], 0.05)
+        assert_almost_equal(geometry['detector_dz'], 4e-3)
+        assert_almost_equal(instrument.AMOR.detector_dx(90. * sc.units.deg), 0.)
+
+    def test_register(self):
+        """
+        Test that a registered instrument is found in any case.
+        """
+        estia = instrument.Instrument('ESTIA', n_blades=48)
+        instrument.register(estia, object)
+        self.assertIs(instrument.get('estia')[0], estia)
+        del instrument._READERS['ESTIA']
+
+    def test_get_unknown(self):
+        """
+        Test that an unregistered instrument is an error.
+        """
+        with self.assertRaises(ValueError):
+            instrument.get('FREIA')
+
+
+if __name__ == '__main__':
+    unittest.main()
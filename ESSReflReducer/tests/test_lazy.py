@@ -0,0 +1,90 @@
+"""
+Tests for lazy module
+"""
+
+# Copyright (c) Andrew R. McCluskey
+# Distributed under the terms of the MIT License
+# author: Andrew R. McCluskey
+
+import unittest
+import scipp as sc
+from numpy.testing import assert_equal
+from ESSReflReducer import lazy
+from ESSReflReducer.read_amor import AmorDataReader, AmorReducer
+from synthetic_reduction import Q_BINS, SyntheticReductionTest
+
+
+class TestLazy(unittest.TestCase):
+    """
+    Tests for the processing stage graph.
+    """
+    def test_invalidated_angle_offset(self):
+        """
+        Test that the sample angle offset only affects the angle and the
+        stages that use it.
+        """
+        assert_equal(lazy.invalidated(['sample_angle_horizon_offset']), {'theta', 'qz', 'masks'})
+
+    def test_invalidated_chopper_phase(self):
+        """
+        Test that the chopper phase affects everything downstream of the
+        time-of-flight.
+        """
+        assert_equal(lazy.invalidated(['chopper_phase']), {'tof', 'lambda', 'theta', 'qz', 'masks'})
+
+    def test_invalidated_masks(self):
+        """
+        Test that the mask limits only affect the masks.
+        """
+        assert_equal(lazy.invalidated(['y_min', 'theta_max']), {'masks'})
+
+    def test_invalidated_unknown(self):
+        """
+        Test that an unknown parameter is an error.
+        """
+        with self.assertRaises(ValueError):
+            lazy.invalidated(['title'])
+
+    def test_stage_order(self):
+        """
+        Test that every stage comes after the stages that it uses.
+        """
+        stages = list(lazy.STAGES)
+        for i, inputs in enumerate(lazy.STAGES.values()):
+            for stage in inputs:
+                self.assertLess(stages.index(stage), i)
+
+    def test_defaults(self):
+        """
+        Test that every parameter has a default.
+        """
+        assert_equal(sorted(lazy._defaults()), sorted(lazy.PARAMETERS))
+
+
+class TestPipelineReduction(SyntheticReductionTest):
+    """
+    Tests that a pipeline whose parameters are changed reduces as a reader
+    created with the new parameters.
+    """
+    def _check(self, pipeline, gravity=True, **kwargs):
+        reference = AmorDataReader(self.reference)
+        reference.process()
+        reader = AmorDataReader(self.sample, **kwargs)
+        reader.process(gravity=gravity, **{k: v for k, v in kwargs.items() if k in lazy._MASK_PARAMETERS})
+        expected = AmorReducer(reference, reader, Q_BINS).reflectivity
+        self.assertReflectivity(AmorReducer(reference, pipeline.evaluate(), Q_BINS).reflectivity, expected)
+
+    def test_set(self):
+        pipeline = lazy.AmorPipeline(self.sample)
+        self._check(pipeline)
+        pipeline.set(sample_angle_horizon_offset=0.1 * sc.units.deg, theta_min=0.3 * sc.units.deg, gravity=False)
+        self._check(pipeline, gravity=False, sample_angle_horizon_offset=0.1 * sc.units.deg, theta_min=0.3 * sc.units.deg)
+        self.assertEqual(pipeline.evaluated, ['theta', 'qz', 'masks'])
+        pipeline.set(chopper_phase=-2 * sc.units.dimensionless)
+        self._check(pipeline, gravity=False, sample_angle_horizon_offset=0.1 * sc.units.deg, theta_min=0.3 * sc.units.deg,
+                    chopper_phase=-2 * sc.units.dimensionless)
+        self.assertEqual(pipeline.evaluated, ['tof', 'lambda', 'theta', 'qz', 'masks'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+Tests for normalisation module
+"""
+
+# Copyright (c) Andrew R. McCluskey
+# Distributed under the terms of the MIT License
+# author: Andrew R. McCluskey
+
+import os
+import unittest
+import numpy as np
+from numpy.testing import assert_almost_equal, assert_equal
+from ESSReflReducer import engine, normalisation
+from ESSReflReducer.read_amor import AmorReducer
+from synthetic_reduction import Q_BINS, SyntheticReductionTest
+
+LAMBDA_BINS = np.linspace(4e-10, 8e-10, 5)
+THETA_BINS = np.linspace(0.5, 1.5, 4)
+
+
+class TestNormalisation(unittest.TestCase):
+    """
+    Tests for the normalisation in (wavelength, angle) space.
+    """
+    def test_cell_centres(self):
+        wavelength, theta = normalisation.cell_centres(LAMBDA_BINS, THETA_BINS)
+        assert_equal(wavelength.shape, (4, 3))
+        assert_almost_equal(wavelength[:, 0], [4.5e-10, 5.5e-10, 6.5e-10, 7.5e-10])
+        assert_almost_equal(theta[0], [2 / 3, 1., 4 / 3])
+
+    def test_reference_table(self):
+        """
+        Test that the reference is corrected for the supermirror reflectivity.
+        """
+        values = np.full((4, 3), 2.)
+        table, variances = normalisation.reference_table(values, values, LAMBDA_BINS, THETA_BINS)
+        wavelength, theta = normalisation.cell_centres(LAMBDA_BINS, THETA_BINS)
+        reflectivity = normalisation.supermirror_reflectivity(engine.qz(theta, wavelength))
+        assert_almost_equal(table * reflectivity, 2.)
+        assert_almost_equal(variances * reflectivity ** 2, 2.)
+
+    def test_cell_fractions(self):
+        """
+        Test that each cell is shared between the qz bins, when the bins
+        cover all of the cells.
+        """
+        q_bins = np.linspace(0.01, 0.09, 30)
+        fractions = normalisation.cell_fractions(LAMBDA_BINS, THETA_BINS, q_bins)
+        assert_equal(fractions.shape, (4, 3, 29))
+        assert_almost_equal(fractions.sum(axis=2), 1.)
+
+    def test_reflectivity(self):
+        """
+        Test that a uniform reflectivity is recovered from events spread
+        uniformly over each cell.
+        """
+        q_bins = np.linspace(0.005, 0.04, 8)
+        fractions = normalisation.cell_fractions(LAMBDA_BINS, THETA_BINS, q_bins)
+        table = np.full((4, 3), 100.)
+        cells = np.full((4, 3), 0.5)
+        summed = np.einsum('ijk,ij->k', fractions, cells)
+        values, variances = normalisation.reflectivity(summed, summed / 100., cells, table, table, fractions)
+        covered = fractions.sum(axis=(0, 1)) > 0
+        assert_almost_equal(values[covered], 0.5)
+        assert_equal(np.all(variances[covered] > 0), True)
+        assert_equal(np.isnan(values[~covered]), True)
+
+    def test_reflectivity_empty_cells(self):
+        """
+        Test that cells without reference intensity do not count towards the
+        coverage.
+        """
+        q_bins = np.linspace(0.005, 0.04, 8)
+        fractions = normalisation.cell_fractions(LAMBDA_BINS, THETA_BINS, q_bins)
+        table = np.full((4, 3), 100.)
+        table[:, 0] = 0.
+        cells = np.full((4, 3), 0.5)
+        cells[:, 0] = 0.
+        summed = np.einsum('ijk,ij->k', fractions, cells)
+        values, _ = normalisation.reflectivity(summed, summed / 100., cells, table, table, fractions)
+        covered = (fractions[:, 1:].sum(axis=(0, 1))) > 0
+        assert_almost_equal(values[covered], 0.5)
+
+
+class TestReferenceReduction(SyntheticReductionTest):
+    """
+    Tests for the reduction normalised by a (lambda, theta) reference map.
+    """
+    def test_moved_file(self):
+        """
+        Test that the readers still reduce after their files are removed.
+        """
+        readers = self.readers()
+        os.remove(self.reference)
+        os.remove(self.sample)
+        reference_bins = (np.linspace(2.4e-10, 1.2e-9, 41), np.linspace(0., 3., 31))
+        first = AmorReducer(*readers, Q_BINS, reference_bins=reference_bins).reflectivity
+        second = AmorReducer(*readers, Q_BINS, reference_bins=reference_bins).reflectivity
+        self.assertReflectivity(second, first)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+"""
+Tests for outofcore module
+"""
+
+# Copyright (c) Andrew R. McCluskey
+# Distributed under the terms of the MIT License
+# author: Andrew R. McCluskey
+
+import os
+import tempfile
+import unittest
+import numpy as np
+import h5py
+from numpy.testing import assert_equal
+from ESSReflReducer import engine, outofcore, synthetic
+from ESSReflReducer.read_amor import AmorReducer
+from synthetic_reduction import Q_BINS, SyntheticReductionTest
+
+
+class TestOutOfCore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, 'events.hdf')
+        self.values = np.arange(1000, dtype=np.uint32)
+        with h5py.File(self.filename, 'w') as f:
+            f['contiguous'] = self.values
+            f.create_dataset('compressed', data=self.values, chunks=(100,), compression='gzip')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_lazy_dataset_contiguous(self):
+        with h5py.File(self.filename, 'r') as f:
+            lazy = outofcore.lazy_dataset(f['contiguous'])
+            self.assertIsInstance(lazy, np.memmap)
+            assert_equal(lazy[250:520], self.values[250:520])
+
+    def test_lazy_dataset_compressed(self):
+        with h5py.File(self.filename, 'r') as f:
+            lazy = outofcore.lazy_dataset(f['compressed'])
+            self.assertIsInstance(lazy, h5py.Dataset)
+            assert_equal(lazy[250:520], self.values[250:520])
+
+    def test_map_chunks_empty(self):
+        """
+        Test that a file without events gives empty histograms, rather than
+        no chunks to sum.
+        """
+        synthetic.write_amor_file(self.filename, n_events=0)
+        reader = outofcore.AmorOutOfCoreReader(self.filename, n_threads=2)
+        reader.process()
+        values, variances = reader.map_chunks(lambda chunk: engine.histogram(chunk.data.coords['qz'].values, Q_BINS))
+        assert_equal(values, np.zeros(len(Q_BINS) - 1))
+        assert_equal(variances, np.zeros(len(Q_BINS) - 1))
+
+
+class TestOutOfCoreReduction(SyntheticReductionTest):
+    sample_kwargs = {'compression': 'gzip'}
+
+    def test_reflectivity(self):
+        """
+        Test that a reduction of events in several chunks matches the
+        reduction of the events in memory.
+        """
+        # A small budget, so that the events are split into several chunks.
+        readers = [outofcore.AmorOutOfCoreReader(filename, memory_budget=2 ** 20) for filename in [self.reference, self.sample]]
+        for reader in readers:
+            reader.process()
+        self.assertReflectivity(AmorReducer(*readers, Q_BINS).reflectivity, self.expected())
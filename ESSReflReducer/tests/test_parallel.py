@@ -0,0 +1,54 @@
+"""
+Tests for parallel module
+"""
+
+# Copyright (c) Andrew R. McCluskey
+# Distributed under the terms of the MIT License
+# author: Andrew R. McCluskey
+
+import unittest
+import numpy as np
+from numpy.testing import assert_almost_equal, assert_equal
+from ESSReflReducer import engine, parallel
+
+N_EVENTS = parallel.MIN_BLOCK_SIZE * 5 + 17
+
+
+class TestParallel(unittest.TestCase):
+    def test_block_slices(self):
+        slices = parallel.block_slices(10, 3)
+        assert_equal([(s.start, s.stop) for s in slices], [(0, 3), (3, 6), (6, 10)])
+
+    def test_block_slices_more_blocks_than_events(self):
+        assert_equal(len(parallel.block_slices(2, 4)), 2)
+
+    def test_map_blocks_single(self):
+        x = np.random.default_rng(1).random(N_EVENTS)
+        assert_equal(parallel.map_blocks(np.sqrt, [x], n_threads=4), np.sqrt(x))
+
+    def test_map_blocks_tuple(self):
+        pixel_id = np.random.default_rng(2).integers(0, 14 * 1024, N_EVENTS)
+        expected = engine.detector_yz(pixel_id, 0.025, 0.01, 0.001)
+        result = parallel.map_blocks(lambda p: engine.detector_yz(p, 0.025, 0.01, 0.001), [pixel_id], n_threads=3)
+        for r, e in zip(result, expected):
+            assert_equal(r, e)
+
+    def test_reduce_blocks(self):
+        rng = np.random.default_rng(3)
+        x = rng.random(N_EVENTS)
+        weights = rng.random(N_EVENTS)
+        edges = np.linspace(0, 1, 11)
+        expected = engine.histogram(x, edges, weights)
+        result = parallel.reduce_blocks(lambda a, w, m: engine.histogram(a, edges, w, m), [x, weights, None], n_threads=4)
+        for r, e in zip(result, expected):
+            assert_almost_equal(r, e)
+
+    def test_reduce_tasks(self):
+        result = parallel.reduce_tasks(lambda i: (np.array([i]), np.array([i * i])), range(10), n_threads=3, max_in_flight=2)
+        assert_equal(result[0], [45])
+        assert_equal(result[1], [285])
+
+    def test_reduce_tasks_empty(self):
+        for n_threads in [1, 3]:
+            with self.assertRaises(ValueError):
+                parallel.reduce_tasks(lambda i: np.array([i]), [], n_threads=n_threads)
@@ -0,0 +1,81 @@
+"""
+Tests for polarisation module
+"""
+
+# Copyright (c) Andrew R. McCluskey
+# Distributed under the terms of the MIT License
+# author: Andrew R. McCluskey
+
+import unittest
+import h5py
+import numpy as np
+from numpy.testing import assert_equal
+from ESSReflReducer import polarisation
+from ESSReflReducer.read_amor import AmorDataReader
+from synthetic_reduction import Q_BINS, SyntheticReductionTest
+
+
+class TestPolarisation(unittest.TestCase):
+    """
+    Tests for the spin channel assignment.
+    """
+    def test_pulse_channels_no_logs(self):
+        """
+        Test that all pulses are '++' without flipper logs.
+        """
+        assert_equal(polarisation.pulse_channels(np.arange(5)), np.zeros(5))
+
+    def test_pulse_channels(self):
+        """
+        Test that the last logged state at or before each pulse is used.
+        """
+        pulse_time = np.arange(8)
+        polariser = (np.array([0, 4]), np.array([0, 1]))
+        analyser = (np.array([0, 2, 6]), np.array([0, 1, 0]))
+        result = polarisation.pulse_channels(pulse_time, polariser, analyser)
+        expected = ['++', '++', '+-', '+-', '--', '--', '-+', '-+']
+        assert_equal([polarisation.CHANNELS[i] for i in result], expected)
+
+    def test_pulse_channels_before_log(self):
+        """
+        Test that pulses before the first log entry take the first state.
+        """
+        result = polarisation.pulse_channels(np.arange(3), (np.array([1]), np.array([1])))
+        assert_equal(result, [2, 2, 2])
+
+    def test_event_channels(self):
+        """
+        Test that each event takes the channel of its pulse.
+        """
+        result = polarisation.event_channels(np.array([0, 3, 1]), np.array([0, 2, 2]), 5)
+        assert_equal(result, [0, 0, 1, 1, 1])
+
+
+class TestPolarisedReduction(SyntheticReductionTest):
+    """
+    Tests that a channel of a polarised reduction is the reduction of its
+    events alone.
+    """
+    def _check(self, data):
+        expected = self.expected()
+        reference = AmorDataReader(self.reference)
+        reference.process()
+        data.process()
+        reflectivity = polarisation.AmorPolarisedReducer(reference, data, Q_BINS).reflectivity
+        self.assertEqual(list(reflectivity), ['--'])
+        self.assertReflectivity(reflectivity['--'], expected)
+
+    def test_channel_files(self):
+        self._check(polarisation.AmorPolarisedReader({'--': self.sample}))
+
+    def test_flipper_logs(self):
+        with h5py.File(self.sample, 'r+') as f:
+            for name in ['polariser', 'analyser']:
+                f[f'/instrument/{name}/time'] = np.zeros(1)
+                f[f'/instrument/{name}/value'] = np.ones(1)
+        self._check(polarisation.AmorPolarisedReader(self.sample, polariser_log='/instrument/polariser',
+                                                     analyser_log='/instrument/analyser'))
+
+
+if __name__ == '__main__':
+    unittest.main()
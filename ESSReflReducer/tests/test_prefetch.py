@@ -0,0 +1,93 @@
+"""
+Tests for prefetch module
+"""
+
+# Copyright (c) Andrew R. McCluskey
+# Distributed under the terms of the MIT License
+# author: Andrew R. McCluskey
+
+import threading
+import time
+import unittest
+from numpy.testing import assert_equal
+from ESSReflReducer import prefetch
+
+
+class TestPrefetch(unittest.TestCase):
+    """
+    Tests for the background reading of a series of files.
+    """
+    def test_order(self):
+        """
+        Test that the readers are given in the order of the files.
+        """
+        filenames = [f'file{i}.hdf' for i in range(5)]
+        result = list(prefetch.Prefetcher(filenames, load=lambda f, suffix: f + suffix, suffix='!'))
+        assert_equal(result, [f + '!' for f in filenames])
+
+    def test_depth(self):
+        """
+        Test that no more than the depth of files are waiting, besides the
+        file being read.
+        """
+        loaded = []
+        used = []
+
+        def load(filename):
+            loaded.append(filename)
+            return filename
+
+        for filename in prefetch.Prefetcher(range(10), load=load, depth=2):
+            time.sleep(0.01)
+            self.assertLessEqual(len(loaded) - len(used), 4)
+            used.append(filename)
+        assert_equal(used, list(range(10)))
+
+    def test_overlap(self):
+        """
+        Test that reading overlaps with the processing.
+        """
+        def load(filename):
+            time.sleep(0.05)
+            return filename
+
+        prefetcher = prefetch.Prefetcher(range(4), load=load)
+        for _ in prefetcher:
+            time.sleep(0.05)
+        self.assertGreater(prefetcher.efficiency, 0.5)
+        self.assertIn('overlap efficiency', prefetcher.report())
+
+    def test_error(self):
+        """
+        Test that an error reading a file is raised when it is needed.
+        """
+        def load(filename):
+            if filename == 2:
+                raise OSError('unreadable')
+            return filename
+
+        used = []
+        with self.assertRaises(OSError):
+            for filename in prefetch.Prefetcher(range(4), load=load):
+                used.append(filename)
+        assert_equal(used, [0, 1])
+
+    def test_stop_early(self):
+        """
+        Test that the background thread stops when the iteration does.
+        """
+        threads = threading.active_count()
+        for filename in prefetch.Prefetcher(range(10), load=lambda f: f):
+            break
+        assert_equal(threading.active_count(), threads)
+
+    def test_depth_invalid(self):
+        """
+        Test that the depth must be positive.
+        """
+        with self.assertRaises(ValueError):
+            prefetch.Prefetcher([], depth=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
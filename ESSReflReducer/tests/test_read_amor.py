@@ -0,0 +1,67 @@
+"""
+Tests for read_amor module
+"""
+
+# Copyright (c) Andrew R. McCluskey
+# Distributed under the terms of the MIT License
+# author: Andrew R. McCluskey
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from numpy.testing import assert_allclose, assert_almost_equal, assert_equal
+from ESSReflReducer import engine, read_amor, synthetic
+
+
+class TestReadAmor(unittest.TestCase):
+    """
+    Tests for the reduction helpers.
+    """
+    def test_constant_resolution_bins(self):
+        """
+        Test that the bins have a constant relative width and cover the
+        range.
+        """
+        bins = read_amor.constant_resolution_bins(0.005, 0.1, 0.05)
+        assert_almost_equal(np.diff(bins) / bins[:-1], 0.05)
+        self.assertEqual(bins[0], 0.005)
+        self.assertGreaterEqual(bins[-1], 0.1)
+        self.assertLess(bins[-2], 0.1)
+
+    def test_reorder(self):
+        """
+        Test that every per-event quantity, including the gravitational
+        drop, is moved with the events.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'amor.hdf')
+            synthetic.write_amor_file(filename, n_events=10000, n_blades=2)
+            reader = read_amor.AmorDataReader(filename)
+        reader.process()
+        theta = reader.data.coords['theta'].values.copy()
+        reader.reorder(by='pixel_tof')
+        assert_equal(np.sort(reader.data.coords['theta'].values), np.sort(theta))
+        self.assertTrue(np.all(np.diff(reader.pixel_ids().astype(np.int64)) >= 0))
+        wavelength = reader.data.coords['lambda'].values
+        distance = reader.sample_detector_distance.value
+        assert_allclose(reader.gravity_drop, -3.07 * distance * distance * wavelength * wavelength)
+
+    def test_illumination_table(self):
+        """
+        Test that the tabulated illumination matches the illumination of
+        each event.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'amor.hdf')
+            synthetic.write_amor_file(filename, n_events=10000, n_blades=2)
+            reader = read_amor.AmorDataReader(filename)
+        reader.process()
+        keep = ~reader.mask()
+        theta = reader.data.coords['theta'].values[keep]
+        exact = engine.illumination(reader.beam_size.value, reader.sample_size.value, theta)
+        assert_allclose(reader.illumination_table()(theta), exact, rtol=1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
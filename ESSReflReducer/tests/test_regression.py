@@ -0,0 +1,82 @@
+"""
+Tests for regression module
+"""
+
+# Copyright (c) Andrew R. McCluskey
+# Distributed under the terms of the MIT License
+# author: Andrew R. McCluskey
+
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+import numpy as np
+import scipp as sc
+from numpy.testing import assert_almost_equal, assert_equal
+from ESSReflReducer import regression
+from synthetic_reduction import SyntheticReductionTest
+
+
+class TestRegression(unittest.TestCase):
+    def test_flatten(self):
+        reflectivity = {'coarse': sc.DataArray(data=sc.Variable(dims=['qz'], values=[1., 2.], variances=[0.1, 0.2]))}
+        arrays = regression.flatten(reflectivity, 'gravity')
+        assert_equal(sorted(arrays), ['gravity/coarse/values', 'gravity/coarse/variances'])
+        assert_equal(arrays['gravity/coarse/variances'], [0.1, 0.2])
+
+    def test_compare(self):
+        golden = {'a': np.array([1., 2., np.inf]), 'b': np.array([1., 0.])}
+        self.assertEqual(regression.compare({'a': np.array([1., 2. + 1e-12, np.inf]), 'b': np.array([1., 0.])}, golden, 1e-9), {})
+        failures = regression.compare({'a': np.array([1., 2.2, np.inf]), 'b': np.array([1., 0.])}, golden, 1e-9)
+        assert_equal(list(failures), ['a'])
+        assert_almost_equal(failures['a'], 0.1)
+
+    def test_compare_missing(self):
+        golden = {'a': np.array([1., 2.])}
+        failures = regression.compare({'a': np.array([1.]), 'c': np.array([1.])}, golden, 1e-9)
+        self.assertEqual(failures, {'a': np.inf, 'c': np.inf})
+
+    def test_compare_finite(self):
+        failures = regression.compare({'a': np.array([1., np.nan])}, {'a': np.array([1., 2.])}, 1e-9)
+        self.assertEqual(failures, {'a': np.inf})
+
+    def test_throughput(self):
+        rates = regression.throughput({'read': 0.5, 'reduce': 2.}, 1000)
+        assert_almost_equal([rates['read'], rates['reduce']], [2000., 500.])
+
+    def test_check_throughput(self):
+        baseline = {'read': 1000., 'reduce': 1000.}
+        failures = regression.check_throughput({'read': 850., 'reduce': 700., 'new': 1.}, baseline, threshold=0.2)
+        assert_equal(list(failures), ['reduce'])
+        assert_almost_equal(failures['reduce'], 0.3)
+
+    def test_baseline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'throughput.json')
+            regression.save_baseline(filename, {'read': 1e6}, 1000)
+            baseline = regression.load_baseline(filename)
+        self.assertEqual(baseline['events_per_second'], {'read': 1e6})
+        self.assertEqual(baseline['n_events'], 1000)
+        self.assertEqual(baseline['machine'], regression.machine())
+        self.assertEqual(sorted(baseline['machine']), ['cpu', 'cpu_count'])
+
+
+class TestRegressionPaths(SyntheticReductionTest):
+    def test_check_paths(self):
+        """
+        Test that every reduction path reproduces the in-memory reduction of
+        every case.
+        """
+        golden = regression.golden_reductions(self.reference, self.sample)
+        self.assertEqual(len(golden), 2 * len(regression.CASES) * len(regression.Q_BINS))
+        self.assertReflectivity(SimpleNamespace(values=golden['gravity/coarse/values'],
+                                                variances=golden['gravity/coarse/variances']),
+                                self.expected(regression.Q_BINS['coarse'], gravity=True))
+        self.assertEqual(regression.check_paths(self.reference, self.sample, golden), {})
+        golden['gravity/coarse/values'] = golden['gravity/coarse/values'] * (1. + 1e-6)
+        failures = regression.check_paths(self.reference, self.sample, golden, paths=['memory'])
+        self.assertEqual(list(failures), ['memory:gravity/coarse/values'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Tests for resolution module
+"""
+
+# Copyright (c) Andrew R. McCluskey
+# Distributed under the terms of the MIT License
+# author: Andrew R. McCluskey
+
+import pickle
+import unittest
+import numpy as np
+from numpy.testing import assert_almost_equal, assert_equal
+from ESSReflReducer import engine, resolution
+
+
+class TestResolution(unittest.TestCase):
+    def test_table_linear(self):
+        table = resolution.ThetaTable.tabulate(lambda theta: 2. * theta + 1., 0.5, 1.5, n_points=11)
+        theta = np.array([0.5, 0.73, 1.0, 1.4999, 1.5])
+        assert_almost_equal(table(theta), 2. * theta + 1.)
+
+    def test_table_clamped(self):
+        table = resolution.ThetaTable.tabulate(lambda theta: theta ** 2, 1., 2., n_points=5)
+        assert_almost_equal(table(np.array([0., 3.])), [1., 4.])
+
+    def test_table_accuracy(self):
+        def func(theta):
+            return resolution.relative_resolution(1e-3, 1e-2, 3.5e-4, 4., theta)
+
+        table = resolution.ThetaTable.tabulate(func, 0.2, 2., n_points=2049)
+        theta = np.random.default_rng(1).uniform(0.2, 2., 10000)
+        assert_almost_equal(table(theta) / func(theta), np.ones(10000), decimal=5)
+
+    def test_table_single_precision(self):
+        table = resolution.ThetaTable.tabulate(lambda theta: theta, 0., 1., n_points=3)
+        assert_almost_equal(table(np.array([0.25], dtype=np.float32)), [0.25])
+
+    def test_table_pickle(self):
+        table = resolution.ThetaTable.tabulate(np.sqrt, 0., 1., n_points=3)
+        assert_equal(pickle.loads(pickle.dumps(table))(np.array([0.25])), table(np.array([0.25])))
+
+    def test_illuminated_height(self):
+        # A long sample reflects the whole Gaussian beam of `engine.illumination`.
+        sigma = 1e-3 / (2. * np.sqrt(2.) * resolution.FWHM)
+        assert_almost_equal(resolution.illuminated_height(1e-3, 1e3, 2.) / (resolution.FWHM * sigma), 1.)
+        # A short sample is illuminated evenly, across its height.
+        height = 1e-4 * np.radians(1.)
+        assert_almost_equal(resolution.illuminated_height(1e-3, 1e-4, 1.) / (resolution.FWHM * height / np.sqrt(12.)), 1., decimal=5)
+        assert_equal(resolution.illuminated_height(1e-3, 1e-2, np.array([0., -1.])), [0., 0.])
+
+    def test_illuminated_height_cut_off(self):
+        """
+        Test the height against the standard deviation of Gaussian beam
+        heights within the height of the sample.
+        """
+        sigma = 1e-3 / (2. * np.sqrt(2.) * resolution.FWHM)
+        heights = np.random.default_rng(1).normal(0., sigma, 1000000)
+        heights = heights[np.abs(heights) < 0.5 * 1e-2 * np.radians(1.)]
+        assert_almost_equal(resolution.illuminated_height(1e-3, 1e-2, 1.) / (resolution.FWHM * heights.std()), 1., decimal=2)
+        assert_almost_equal(len(heights) / 1e6, engine.illumination(1e-3, 1e-2, 1.), decimal=2)
+
+    def test_angular_resolution(self):
+        # The long sample reflects the whole beam.
+        expected = np.degrees(np.hypot(1e-3 / (2. * np.sqrt(2.)), 3e-4) / 4.)
+        assert_almost_equal(resolution.angular_resolution(1e-3, 1e3, 3e-4, 4., 2.), expected)
+        # Only the pixel contributes without an illuminated height.
+        assert_almost_equal(resolution.angular_resolution(1e-3, 1e-2, 3e-4, 4., 0.), np.degrees(3e-4 / 4.))
+
+    def test_relative_resolution(self):
+        relative = resolution.relative_resolution(1e-3, 1e-2, 3e-4, 4., np.array([-1., 0., 2.]))
+        assert_equal(relative[:2], [0., 0.])
+        assert_almost_equal(relative[2], resolution.angular_resolution(1e-3, 1e-2, 3e-4, 4., 2.) / 2.)
+
+    def test_qz_resolution(self):
+        sigma = resolution.qz_resolution([0.01, 0.03, 0.05], np.array([0.2, 0.]), np.array([4., 0.]))
+        assert_almost_equal(sigma[0], 0.02 * 0.05 / resolution.FWHM)
+        assert_equal(np.isnan(sigma[1]), True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+"""
+Tests for service module
+"""
+
+# Copyright (c) Andrew R. McCluskey
+# Distributed under the terms of the MIT License
+# author: Andrew R. McCluskey
+
+import io
+import json
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from types import SimpleNamespace
+import numpy as np
+from numpy.testing import assert_almost_equal, assert_equal
+from ESSReflReducer import service
+from synthetic_reduction import Q_BINS, SyntheticReductionTest
+
+
+class TestLRUCache(unittest.TestCase):
+    """
+    Tests for the cache of processed readers.
+    """
+    def test_hits(self):
+        cache = service.LRUCache(2)
+        assert_equal(cache.get('a', lambda: 1), 1)
+        assert_equal(cache.get('a', lambda: 2), 1)
+        assert_equal(cache.stats()['hits'], 1)
+        assert_equal(cache.stats()['misses'], 1)
+        assert_almost_equal(cache.stats()['hit_rate'], 0.5)
+
+    def test_eviction(self):
+        """
+        Test that the least recently used value is dropped.
+        """
+        cache = service.LRUCache(2)
+        cache.get('a', lambda: 1)
+        cache.get('b', lambda: 2)
+        cache.get('a', lambda: 1)
+        cache.get('c', lambda: 3)
+        assert_equal(len(cache), 2)
+        assert_equal(cache.get('b', lambda: 4), 4)
+
+    def test_size_invalid(self):
+        with self.assertRaises(ValueError):
+            service.LRUCache(0)
+
+
+class TestRequests(unittest.TestCase):
+    """
+    Tests for the parsing of the requests.
+    """
+    def test_q_bins(self):
+        assert_equal(service.q_bins([0.01, 0.02, 0.04]), [0.01, 0.02, 0.04])
+        assert_almost_equal(service.q_bins({'min': 0.01, 'max': 0.05, 'n': 4}), [0.01, 0.02, 0.03, 0.04, 0.05])
+        bins = service.q_bins({'min': 0.01, 'max': 0.1, 'resolution': 0.05})
+        assert_almost_equal(np.diff(bins) / bins[:-1], 0.05)
+
+    def test_mask_kwargs(self):
+        kwargs = service.mask_kwargs({'theta_min': 0.2, 'lambda_max': 1e-9})
+        assert_equal(kwargs['theta_min'].value, 0.2)
+        assert_equal(str(kwargs['theta_min'].unit), 'deg')
+        assert_equal(str(kwargs['lambda_max'].unit), 'm')
+
+    def test_mask_kwargs_unknown(self):
+        with self.assertRaises(ValueError):
+            service.mask_kwargs({'qz_min': 0.01})
+
+
+class _Server:
+    """
+    A reduction service running on a free port, for the tests of the HTTP
+    interface.
+    """
+    def start_server(self):
+        self.service = service.ReductionService(max_concurrent=1, queue_timeout=0.01)
+        self.server = service.make_server(self.service, port=0)
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.01}, daemon=True)
+        self.thread.start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def stop_server(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def post(self, data):
+        try:
+            return 200, json.loads(urllib.request.urlopen(self.url + '/reduce', data).read())
+        except urllib.error.HTTPError as error:
+            return error.code, json.loads(error.read())
+
+
+class TestServer(_Server, unittest.TestCase):
+    """
+    Tests for the HTTP interface.
+    """
+    def setUp(self):
+        self.start_server()
+
+    def tearDown(self):
+        self.stop_server()
+
+    def test_stats(self):
+        stats = json.loads(urllib.request.urlopen(self.url + '/stats').read())
+        assert_equal(stats['requests'], 0)
+        assert_equal(stats['max_concurrent'], 1)
+        assert_equal(stats['latency'], None)
+        assert_equal(stats['readers']['size'], 0)
+
+    def test_invalid_json(self):
+        status, body = self.post(b'{')
+        assert_equal(status, 400)
+        self.assertIn('Invalid JSON', body['error'])
+
+    def test_missing_file(self):
+        status, body = self.post(json.dumps({'reference': 'missing.hdf', 'sample': 'missing.hdf', 'q_bins': [0.01, 0.02]}).encode())
+        assert_equal(status, 400)
+        assert_equal(self.service.stats()['errors'], 1)
+
+    def test_busy(self):
+        """
+        Test that requests beyond the concurrency limit are refused.
+        """
+        self.service._slots.acquire()
+        try:
+            status, _ = self.post(json.dumps({}).encode())
+        finally:
+            self.service._slots.release()
+        assert_equal(status, 503)
+        assert_equal(self.service.stats()['refused'], 1)
+
+
+class TestServerReduction(_Server, SyntheticReductionTest):
+    """
+    Tests for reductions through the HTTP interface.
+    """
+    def setUp(self):
+        super().setUp()
+        self.start_server()
+
+    def tearDown(self):
+        self.stop_server()
+        super().tearDown()
+
+    def test_reduce(self):
+        """
+        Test that a reduction returns the ORSO text of the reflectivity, and
+        that a repeated request reuses the processed readers.
+        """
+        request = json.dumps({'reference': self.reference, 'sample': self.sample, 'q_bins': Q_BINS.tolist(),
+                              'qz_resolution': True, 'owner': 'Someone'}).encode()
+        status, body = self.post(request)
+        assert_equal(status, 200)
+        assert_equal(self.post(request)[0], 200)
+        header = '\n'.join(line for line in body['orso'].split('\n') if line.startswith('#'))
+        self.assertIn('"name": "Someone"', header)
+        self.assertIn('"col 4"', header)
+        columns = np.loadtxt(io.StringIO(body['orso']))
+        assert_equal(columns.shape, (len(Q_BINS) - 1, 4))
+        self.assertReflectivity(SimpleNamespace(values=columns[:, 1], variances=columns[:, 2] ** 2), self.expected())
+        stats = self.service.stats()
+        assert_equal(stats['requests'], 2)
+        assert_equal(stats['readers']['hits'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+"""
+Tests for sharedmem module
+"""
+
+# Copyright (c) Andrew R. McCluskey
+# Distributed under the terms of the MIT License
+# author: Andrew R. McCluskey
+
+import os
+import pickle
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from numpy.testing import assert_equal
+from ESSReflReducer import engine, sharedmem, synthetic
+from ESSReflReducer.read_amor import AmorDataReader, AmorReducer
+from synthetic_reduction import Q_BINS, SyntheticReductionTest
+
+
+def _sum_coords(mask, dead_time, *values):
+    keep = np.ones(len(values[0]), dtype=bool) if mask is None else ~mask
+    weights = np.ones(len(values[0])) if dead_time is None else dead_time
+    return tuple(np.array([np.sum(v[keep] * weights[keep])]) for v in values)
+
+
+class TestSharedMem(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.arrays = {'coords/qz': rng.random(1001), 'coords/theta': rng.random(1001).astype(np.float32),
+                       'masks/a': rng.random(1001) < 0.2, 'masks/b': rng.random(1001) < 0.1,
+                       'dead_time': 1 + rng.random(1001)}
+        offsets, size = sharedmem.layout({k: v.dtype for k, v in self.arrays.items()}, 1001)
+        self.segment = shared_memory.SharedMemory(create=True, size=size)
+        self.events = sharedmem.SharedEvents(self.segment.name, 1001, offsets)
+        views = self.events.views(self.segment.buf)
+        for key, values in self.arrays.items():
+            views[key][:] = values
+        del views
+
+    def tearDown(self):
+        self.segment.close()
+        self.segment.unlink()
+
+    def test_layout(self):
+        offsets, size = sharedmem.layout({'a': np.float64, 'b': np.bool_, 'c': np.float32}, 10)
+        assert_equal([offsets[k][0] for k in 'abc'], [0, 128, 192])
+        self.assertEqual(offsets['b'][1], '|b1')
+        self.assertEqual(size, 256)
+
+    def test_layout_no_events(self):
+        self.assertEqual(sharedmem.layout({'a': np.float64}, 0)[1], sharedmem.ALIGNMENT)
+
+    def test_views(self):
+        views = self.events.views(self.segment.buf)
+        for key, values in self.arrays.items():
+            assert_equal(views[key], values)
+            self.assertEqual(views[key].dtype, values.dtype)
+        del views
+
+    def test_descriptor_pickle(self):
+        events = pickle.loads(pickle.dumps(self.events))
+        self.assertEqual(events.name, self.segment.name)
+        self.assertEqual(events.layout, self.events.layout)
+
+    def test_block_arrays(self):
+        mask, dead_time, qz = sharedmem.block_arrays(self.arrays, ['qz'], slice(100, 200))
+        assert_equal(mask, self.arrays['masks/a'][100:200] | self.arrays['masks/b'][100:200])
+        assert_equal(dead_time, self.arrays['dead_time'][100:200])
+        assert_equal(qz, self.arrays['coords/qz'][100:200])
+
+    def test_block_arrays_no_masks(self):
+        mask, dead_time, theta = sharedmem.block_arrays({'coords/theta': self.arrays['coords/theta']}, ['theta'], slice(0, 10))
+        self.assertIsNone(mask)
+        self.assertIsNone(dead_time)
+        assert_equal(theta, self.arrays['coords/theta'][:10])
+
+    def test_map_block(self):
+        result = sharedmem.map_block(self.events, _sum_coords, ['qz', 'theta'], slice(0, 1001))
+        expected = _sum_coords(*sharedmem.block_arrays(self.arrays, ['qz', 'theta'], slice(0, 1001)))
+        assert_equal(result, expected)
+
+    def test_map_block_processes(self):
+        blocks = [slice(0, 400), slice(400, 1001)]
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            results = list(pool.map(sharedmem.map_block, [self.events] * 2, [_sum_coords] * 2, [['qz']] * 2, blocks))
+        expected = _sum_coords(*sharedmem.block_arrays(self.arrays, ['qz'], slice(0, 1001)))
+        self.assertAlmostEqual(results[0][0][0] + results[1][0][0], expected[0][0])
+
+
+class TestSharedReduction(SyntheticReductionTest):
+    """
+    Tests that a reduction of shared events matches the reduction of the
+    events in memory.
+    """
+    def test_reflectivity(self):
+        readers = self.readers()
+        with sharedmem.AmorSharedReader(readers[0], n_processes=2) as reference:
+            with sharedmem.AmorSharedReader(readers[1], n_processes=2) as data:
+                reflectivity = AmorReducer(reference, data, Q_BINS).reflectivity
+        self.assertReflectivity(reflectivity, self.expected())
+
+    def test_no_events(self):
+        """
+        Test that shared readers without events give empty histograms.
+        """
+        filename = os.path.join(self.directory.name, 'empty.hdf')
+        synthetic.write_amor_file(filename, n_events=0)
+        reader = AmorDataReader(filename)
+        reader.process()
+        with sharedmem.AmorSharedReader(reader, n_processes=2) as shared:
+            values, variances = shared.map_chunks(lambda chunk: engine.histogram(chunk.data.coords['qz'].values, Q_BINS))
+        assert_equal(values, np.zeros(len(Q_BINS) - 1))
+        assert_equal(variances, np.zeros(len(Q_BINS) - 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
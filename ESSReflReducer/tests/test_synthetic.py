@@ -0,0 +1,27 @@
+"""
+Tests for synthetic module
+"""
+
+# Copyright (c) Andrew R. McCluskey
+# Distributed under the terms of the MIT License
+# author: Andrew R. McCluskey
+
+import os
+import tempfile
+import unittest
+import h5py
+from numpy.testing import assert_equal
+from ESSReflReducer import synthetic
+
+
+class TestSynthetic(unittest.TestCase):
+    def test_write_amor_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'amor.hdf')
+            synthetic.write_amor_file(filename, n_events=1000, n_blades=2, compression='gzip')
+            with h5py.File(filename, 'r') as f:
+                assert_equal(f['/experiment/data/event_id'].shape, (1000,))
+                assert_equal(f['/experiment/data/event_id'][:].max() < 2 * 1024, True)
+                assert_equal(f['/experiment/data/event_time_offset'].compression, 'gzip')
+                assert_equal(f['/experiment/title'][0], b'synthetic')
+                assert_equal(f['/instrument/stages/som/value'][0], 1.0)
@@ -0,0 +1,30 @@
+"""
+Tests for validation module
+"""
+
+# Copyright (c) Andrew R. McCluskey
+# Distributed under the terms of the MIT License
+# author: Andrew R. McCluskey
+
+import unittest
+import numpy as np
+from numpy.testing import assert_almost_equal, assert_equal
+from ESSReflReducer import validation
+
+
+class TestValidation(unittest.TestCase):
+    def test_relative_deviation(self):
+        deviation = validation.relative_deviation([1.1, 2., 1., 1.], [1., 2., 0., np.nan])
+        assert_almost_equal(deviation[:2], [0.1, 0.])
+        assert_equal(np.isnan(deviation[2:]), [True, True])
+
+    def test_report(self):
+        comparison = {'qz': np.array([0.01, 0.02]),
+                      'reflectivity': np.array([1e-6, 1e-3]),
+                      'uncertainty': np.array([1e-6, 1e-6]),
+                      'significance': np.array([1e-4, 1e-1])}
+        lines = validation.report(comparison, tolerance=1e-4).split('\n')
+        assert_equal(len(lines), 4)
+        assert_equal(lines[1].endswith('*'), False)
+        assert_equal(lines[2].endswith('*'), True)
+        assert_equal(lines[3], '# largest deviation 1.000e-03, tolerance 1.0e-04')
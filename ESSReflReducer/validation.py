@@ -0,0 +1,117 @@
+"""
+Validation of the single precision (`np.float32`) reduction against the
+double precision (`np.float64`) reduction.
+"""
+
+import numpy as np
+from ESSReflReducer.read_amor import AmorDataReader, AmorReducer
+
+
+def reduce_files(reference_filename, data_filename, q_bins, dtype=np.float64,
+                 gravity=True, reader_kwargs=None, mask_kwargs=None):
+    """
+    Reduce a measurement with a given floating point precision.
+
+    Args:
+        reference_filename (str): The reference .hdf file.
+        data_filename (str): The sample .hdf file.
+        q_bins (array_like): The qz bin edges, in reciprocal angstrom.
+        dtype (`np.dtype`, optional): Precision of the per-event values. Defaults to `np.float64`.
+        gravity (bool, optional): Account for the gravitational drop of the neutrons. Defaults to `True`.
+        reader_kwargs (dict, optional): Other arguments for the `AmorDataReader` objects. Defaults to none.
+        mask_kwargs (dict, optional): Limits passed to `AmorDataReader.apply_masks`. Defaults to none.
+
+    Returns:
+        (ESSReflReducer.read_amor.AmorReducer): The reduction.
+    """
+    reader_kwargs = {} if reader_kwargs is None else reader_kwargs
+    mask_kwargs = {} if mask_kwargs is None else mask_kwargs
+    readers = []
+    for filename in [reference_filename, data_filename]:
+        reader = AmorDataReader(filename, dtype=dtype, **reader_kwargs)
+        reader.process(gravity=gravity, **mask_kwargs)
+        readers.append(reader)
+    return AmorReducer(readers[0], readers[1], q_bins)
+
+
+def relative_deviation(test, target):
+    """
+    The relative deviation of one result from another, bins where the target
+    is zero or not finite are `nan`.
+
+    Args:
+        test (array_like): The values under test.
+        target (array_like): The values taken as correct.
+
+    Returns:
+        (array_like): The absolute relative deviation.
+    """
+    test = np.asarray(test, dtype=float)
+    target = np.asarray(target, dtype=float)
+    deviation = np.full(target.shape, np.nan)
+    valid = np.isfinite(target) & (target != 0)
+    deviation[valid] = np.abs(test[valid] - target[valid]) / np.abs(target[valid])
+    return deviation
+
+
+def compare_precision(datasets, q_bins, **kwargs):
+    """
+    Reduce each dataset in single and double precision and find the largest
+    relative deviation of the reflectivity and its uncertainty in each qz bin.
+    The deviation of the reflectivity is also given relative to its
+    uncertainty, as the precision that matters is set by the counting
+    statistics.
+
+    Args:
+        datasets (list of tuple): The (reference filename, sample filename) for each representative dataset.
+        q_bins (array_like): The qz bin edges, in reciprocal angstrom.
+        kwargs: Other arguments passed to `reduce_files`.
+
+    Returns:
+        (dict): The qz bin centres (`'qz'`), the largest relative deviation of the reflectivity (`'reflectivity'`), of its uncertainty (`'uncertainty'`) and of the reflectivity in units of its uncertainty (`'significance'`) over the datasets, in each bin.
+    """
+    q_bins = np.asarray(q_bins, dtype=float)
+    reflectivity = []
+    uncertainty = []
+    significance = []
+    for reference_filename, data_filename in datasets:
+        double = reduce_files(reference_filename, data_filename, q_bins, np.float64, **kwargs).reflectivity
+        single = reduce_files(reference_filename, data_filename, q_bins, np.float32, **kwargs).reflectivity
+        reflectivity.append(relative_deviation(single.values, double.values))
+        uncertainty.append(relative_deviation(np.sqrt(single.variances), np.sqrt(double.variances)))
+        significance.append(relative_deviation(single.values, double.values) * np.abs(double.values) / np.sqrt(double.variances))
+    return {'qz': q_bins[:-1] + 0.5 * np.diff(q_bins),
+            'reflectivity': _nanmax(reflectivity),
+            'uncertainty': _nanmax(uncertainty),
+            'significance': _nanmax(significance)}
+
+
+def _nanmax(deviations):
+    """
+    The largest deviation over datasets, `nan` where no dataset has a value.
+    """
+    deviations = np.array(deviations)
+    result = np.full(deviations.shape[1], np.nan)
+    valid = np.isfinite(deviations).any(axis=0)
+    result[valid] = np.nanmax(deviations[:, valid], axis=0)
+    return result
+
+
+def report(comparison, tolerance=1e-4):
+    """
+    Format a precision comparison as a table.
+
+    Args:
+        comparison (dict): The output of `compare_precision`.
+        tolerance (float, optional): The largest acceptable relative deviation. Defaults to 1e-4.
+
+    Returns:
+        (str): The table, with bins exceeding the tolerance flagged.
+    """
+    lines = ['# qz/Aa^-1  max rel. dev. R  max rel. dev. sigma R  max dev. R / sigma R']
+    for q, r, s, z in zip(comparison['qz'], comparison['reflectivity'], comparison['uncertainty'], comparison['significance']):
+        flag = '  *' if r > tolerance or s > tolerance else ''
+        lines.append(f'{q:.6e}  {r:.3e}  {s:.3e}  {z:.3e}{flag}')
+    worst = np.nanmax(comparison['reflectivity'])
+    lines.append(f'# largest deviation {worst:.3e}, tolerance {tolerance:.1e}')
+    return '\n'.join(lines)
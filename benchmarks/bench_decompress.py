@@ -0,0 +1,79 @@
+"""
+Benchmark of reading compressed event datasets with h5py against reading
+the raw chunks and decompressing them in parallel.
+
+A synthetic gzip-compressed AMOR file is written, and the `event_id` and
+`event_time_offset` datasets are read with each method.
+
+    python benchmarks/bench_decompress.py [--events 20000000] [--threads 1 2 4 8]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import h5py
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ESSReflReducer import chunked, synthetic  # noqa: E402
+
+DATASETS = ['/experiment/data/event_id', '/experiment/data/event_time_offset']
+
+
+def best_time(func, repeats):
+    """
+    The shortest wall time of a function over several calls.
+
+    Args:
+        func (callable): The function, taking no arguments.
+        repeats (int): The number of calls.
+
+    Returns:
+        (tuple): The shortest time, in seconds, and the output of the last call.
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def read_file(filename, read):
+    """
+    Open a file and read the event datasets. The file is opened for each
+    read, so that no chunks are cached by h5py.
+
+    Args:
+        filename (str): The file.
+        read (callable): Function taking a `h5py.Dataset` and returning its values.
+
+    Returns:
+        (list of array_like): The values of each dataset.
+    """
+    with h5py.File(filename, 'r') as f:
+        return [read(f[name]) for name in DATASETS]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--events', type=int, default=20000000, help='number of events in the file')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8], help='numbers of threads to decompress with')
+    parser.add_argument('--repeats', type=int, default=3, help='number of reads timed for each method')
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'events.hdf')
+        synthetic.write_amor_file(filename, n_events=args.events, compression='gzip')
+        print(f"{args.events} events, {os.path.getsize(filename) / 2 ** 20:.1f} MiB compressed, {os.cpu_count()} cores")
+        reference, expected = best_time(lambda: read_file(filename, lambda d: d[:]), args.repeats)
+        print(f"{'h5py':<12}{reference:>10.3f} s")
+        for n_threads in args.threads:
+            elapsed, result = best_time(lambda: read_file(filename, lambda d: chunked.read(d, n_threads)), args.repeats)
+            same = all(np.array_equal(a, b) for a, b in zip(expected, result))
+            print(f"{n_threads:>2} threads  {elapsed:>10.3f} s  speed-up {reference / elapsed:.2f}  identical {same}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark of the full reduction with the events in acquisition order
+against the events reordered by pixel, and by pixel and time.
+
+Synthetic sample and reference AMOR files are written, and each stage of
+reading, processing and reducing is timed for each order of the events.
+
+    python benchmarks/bench_reorder.py [--events 5000000] [--repeats 3]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ESSReflReducer import synthetic  # noqa: E402
+from ESSReflReducer.read_amor import AmorDataReader, AmorReducer  # noqa: E402
+
+STAGES = ['read', 'reorder', 'detector_reconstruction', 'tof_to_lambda', 'find_theta', 'find_qz', 'apply_masks', 'reduce']
+Q_BINS = np.linspace(0.005, 0.1, 101)
+
+
+def reduce_timed(reference, filename, order):
+    """
+    Read, process and reduce a sample, timing each stage.
+
+    Args:
+        reference (ESSReflReducer.read_amor.AmorDataReader): The processed reference.
+        filename (str): The sample file.
+        order (str): The order of the events, see `AmorDataReader.reorder`, or `None` for acquisition order.
+
+    Returns:
+        (tuple): The time of each stage, in seconds, and the reflectivity.
+    """
+    times = {}
+    start = time.perf_counter()
+    reader = AmorDataReader(filename)
+    times['read'] = time.perf_counter() - start
+    start = time.perf_counter()
+    if order is not None:
+        reader.reorder(by=order)
+    times['reorder'] = time.perf_counter() - start
+    for stage in STAGES[2:-1]:
+        start = time.perf_counter()
+        getattr(reader, stage)()
+        times[stage] = time.perf_counter() - start
+    start = time.perf_counter()
+    reflectivity = AmorReducer(reference, reader, Q_BINS).reflectivity
+    times['reduce'] = time.perf_counter() - start
+    return times, reflectivity.values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--events', type=int, default=5000000, help='number of events in the sample file')
+    parser.add_argument('--repeats', type=int, default=3, help='number of reductions timed for each order')
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        sample = os.path.join(directory, 'sample.hdf')
+        reference = os.path.join(directory, 'reference.hdf')
+        synthetic.write_amor_file(sample, n_events=args.events, seed=1)
+        synthetic.write_amor_file(reference, n_events=100000, seed=2)
+        reference = AmorDataReader(reference)
+        reference.process()
+        print(f"{args.events} events, {os.cpu_count()} cores")
+        print(f"{'order':<12}" + ''.join(f"{s[:10]:>11}" for s in STAGES) + f"{'total':>11}")
+        expected = None
+        for order in [None, 'pixel', 'pixel_tof']:
+            runs = [reduce_timed(reference, sample, order) for _ in range(args.repeats)]
+            best = {s: min(r[0][s] for r in runs) for s in STAGES}
+            result = runs[-1][1]
+            if expected is None:
+                expected = result
+            deviation = np.nanmax(np.abs(result - expected) / np.abs(expected))
+            print(f"{str(order):<12}" + ''.join(f"{best[s]:>11.3f}" for s in STAGES)
+                  + f"{sum(best.values()):>11.3f}  max relative deviation {deviation:.1e}")
+
+
+if __name__ == '__main__':
+    main()
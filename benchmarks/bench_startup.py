@@ -0,0 +1,75 @@
+"""
+Benchmark of the time taken to start a process and import the package
+modules, with the heavy dependencies that each one loads.
+
+Each import is timed in a fresh interpreter, as modules are only imported
+once per process. The time of an empty interpreter is given for reference.
+
+    python benchmarks/bench_startup.py [--repeats 10]
+"""
+
+import argparse
+import os
+import subprocess
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ['ESSReflReducer', 'ESSReflReducer.header', 'ESSReflReducer.engine',
+           'ESSReflReducer.read_amor']
+
+DEPENDENCIES = ['numpy', 'scipy', 'scipp', 'h5py']
+
+REPORT = "import sys; print(' '.join(m for m in {} if m in sys.modules))"
+
+
+def time_import(statement, repeats):
+    """
+    Time a statement in fresh interpreters.
+
+    Args:
+        statement (str): The Python code to run.
+        repeats (int): The number of interpreters to start.
+
+    Returns:
+        (tuple): The median and minimum wall time, in seconds.
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', statement], cwd=ROOT, check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), min(times)
+
+
+def loaded(module):
+    """
+    Find the heavy dependencies loaded by importing a module.
+
+    Args:
+        module (str): The module to import.
+
+    Returns:
+        (str): The dependencies that were imported.
+    """
+    statement = f"import {module}; " + REPORT.format(DEPENDENCIES)
+    result = subprocess.run([sys.executable, '-c', statement], cwd=ROOT, check=True, stdout=subprocess.PIPE, universal_newlines=True)
+    return result.stdout.strip() or '-'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--repeats', type=int, default=10, help='number of interpreters started for each import')
+    args = parser.parse_args()
+    baseline, _ = time_import('pass', args.repeats)
+    print(f"{'module':<28}{'median/ms':>10}{'min/ms':>10}{'import/ms':>11}  dependencies loaded")
+    print(f"{'(empty interpreter)':<28}{baseline * 1e3:>10.1f}{'':>10}{'':>11}")
+    for module in MODULES:
+        median, minimum = time_import(f'import {module}', args.repeats)
+        print(f"{module:<28}{median * 1e3:>10.1f}{minimum * 1e3:>10.1f}{(median - baseline) * 1e3:>11.1f}  {loaded(module)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Regression gate for the reduction. Every reduction path is compared with
+the golden reflectivities of each dataset, and the throughput of each stage
+with the stored baseline. The exit status is non-zero if any path deviates
+by more than its tolerance, or any stage loses more than the threshold of
+its throughput.
+
+The synthetic dataset is always checked, other pairs of AMOR files can be
+added with `--dataset`. The golden reductions and the baseline are written,
+rather than checked, with `--update`. The golden reductions are committed,
+while the throughput baseline depends on the machine, so it is kept locally,
+in golden/throughput.json unless another file is given with `--baseline` or
+the ESSREFL_THROUGHPUT_BASELINE environment variable. The gate fails if
+there is no baseline, or the baseline is from another processor.
+
+    python benchmarks/regression_gate.py [--dataset NAME REFERENCE SAMPLE] [--update] [--baseline FILE]
+                                         [--threshold 0.2] [--events 1000000] [--repeats 3]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ESSReflReducer import regression  # noqa: E402
+
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden')
+BASELINE = os.environ.get('ESSREFL_THROUGHPUT_BASELINE', os.path.join(GOLDEN, 'throughput.json'))
+
+
+def check_dataset(name, reference, sample, update):
+    """
+    Check, or update, the golden reductions of a dataset.
+
+    Args:
+        name (str): The name of the dataset.
+        reference (str): The reference .hdf file.
+        sample (str): The sample .hdf file.
+        update (bool): Write the golden reductions rather than checking them.
+
+    Returns:
+        (bool): Whether every path agrees with the golden reductions.
+    """
+    filename = os.path.join(GOLDEN, f'{name}.npz')
+    if update:
+        np.savez(filename, **regression.golden_reductions(reference, sample))
+        print(f"{name}: golden reductions written to {filename}")
+        return True
+    if not os.path.exists(filename):
+        print(f"{name}: no golden reductions, run with --update")
+        return False
+    with np.load(filename) as f:
+        golden = dict(f)
+    failures = regression.check_paths(reference, sample, golden)
+    for key, worst in sorted(failures.items()):
+        print(f"{name}: {key} deviates by {worst:.3e}")
+    print(f"{name}: {len(regression.PATHS)} paths, {len(regression.CASES)} cases, {'FAILED' if failures else 'passed'}")
+    return not failures
+
+
+def check_throughput(filename, reference, sample, threshold, repeats, update):
+    """
+    Check, or update, the throughput baseline of each stage.
+
+    Args:
+        filename (str): The baseline .json file.
+        reference (str): The reference .hdf file.
+        sample (str): The sample .hdf file.
+        threshold (float): The largest fractional loss of throughput.
+        repeats (int): The number of reductions timed.
+        update (bool): Write the baseline rather than checking it.
+
+    Returns:
+        (bool): Whether every stage is within the threshold of a baseline from this machine.
+    """
+    timings, n_events = regression.stage_timings(reference, sample, repeats)
+    rates = regression.throughput(timings, n_events)
+    if update:
+        regression.save_baseline(filename, rates, n_events)
+        print(f"throughput: baseline written to {filename}")
+        return True
+    baseline = regression.load_baseline(filename) if os.path.exists(filename) else None
+    if baseline is None or baseline['machine'] != regression.machine():
+        reason = f"no baseline in {filename}" if baseline is None else f"the baseline is from another machine, {baseline['machine']}"
+        for stage in regression.STAGES:
+            print(f"throughput: {stage:<24}{rates[stage]:>12.3e} events/s")
+        print(f"throughput: FAILED, {reason}; run with --update to record a baseline on this machine")
+        return False
+    failures = regression.check_throughput(rates, baseline['events_per_second'], threshold)
+    for stage in regression.STAGES:
+        expected = baseline['events_per_second'].get(stage, np.nan)
+        flag = '  *' if stage in failures else ''
+        print(f"throughput: {stage:<24}{rates[stage]:>12.3e} events/s, baseline {expected:.3e}{flag}")
+    print(f"throughput: {'FAILED' if failures else 'passed'}, threshold {threshold:.0%}")
+    return not failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--dataset', nargs=3, action='append', default=[], metavar=('NAME', 'REFERENCE', 'SAMPLE'),
+                        help='a pair of AMOR files to check, with golden reductions in golden/NAME.npz')
+    parser.add_argument('--update', action='store_true', help='write the golden reductions and the baseline')
+    parser.add_argument('--baseline', default=BASELINE, help='the throughput baseline of this machine')
+    parser.add_argument('--threshold', type=float, default=regression.THRESHOLD, help='largest fractional loss of throughput of a stage')
+    parser.add_argument('--events', type=int, default=1000000, help='number of events in the sample file timed')
+    parser.add_argument('--repeats', type=int, default=3, help='number of reductions timed')
+    args = parser.parse_args()
+    os.makedirs(GOLDEN, exist_ok=True)
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, 'golden'))
+        os.makedirs(os.path.join(directory, 'timed'))
+        passed = check_dataset('synthetic', *regression.write_synthetic(os.path.join(directory, 'golden')), args.update)
+        for name, reference, sample in args.dataset:
+            passed &= check_dataset(name, reference, sample, args.update)
+        reference, sample = regression.write_synthetic(os.path.join(directory, 'timed'), args.events)
+        passed &= check_throughput(args.baseline, reference, sample, args.threshold, args.repeats, args.update)
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == '__main__':
+    main()
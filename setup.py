@@ -31,6 +31,7 @@ INFO = {
         'include_package_data': True,
         'setup_requires': ['numpy', 'datetime'],
         'install_requires': ['numpy', 'datetime'],
+        'python_requires': '>=3.8',
         'version': VERSION,
         'license': 'MIT',
         'long_description': LONG_DESCRIPTION,
@@ -40,8 +41,6 @@ INFO = {
                         'License :: OSI Approved :: MIT License',
                         'Natural Language :: English',
                         'Operating System :: OS Independent',
-                        'Programming Language :: Python :: 3.6',
-                        'Programming Language :: Python :: 3.7',
                         'Programming Language :: Python :: 3.8',
                         'Topic :: Scientific/Engineering',
                         'Topic :: Scientific/Engineering :: Chemistry',